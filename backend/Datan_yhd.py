@@ -3,12 +3,16 @@ import re
 from datetime import timedelta, date, datetime
 import os
 import glob
-import requests
 import numpy as np
-from io import StringIO
-import time 
 from dotenv import load_dotenv
 from typing import Tuple, Optional 
+import sys
+import saa_asiakas
+import saavarasto
+
+# Tyypitetty Parquet-kopio kirjoitetaan samalla lataajalla, jolla koulutus ja ennustus lukevat datan
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lake_lovers_rest_api'))
+from api.util import aineisto
 
 # ************************************************
 # ASETUKSET
@@ -17,7 +21,22 @@ from typing import Tuple, Optional
 # Oletuspolku on nyt kova-koodattu, mutta HUOM! Varmista, että tiedostosi ovat TÄSSÄ kansiossa.
 file_path = "C:\\Users\\35845\\Documents\\PYTHON\\Hackhaton\\" 
 OUTPUT_FILE = os.path.join(file_path, 'rikastettu_sinileva_data.csv') 
-USE_PARQUET = False
+USE_PARQUET = True   # Kirjoitetaan CSV:n viereen tyypitetty Parquet-kopio (aineisto.py; vaatii pyarrow-kirjaston)
+
+# Rikastus tehdään erissä; valmiit erät tallennetaan tarkistuspisteiksi, joista keskeytynyt
+# ajo jatkuu. Havainto tunnistetaan paikasta ja päivämäärästä (HAVAINTOAVAIN).
+CHECKPOINT_DIR = os.path.join(file_path, 'rikastus_checkpoint')
+ERAKOKO = 5000
+HAVAINTOAVAIN = ['Havaintopaikka', 'Latitude_DD', 'Longitude_DD', 'Päivämäärä']
+# Havainnot, joihin säädataa ei saatu, säilyvät datassa (säämuuttujat tyhjinä) ja niiden rikastus
+# yritetään seuraavissa ajoissa uudelleen, kunnes yrityksiä on kertynyt RIKASTUSYRITYKSIÄ.
+RIKASTUSYRITYKSIÄ = 3
+
+# Säädata luetaan sääruuduittain (saavarasto.RUUDUKKO_ASTE) paikallisen säävaraston kautta:
+# lähekkäiset havaintopaikat jakavat saman ruudun, ja vain varastosta puuttuvat päivät haetaan
+# Open-Meteosta. Ruudun havaintopäivät käsitellään yhtenä jaksona, ellei havaintojen välissä
+# ole pitkää taukoa (esim. talvi), jolloin jakso katkaistaan.
+JAKSON_AUKKO_PV = 60
 
 # ************************************************
 # APUFUNKTIOT
@@ -39,63 +58,59 @@ def dms_to_dd(dms_str):
         return decimal_degrees
     return None
 
+def hae_openmeteo_paivittaiset(latitude: float, longitude: float, start_date: date, end_date: date) -> Optional[pd.DataFrame]:
+    """
+    Palauttaa päivittäisen lämpötilan, sadannan ja tuulen aikaväliltä säävaraston kautta
+    (puuttuvat päivät haetaan Open-Meteosta). DataFrame (Päivämäärä, Lämpötila_C, Sadanta_mm,
+    Tuulen_nopeus_ms, ...) tai None, jos dataa ei saatu.
+    """
+    daily_df = saavarasto.Saavarasto().hae_jakso(latitude, longitude, start_date, end_date)
+    return daily_df if len(daily_df) else None
+
 def hae_openmeteo_lampotila(latitude: float, longitude: float, target_date: datetime, days_before: int = 7) -> Tuple[Optional[float], Optional[float], Optional[float], Optional[pd.DataFrame]]:
     """
     Hakee päivittäisen lämpötilan, sadannan ja tuulen 7 päivän ajalta 
     Open-Meteo API:sta ja laskee niistä 7 päivän keskiarvot/summat.
     """
-    
-    end_date = target_date.strftime('%Y-%m-%d')
-    start_date = (target_date - timedelta(days=days_before - 1)).strftime('%Y-%m-%d')
-    
-    url = 'https://archive-api.open-meteo.com/v1/archive'
-    params = {
-        'latitude': latitude,
-        'longitude': longitude,
-        'start_date': start_date,
-        'end_date': end_date,
-        'daily': 'temperature_2m_mean,precipitation_sum,wind_speed_10m_mean', 
-        'timezone': 'auto'
-    }
-    
-    try:
-        response = requests.get(url, params=params, timeout=20)
-        response.raise_for_status()
-        data = response.json()
-        
-        daily = data.get('daily', {})
-        dates = daily.get('time')
-        daily_temps = daily.get('temperature_2m_mean')
-        daily_precip = daily.get('precipitation_sum') 
-        daily_wind = daily.get('wind_speed_10m_mean')
-
-        if daily_temps and dates and daily_precip and daily_wind and isinstance(daily_temps, list):
-            
-            # Lämpötilan ja tuulen nopeuden keskiarvot
-            avg_temp = pd.Series(daily_temps).mean()
-            avg_wind_speed = pd.Series(daily_wind).mean()
-            
-            # Sadannan summa
-            total_precip = pd.Series(daily_precip).sum()
-
-            daily_data = pd.DataFrame({
-                'Päivämäärä': dates, 
-                'Lämpötila_C': daily_temps,
-                'Sadanta_mm': daily_precip,
-                'Tuulen_nopeus_ms': daily_wind
-            })
-            
-            return avg_temp, total_precip, avg_wind_speed, daily_data
-        else:
-            return None, None, None, None
-            
-    except requests.exceptions.RequestException as e:
-        # print(f"API-VIRHE sijainnille {latitude}, {longitude}: {e}") # Piilotettu tulostus
-        return None, None, None, None
-    except Exception as e:
-        print(f"Yleinen virhe: {e}")
+    daily_data = hae_openmeteo_paivittaiset(latitude, longitude, target_date - timedelta(days=days_before - 1), target_date)
+    if daily_data is None:
         return None, None, None, None
 
+    # Lämpötilan ja tuulen nopeuden keskiarvot, sadannan summa
+    avg_temp = daily_data['Lämpötila_C'].mean()
+    avg_wind_speed = daily_data['Tuulen_nopeus_ms'].mean()
+    total_precip = daily_data['Sadanta_mm'].sum()
+    daily_data['Päivämäärä'] = daily_data['Päivämäärä'].dt.strftime('%Y-%m-%d')
+    return avg_temp, total_precip, avg_wind_speed, daily_data
+
+def ryhmittele_hakujaksoiksi(df: pd.DataFrame, days_before: int = 7) -> pd.DataFrame:
+    """
+    Ryhmittelee havainnot sääruutuihin (saavarasto.RUUDUKKO_ASTE) ja jakaa kunkin ruudun havaintopäivät
+    yhtenäisiksi jaksoiksi, joissa peräkkäisten havaintojen väli on enintään JAKSON_AUKKO_PV.
+    Palauttaa yhden rivin per API-haku: Sää_Lat, Sää_Lon, Alku, Loppu.
+    """
+    havainnot = df[['Sää_Lat', 'Sää_Lon', 'Päivämäärä']].drop_duplicates().sort_values(['Sää_Lat', 'Sää_Lon', 'Päivämäärä'])
+    aukko = havainnot.groupby(['Sää_Lat', 'Sää_Lon'])['Päivämäärä'].diff() > pd.Timedelta(days=JAKSON_AUKKO_PV)
+    havainnot['Jakso'] = aukko.cumsum()
+    jaksot = havainnot.groupby(['Sää_Lat', 'Sää_Lon', 'Jakso'])['Päivämäärä'].agg(Alku='min', Loppu='max').reset_index()
+    jaksot['Alku'] -= pd.Timedelta(days=days_before - 1)
+    return jaksot.drop(columns='Jakso')
+
+def liukuvat_saasummat(daily_df: pd.DataFrame, days_before: int = 7) -> pd.DataFrame:
+    """
+    Laskee yhden sääruudun päivittäisestä datasta jokaiselle päivälle edeltävien days_before
+    päivän keskiarvot (lämpötila, tuuli) ja summan (sadanta) liukuvalla ikkunalla.
+    """
+    päivät = daily_df.drop_duplicates('Päivämäärä').set_index('Päivämäärä').sort_index().asfreq('D')
+    ikkuna = päivät.rolling(days_before, min_periods=1)
+    keskiarvot = ikkuna[['Lämpötila_C', 'Tuulen_nopeus_ms']].mean()
+    summat = ikkuna['Sadanta_mm'].sum()
+    return pd.DataFrame({
+        'Ilma_Lämpötila_7d_C': keskiarvot['Lämpötila_C'],
+        'Sadanta_7d_mm': summat,
+        'Tuuli_7d_ms': keskiarvot['Tuulen_nopeus_ms'],
+    }).rename_axis('Päivämäärä').reset_index()
+
 # ************************************************
 # VAIHE 1 & 2: DATAN LUKU JA PUHDISTUS
 # ************************************************
@@ -162,54 +177,198 @@ def puhdista_ja_muunna_data(df):
 # VAIHE 3: LÄMPÖTILAN, SADANNAN JA TUULEN LIITTÄMINEN
 # ************************************************
 
-def liita_openmeteo_lampotilat(df_sinileva):
-    """Iteroi sinilevädataa ja hakee Open-Meteo säämuuttujien 7 päivän keskiarvot/summat."""
+def liita_openmeteo_lampotilat(df_sinileva, varasto: Optional[saavarasto.Saavarasto] = None):
+    """
+    Liittää sinilevädataan Open-Meteo säämuuttujien 7 päivän keskiarvot/summat. Havainnot
+    ryhmitellään sääruuduittain; kunkin ruudun havaintojakso luetaan säävarastosta, ja vain
+    varastosta puuttuvat päivät haetaan API:sta. 7 päivän ikkunat lasketaan paikallisesti
+    liukuvina ikkunoina.
+    """
     print("\n--- Haetaan Ilman Lämpötilan, Sadannan ja Tuulen 7 päivän Keskiarvot/Summat ---")
     
     df_temp = df_sinileva.copy() 
-    df_temp['Ilma_Lämpötila_7d_C'] = np.nan
-    df_temp['Sadanta_7d_mm'] = np.nan
-    df_temp['Tuuli_7d_ms'] = np.nan 
+    df_temp = df_temp.drop(columns=['Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms'], errors='ignore')
+    varasto = varasto or saavarasto.Saavarasto()
+    ruudut = {(lat, lon): saavarasto.ruutu(lat, lon) for lat, lon in df_temp[['Latitude_DD', 'Longitude_DD']].drop_duplicates().itertuples(index=False)}
+    sää_ruudut = [ruudut[(lat, lon)] for lat, lon in zip(df_temp['Latitude_DD'], df_temp['Longitude_DD'])]
+    df_temp['Sää_Lat'] = [r[0] for r in sää_ruudut]
+    df_temp['Sää_Lon'] = [r[1] for r in sää_ruudut]
     
-    daily_data_list = []
+    jaksot = ryhmittele_hakujaksoiksi(df_temp, days_before=7)
     
-    # Määritä käsiteltyjen rivien kokonaismäärä
-    total_rows = len(df_temp)
+    # Vain varastosta puuttuvat päivät haetaan, rinnakkain jaetulla yhteyspoolilla ja mukautuvalla nopeusrajoituksella
+    tanaan = date.today()
+    haut = [
+        (j.Sää_Lat, j.Sää_Lon, alku, loppu)
+        for j in jaksot.itertuples(index=False)
+        for alku, loppu in varasto.puuttuvat_jaksot(j.Sää_Lat, j.Sää_Lon, j.Alku, min(j.Loppu.date(), tanaan))
+    ]
+    print(f"{len(df_temp)} havaintoa, {df_temp.groupby(['Sää_Lat', 'Sää_Lon']).ngroups} sääruutua, {len(jaksot)} jaksoa -> {len(haut)} API-hakua (loput säävarastosta).")
     
-    for index, row in df_temp.iterrows():
-        
-        # Tulostetaan tilannepäivitys
-        current_row_number = df_temp.index.get_loc(index) + 1
-        if current_row_number % 100 == 0 or current_row_number == total_rows:
-            print(f"Käsitellään riviä {current_row_number}/{total_rows}...")
-
-        # Haku API:sta
-        avg_temp, total_precip, avg_wind_speed, daily_df = hae_openmeteo_lampotila(
-            row['Latitude_DD'], 
-            row['Longitude_DD'], 
-            row['Päivämäärä'], 
-            days_before=7
-        )
-        
-        if avg_temp is not None:
-            # Sijoita kaikki kolme arvoa
-            df_temp.loc[index, 'Ilma_Lämpötila_7d_C'] = avg_temp
-            df_temp.loc[index, 'Sadanta_7d_mm'] = total_precip
-            df_temp.loc[index, 'Tuuli_7d_ms'] = avg_wind_speed
-            
-            if daily_df is not None:
-                # Käytetään DataFrame-indeksiä havainnon ID:nä
-                daily_df['Havainto_ID'] = index 
-                daily_data_list.append(daily_df)
-        
-        time.sleep(0.1) # Viive API-kuorman tasaamiseksi
+    tulos = saa_asiakas.hae_jaksot(haut) if haut else saa_asiakas.Hakutulos()
+    if haut:
+        print(f"{tulos.pyyntöjä} pyyntöä ({tulos.uudelleenyrityksiä} uudelleenyritystä) {tulos.kesto_s:.1f} sekunnissa.")
+    for i, daily_df in tulos.onnistuneet.items():
+        varasto.tallenna(haut[i][0], haut[i][1], daily_df)
+    
+    daily_data_list = []
+    ikkunat_list = []
+    for j in jaksot.itertuples(index=False):
+        lat, lon = j.Sää_Lat, j.Sää_Lon
+        daily_df = varasto.hae(lat, lon, j.Alku, j.Loppu)
+        if daily_df.empty:
+            continue
+        daily_df['Sää_Lat'] = lat
+        daily_df['Sää_Lon'] = lon
+        daily_data_list.append(daily_df)
+
+        ikkunat = liukuvat_saasummat(daily_df, days_before=7)
+        ikkunat['Sää_Lat'] = lat
+        ikkunat['Sää_Lon'] = lon
+        ikkunat_list.append(ikkunat)
+
+    sarakkeet = ['Sää_Lat', 'Sää_Lon', 'Päivämäärä', 'Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms']
+    df_ikkunat = pd.concat(ikkunat_list, ignore_index=True) if ikkunat_list else pd.DataFrame(columns=sarakkeet)
+    # Päällekkäisistä jaksoista riittää yksi arvo per ruutu ja päivä
+    df_ikkunat = df_ikkunat[sarakkeet].drop_duplicates(['Sää_Lat', 'Sää_Lon', 'Päivämäärä'])
+
+    avain = ['Sää_Lat', 'Sää_Lon', 'Päivämäärä']
+    df_temp = df_temp.join(df_ikkunat.set_index(avain), on=avain)
         
     liitetty_lkm = df_temp['Ilma_Lämpötila_7d_C'].count()
     print(f"\nSäämuuttujat liitetty {liitetty_lkm}/{len(df_temp)} havaintoon.")
     
+    df_epaonnistuneet = rikastusraportti(df_temp, haut, tulos.epäonnistuneet)
     df_daily_temps = pd.concat(daily_data_list, ignore_index=True) if daily_data_list else pd.DataFrame()
+    df_temp = df_temp.drop(columns=['Sää_Lat', 'Sää_Lon'])
     
-    return df_temp, df_daily_temps
+    return df_temp, df_daily_temps, df_epaonnistuneet
+
+def rikastusraportti(df_temp: pd.DataFrame, haut: list, epaonnistuneet: dict) -> pd.DataFrame:
+    """Havainnot, joihin säädataa ei saatu, ja syy (epäonnistuneen haun virhe tai puuttuva data)."""
+    syyt = {(haut[i][0], haut[i][1]): syy for i, syy in epaonnistuneet.items()}
+    puuttuvat = df_temp[df_temp['Ilma_Lämpötila_7d_C'].isna()]
+    sarakkeet = [c for c in ['Havaintopaikka', 'Päivämäärä', 'Latitude_DD', 'Longitude_DD'] if c in df_temp.columns]
+    raportti = puuttuvat[sarakkeet].copy()
+    raportti['Syy'] = [syyt.get((lat, lon), 'Ei säädataa havaintopäivälle') for lat, lon in zip(puuttuvat['Sää_Lat'], puuttuvat['Sää_Lon'])]
+
+    if len(raportti):
+        print(f"RIKASTUS EPÄONNISTUI {len(raportti)} havainnolle:")
+        print(raportti.groupby('Syy').size().sort_values(ascending=False).to_string())
+    return raportti
+
+
+# ************************************************
+# VAIHE 4: INKREMENTAALINEN RIKASTUS TARKISTUSPISTEIN
+# ************************************************
+
+def lue_rikastettu(polku: str) -> Optional[pd.DataFrame]:
+    """Lukee rikastetun CSV:n (tai tarkistuspisteen); None, jos tiedostoa ei ole."""
+    if not os.path.exists(polku):
+        return None
+    df = pd.read_csv(polku, sep=';')
+    if 'Päivämäärä' in df.columns:
+        df['Päivämäärä'] = pd.to_datetime(df['Päivämäärä'], errors='coerce')
+    return df
+
+def havaintoavaimet(df: pd.DataFrame) -> pd.MultiIndex:
+    """(paikka, lat, lon, päivä) -avaimet; koordinaatit pyöristetään, jotta CSV:n kautta kulkeneet arvot täsmäävät."""
+    avain = df.reindex(columns=HAVAINTOAVAIN).copy()
+    avain[['Latitude_DD', 'Longitude_DD']] = avain[['Latitude_DD', 'Longitude_DD']].round(6)
+    avain['Päivämäärä'] = pd.to_datetime(avain['Päivämäärä']).dt.normalize()
+    return pd.MultiIndex.from_frame(avain.fillna({'Havaintopaikka': ''}))
+
+def yhdista_uusin_ensin(osat: list) -> pd.DataFrame:
+    """
+    Yhdistää valmiin datan osat (vanhimmasta uusimpaan) niin, että kukin havainto otetaan vain
+    uusimmasta osasta, jossa se esiintyy. Jos ajo keskeytyy koonnin tallennuksen ja
+    tarkistuspisteiden siivouksen välissä, samat rivit ovat sekä koonnissa että tarkistuspisteissä.
+    Saman osan sisäiset toistot (aidot päällekkäiset havainnot) säilyvät.
+    """
+    valitut, nahdyt = [], None
+    for df in reversed(osat):
+        avaimet = havaintoavaimet(df)
+        if nahdyt is not None:
+            df = df[~avaimet.isin(nahdyt)]
+        valitut.append(df)
+        nahdyt = avaimet if nahdyt is None else nahdyt.append(avaimet)
+    return pd.concat(valitut[::-1], ignore_index=True)
+
+def tallenna_atomisesti(df: pd.DataFrame, polku: str) -> None:
+    """Kirjoittaa CSV:n väliaikaiseen tiedostoon ja vaihtaa sen paikalleen (keskeytys ei jätä puolikasta tiedostoa)."""
+    valiaikainen = polku + '.tmp'
+    df.to_csv(valiaikainen, index=False, sep=';')
+    os.replace(valiaikainen, polku)
+
+def rikasta_inkrementaalisesti(df_havainnot: pd.DataFrame, output_file: str = OUTPUT_FILE,
+                               checkpoint_dir: str = CHECKPOINT_DIR, erakoko: int = ERAKOKO,
+                               varasto: Optional[saavarasto.Saavarasto] = None):
+    """
+    Rikastaa vain havainnot, joita valmiissa datassa (output_file + keskeneräisen ajon
+    tarkistuspisteet) ei vielä ole tai joilta säädata puuttuu (enintään RIKASTUSYRITYKSIÄ
+    yritystä), ja liittää ne valmiiseen dataan.
+    Jokainen valmis erä tallennetaan heti tarkistuspisteeksi, joten keskeytynyt ajo jatkuu
+    viimeisestä valmiista erästä. Palauttaa (koko rikastettu data, tämän ajon päivittäinen
+    data, rikastamatta jääneet havainnot).
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    tarkistuspisteet = sorted(glob.glob(os.path.join(checkpoint_dir, 'era_*.csv')))
+    osat = [lue_rikastettu(output_file)] + [lue_rikastettu(p) for p in tarkistuspisteet]
+    osat = [df for df in osat if df is not None and not df.empty]
+    df_valmiit = yhdista_uusin_ensin(osat) if osat else pd.DataFrame(columns=df_havainnot.columns)
+    if tarkistuspisteet:
+        print(f"Jatketaan keskeytynyttä rikastusta: {len(tarkistuspisteet)} valmista erää tarkistuspisteissä.")
+
+    # Epäonnistuneet rikastukset yritetään uudelleen (säävarasto palauttaa jo haetut päivät ilman verkkoa),
+    # kunnes yritykset loppuvat; siihen asti rivi pysyy valmiissa datassa ja korvautuu uudella tuloksella.
+    df_valmiit = df_valmiit.reindex(columns=df_valmiit.columns.union(['Ilma_Lämpötila_7d_C', 'Rikastusyrityksiä'], sort=False))
+    df_valmiit['Rikastusyrityksiä'] = df_valmiit['Rikastusyrityksiä'].fillna(1).astype(int)  # Vanhat tiedostot: yksi yritys
+    valmiit_avaimet = havaintoavaimet(df_valmiit)
+    havaintojen_avaimet = havaintoavaimet(df_havainnot)
+    uusittavat = (
+        df_valmiit['Ilma_Lämpötila_7d_C'].isna().to_numpy()
+        & (df_valmiit['Rikastusyrityksiä'] < RIKASTUSYRITYKSIÄ).to_numpy()
+        & valmiit_avaimet.isin(havaintojen_avaimet)
+    )
+    yritykset = df_valmiit['Rikastusyrityksiä'].set_axis(valmiit_avaimet)
+    yritykset = yritykset[~yritykset.index.duplicated(keep='last')]
+    df_valmiit = df_valmiit[~uusittavat]
+
+    rikastettavat = ~havaintojen_avaimet.isin(valmiit_avaimet[~uusittavat])
+    df_uudet = df_havainnot[rikastettavat].copy()
+    df_uudet['Rikastusyrityksiä'] = yritykset.reindex(havaintojen_avaimet[rikastettavat]).fillna(0).astype(int).to_numpy() + 1
+    df_uudet = df_uudet.sort_values(['Latitude_DD', 'Longitude_DD', 'Päivämäärä'])
+    print(f"Valmiina {len(df_valmiit)} havaintoa, rikastettavana {len(df_uudet)} havaintoa "
+          f"(joista {int(uusittavat.sum())} uusintayritystä).")
+
+    varasto = varasto or saavarasto.Saavarasto()
+    valmiit_list = [df_valmiit] if not df_valmiit.empty else []
+    daily_list, epaonnistuneet_list = [], []
+    erat = (len(df_uudet) + erakoko - 1) // erakoko
+    for n, alku in enumerate(range(0, len(df_uudet), erakoko), start=1):
+        print(f"\n=== Erä {n}/{erat} ===")
+        df_era, df_daily, df_epaonnistuneet = liita_openmeteo_lampotilat(df_uudet.iloc[alku:alku + erakoko], varasto)
+        tallenna_atomisesti(df_era, os.path.join(checkpoint_dir, f'era_{len(tarkistuspisteet) + n:05d}.csv'))
+        valmiit_list.append(df_era)
+        daily_list.append(df_daily)
+        epaonnistuneet_list.append(df_epaonnistuneet)
+
+    # Kaikki erät valmiina: kootaan yhdeksi tiedostoksi ja siivotaan tarkistuspisteet
+    if erat:
+        df_valmiit = pd.concat(valmiit_list, ignore_index=True)
+    if erat or tarkistuspisteet:
+        tallenna_atomisesti(df_valmiit, output_file)
+        if USE_PARQUET:
+            aineisto.tallenna_parquet(df_valmiit, output_file)
+    elif USE_PARQUET and os.path.exists(output_file) and not aineisto.parquet_ajan_tasalla(output_file):
+        # CSV:tä ei kirjoitettu uudelleen: kopio tehdään levyn CSV:stä sellaisenaan
+        aineisto.tallenna_parquet(lue_rikastettu(output_file), output_file)
+    for polku in glob.glob(os.path.join(checkpoint_dir, 'era_*.csv')):
+        os.remove(polku)
+
+    df_daily_temps = pd.concat(daily_list, ignore_index=True) if daily_list else pd.DataFrame()
+    df_epaonnistuneet = pd.concat(epaonnistuneet_list) if epaonnistuneet_list else pd.DataFrame()
+    return df_valmiit, df_daily_temps, df_epaonnistuneet
 
 
 # ************************************************
@@ -220,48 +379,35 @@ if __name__ == "__main__":
 
     load_dotenv()
     
-    # 1. TARKISTA, ONKO RIKASTETTU DATA JO TALLENNETTU
-    if os.path.exists(OUTPUT_FILE) and not USE_PARQUET:
-        print("="*60)
-        print(f"Ladataan rikastettu data tiedostosta: {os.path.basename(OUTPUT_FILE)}")
-        print("="*60)
-        try:
-             df_rikastettu = pd.read_csv(OUTPUT_FILE, sep=';')
-             if 'Päivämäärä' in df_rikastettu.columns:
-                 df_rikastettu['Päivämäärä'] = pd.to_datetime(df_rikastettu['Päivämäärä'], errors='coerce')
-        except Exception as e:
-            print(f"Virhe rikastetun datan lukemisessa: {e}. Ajetaan datan luku alusta.")
-            df_rikastettu = None
+    # 1. LUETAAN KAIKKI HavaintoXX.csv -TIEDOSTOT
+    df_raaka = lue_ja_yhdistä_data(file_path)
     
-    if 'df_rikastettu' not in locals() or df_rikastettu is None or df_rikastettu.empty:
-        print("="*60)
-        print("Ajetaan datan luku ja rikastus alusta (KÄYTETÄÄN KAIKKEA DATA!).")
-        print("="*60)
-
-        # KAIKKI 5 TIEDOSTOA LUETAAN JA YHDISTETÄÄN
-        df_raaka = lue_ja_yhdistä_data(file_path)
-        if df_raaka is None: exit()
-        
+    if df_raaka is None:
+        # Ei raakadataa: käytetään aiemmin rikastettua dataa sellaisenaan
+        if not os.path.exists(OUTPUT_FILE) and not aineisto.parquet_ajan_tasalla(OUTPUT_FILE): exit()
+        df_rikastettu = aineisto.lue(OUTPUT_FILE) if USE_PARQUET else lue_rikastettu(OUTPUT_FILE)
+        print(f"Ladattu rikastettu data tiedostosta: {os.path.basename(OUTPUT_FILE)}")
+    else:
         df_ennuste_valmis = puhdista_ja_muunna_data(df_raaka)
         
         if df_ennuste_valmis is None or df_ennuste_valmis.empty:
             print("\nVIRHE: Dataa ei voitu yhdistää ja puhdistaa ennustemalleja varten.")
             exit()
             
-        # 2. HAE JA LIITÄ OPEN-METEO LÄMPÖTILA
-        # HUOM: Rajoitus .head(100) on POISTETTU! Käytetään koko dataa.
-        df_testi_osa = df_ennuste_valmis.copy() 
-        
-        # Funktio palauttaa kaksi DataFramea: rikastetun ja päivittäisen datan
-        df_rikastettu, df_daily_temps = liita_openmeteo_lampotilat(df_testi_osa)
+        # 2. RIKASTETAAN VAIN UUDET HAVAINNOT (esim. uuden kauden HavaintoXX.csv) JA LIITETÄÄN VALMIISEEN DATAAN
+        print("="*60)
+        print(f"Rikastetaan uudet havainnot ja päivitetään {os.path.basename(OUTPUT_FILE)}")
+        print("="*60)
+        df_rikastettu, df_daily_temps, df_epaonnistuneet = rikasta_inkrementaalisesti(df_ennuste_valmis)
         
-        # 3. TALLENNA DATA
+        # 3. TALLENNA DEBUG-DATA (rikastettu data on jo tallennettu)
         try:
-            df_rikastettu.to_csv(OUTPUT_FILE, index=False, sep=';')
             df_daily_temps.to_csv(os.path.join(file_path, 'daily_temperatures_debug.csv'), index=False, sep=';')
+            df_epaonnistuneet.to_csv(os.path.join(file_path, 'rikastus_epaonnistuneet.csv'), index_label='Havainto_ID', sep=';')
                 
             print(f"\n=> RIKASTETTU DATA TALLENNETTU ONNISTUNEESTI osoitteeseen: {os.path.basename(OUTPUT_FILE)}")
             print(f"=> Päivittäinen debug-data tallennettu tiedostoon daily_temperatures_debug.csv")
+            print(f"=> Rikastamatta jääneet havainnot ({len(df_epaonnistuneet)}) tiedostossa rikastus_epaonnistuneet.csv")
         except Exception as e:
             print(f"\nVIRHE DATAN TALLENTAMISESSA: {e}")
 
@@ -6,10 +6,15 @@ from sklearn.metrics import accuracy_score
 from sklearn.preprocessing import LabelEncoder
 from sklearn.neighbors import NearestNeighbors
 import os
+import sys
 import joblib 
 from typing import Dict, Any, Tuple
 import seaborn as sns
 
+# Tyypitetty datan lataaja (Parquet/CSV) on jaettu REST API:n ennustuspuolen kanssa
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lake_lovers_rest_api'))
+from api.util import aineisto
+
 # ************************************************
 # ASETUKSET JA VAKIOT
 # ************************************************
@@ -24,6 +29,9 @@ FEATURE_ORDER = [
     'DayOfYear_sin', 'DayOfYear_cos', 'Vuosi'
 ]
 
+# Koulutuksessa tarvittavat sarakkeet; muita ei lueta levyltä
+KOULUTUS_SARAKKEET = ['Päivämäärä', 'LevätilanneNum', 'Latitude_DD', 'Longitude_DD', 'Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms']
+
 # Leväriskin tulkinta
 RISKITASOT = {
     0: "Ei levää/Hyvä", 
@@ -40,12 +48,12 @@ RISKITASOT = {
 def lataa_rikastettu_data_ja_jaa():
     """Lataa rikastetun datan ja jakaa sen 60/20/20 osiin."""
     try:
-        df = pd.read_csv(INPUT_FILE, sep=';')
-        df['Päivämäärä'] = pd.to_datetime(df['Päivämäärä'], errors='coerce')
+        # Tyypitetty luku: Parquet-kopio jos ajan tasalla, muuten CSV (float32-piirteet, päivämäärät valmiiksi jäsennettyinä)
+        df = aineisto.lue(INPUT_FILE, KOULUTUS_SARAKKEET)
         df['DayOfYear'] = df['Päivämäärä'].dt.dayofyear
         df['Vuosi'] = df['Päivämäärä'].dt.year
-        df['DayOfYear_sin'] = np.sin(2 * np.pi * df['DayOfYear'] / 365) # LISÄTTY
-        df['DayOfYear_cos'] = np.cos(2 * np.pi * df['DayOfYear'] / 365) # LISÄTTY
+        df['DayOfYear_sin'] = np.sin(2 * np.pi * df['DayOfYear'] / 365).astype(np.float32) # LISÄTTY
+        df['DayOfYear_cos'] = np.cos(2 * np.pi * df['DayOfYear'] / 365).astype(np.float32) # LISÄTTY
 
         df = df.dropna(subset=['Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms', 'LevätilanneNum']).copy()
         
@@ -0,0 +1,90 @@
+import json
+from django.http import HttpResponse
+from rest_framework.response import Response
+from .models import Data
+from .provinces import PROVINCES
+
+# Sama muotoilu kuin DRF:n JSONRenderer-oletuksilla (UNICODE_JSON, COMPACT_JSON, STRICT_JSON)
+ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+DATA_FIELDS = [f.name for f in Data._meta.fields]
+
+
+def _date(value):
+    return value.isoformat()
+
+
+def _float(value):
+    return float(value)
+
+
+def _int(value):
+    return int(value)
+
+
+def _str(value):
+    return str(value)
+
+
+CONVERTERS = {
+    "DateField": _date,
+    "FloatField": _float,
+    "IntegerField": _int,
+    "BigIntegerField": _int,
+    "BigAutoField": _int,
+    "PositiveSmallIntegerField": _int,
+    "CharField": _str,
+    "TextField": _str,
+}
+
+
+class DataRows:
+    """
+    Havaintolistausten nopea polku: rivit luetaan .values_list()-tupleina ja muunnetaan
+    suoraan JSON-valmiiksi sanakirjoiksi ilman DataSerializerin kenttäkohtaista käsittelyä.
+    Tulos on sama kuin DataSerializer(items, many=True, fields=fields).data.
+
+    province_codes=True palauttaa operator-kentän ELY-keskuksen koodina (/api/data/),
+    muuten koko nimenä (/api/province/).
+    """
+
+    def __init__(self, fields=None, province_codes=False):
+        self.fields = [f for f in DATA_FIELDS if fields is None or f in fields]
+        self.province_codes = province_codes
+        # operator muodostetaan province- ja operator-sarakkeista, joten province luetaan aina
+        self.columns = tuple(self.fields) + ("province",)
+        self._province_index = len(self.fields)
+        self._spec = [
+            (name, index, CONVERTERS[Data._meta.get_field(name).get_internal_type()])
+            for index, name in enumerate(self.fields)
+        ]
+        self._operator = "operator" in self.fields
+
+    def values(self, items, *extra):
+        """queryset -> values_list; extra-sarakkeet tulevat tuplen loppuun (esim. sivutuskursori)."""
+        return items.values_list(*self.columns, *extra)
+
+    def to_dict(self, row):
+        data = {name: None if row[index] is None else convert(row[index]) for name, index, convert in self._spec}
+        province = row[self._province_index]
+        if self._operator and province is not None:
+            data["operator"] = province if self.province_codes else PROVINCES.get(province, data["operator"])
+        return data
+
+    def rows(self, items, *extra):
+        return [self.to_dict(row) for row in self.values(items, *extra)]
+
+
+def render_json(data):
+    """Koodaa vastauksen tavuiksi täsmälleen kuten JSONRenderer."""
+    text = ENCODER.encode(data)
+    # JSONRenderer pakottaa U+2028/U+2029 -merkit JavaScript-yhteensopiviksi
+    text = text.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+    return text.encode("utf-8")
+
+
+def json_response(request, data, status=200):
+    """JSON-pyynnöille valmiiksi koodattu vastaus; selattava API (text/html) käyttää tavallista Responsea."""
+    renderer = getattr(request, "accepted_renderer", None)
+    if renderer is not None and renderer.format != "json":
+        return Response(data, status=status)
+    return HttpResponse(render_json(data), status=status, content_type="application/json")
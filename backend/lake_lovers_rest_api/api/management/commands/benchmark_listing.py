@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from api.listing import DataRows, render_json
+from api.models import Data
+from api.serializers import DataSerializer
+import time
+
+class Command(BaseCommand):
+    help = 'Compares DataSerializer + JSONRenderer against the values_list fast path (rows per second)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of timed rounds per method (best round is reported)')
+
+    def handle(self, *args, **kwargs):
+        items = Data.objects.order_by('id')
+        rivejä = items.count()
+        if not rivejä:
+            self.stderr.write("Data-taulu on tyhjä; aja ensin populate_db tai sync_observations.")
+            return
+
+        menetelmät = {
+            'DataSerializer': lambda: JSONRenderer().render(DataSerializer(items.all(), many=True).data),
+            'values_list': lambda: render_json(DataRows().rows(items.all())),
+        }
+        tulokset = {}
+        for nimi, aja in menetelmät.items():
+            ajat = []
+            for _ in range(kwargs['repeat']):
+                alku = time.perf_counter()
+                aja()
+                ajat.append(time.perf_counter() - alku)
+            tulokset[nimi] = min(ajat)
+            self.stdout.write(f"{nimi:>15}: {min(ajat) * 1000:8.1f} ms, {rivejä / min(ajat):10.0f} riviä/s")
+
+        self.stdout.write(f"Nopeutus: {tulokset['DataSerializer'] / tulokset['values_list']:.1f}x ({rivejä} riviä)")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from api.util.viikkotiedote import PÄIVIÄ, laadi_viikkotiedote
+import time
+
+class Command(BaseCommand):
+    help = 'Generates the algae bulletin from the Data table and stores it for /api/bulletin/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Repeat every N seconds (0 = run once)')
+        parser.add_argument('--days', type=int, default=PÄIVIÄ,
+                            help='Length of the observation window in days')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate even if a bulletin for the same input exists')
+
+    def handle(self, *args, **kwargs):
+        while True:
+            try:
+                tiedote = laadi_viikkotiedote(kwargs['days'], kwargs['force'])
+                if tiedote is not None:
+                    self.stdout.write(f"Tiedote #{tiedote.id} ({tiedote.date_from} - {tiedote.date_to}) tallennettu.")
+            except Exception as e:
+                self.stderr.write(f"VIRHE tiedotteen laadinnassa: {e}")
+                if not kwargs['interval']:
+                    raise
+
+            if not kwargs['interval']:
+                break
+            time.sleep(kwargs['interval'])
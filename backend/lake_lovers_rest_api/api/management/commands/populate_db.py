@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
-from api.models import Data
+from api.models import Data, assign_sync_seq
+from api.provinces import split_operator
+from django.db import transaction
 import pandas as pd
 import re
 
@@ -58,10 +60,12 @@ class Command(BaseCommand):
         data = []
 
         for index, row in df.iterrows():
+            province, operator = split_operator(row['ELY-keskus'])
             data.append(
                 Data(
                     location = row['Havaintopaikka'],
-                    operator = row['ELY-keskus'],
+                    province = province,
+                    operator = operator,
                     date = row['Päivämäärä'],
                     level = row['LevätilanneNum'],
                     txt = row['LevätilanneTxt'],
@@ -80,5 +84,7 @@ class Command(BaseCommand):
         data_set = self.db_upload()
 
         # create products & re-fetch from DB
-        Data.objects.bulk_create(data_set)
+        with transaction.atomic():
+            assign_sync_seq(data_set)
+            Data.objects.bulk_create(data_set)
         data_set = Data.objects.all()
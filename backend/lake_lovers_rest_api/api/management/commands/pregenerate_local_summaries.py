@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from django.db import connection
+from api.models import LocationClick
+from api.util.paikallinen import tiivistelmä
+
+class Command(BaseCommand):
+    help = 'Pre-generates local-area summaries for the most clicked map cells'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=50,
+                            help='Number of most clicked cells to generate')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Maximum number of concurrent LLM calls')
+
+    def handle(self, *args, **kwargs):
+        solut = list(LocationClick.objects.order_by('-clicks', '-last_clicked')[:kwargs['top']])
+
+        def generoi(klikkaus):
+            try:
+                return tiivistelmä(klikkaus.cell_lat, klikkaus.cell_lon, klikkaus.radius_km)
+            finally:
+                # Jokainen säie avaa oman tietokantayhteyden
+                connection.close()
+
+        onnistui = 0
+        with ThreadPoolExecutor(max_workers=kwargs['workers']) as pool:
+            tehtävät = {pool.submit(generoi, klikkaus): klikkaus for klikkaus in solut}
+            for tehtävä in as_completed(tehtävät):
+                klikkaus = tehtävät[tehtävä]
+                try:
+                    tehtävä.result()
+                    onnistui += 1
+                except Exception as e:
+                    self.stderr.write(f"VIRHE solussa {klikkaus.location} ({klikkaus.cell_lat}, {klikkaus.cell_lon}): {e}")
+
+        self.stdout.write(f"Esigeneroitu {onnistui}/{len(solut)} paikallista tiivistelmää.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from api.util.kansalaishavainnot import synkronoi
+import time
+
+class Command(BaseCommand):
+    help = 'Syncs the SYKE citizen algae observation feed into the local Data table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Repeat every N seconds (0 = run once)')
+        parser.add_argument('--url', default=None,
+                            help='Override the feed URL (e.g. a local stand-in server)')
+
+    def handle(self, *args, **kwargs):
+        while True:
+            try:
+                tulos = synkronoi(kwargs['url'])
+                self.stdout.write(
+                    f"Synkronoitu {tulos['haettu']} havaintoa: {tulos['uudet']} uutta, "
+                    f"{tulos['muuttuneet']} muuttunutta, {tulos['ennallaan']} ennallaan."
+                )
+            except Exception as e:
+                self.stderr.write(f"VIRHE syötteen synkronoinnissa: {e}")
+                if not kwargs['interval']:
+                    raise
+
+            if not kwargs['interval']:
+                break
+            time.sleep(kwargs['interval'])
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_legacy_schema"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="data",
+            name="service_request_id",
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,116 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Mallien aiemmat muutokset (Predict, ProvinceRequest, koordinaatit lat/lon-kentiksi), jotka
+    jaetussa db.sqlite3-tietokannassa on jo ajettu nimillä, joita repossa ei ole. replaces-lista
+    merkitsee tämän migraation ajetuksi, kun kaikki ne löytyvät django_migrations-taulusta;
+    uuteen tietokantaan muutokset tehdään tavallisesti.
+    """
+
+    replaces = [
+        ("api", "0003_remove_data_coordinates_data_latitude_data_longitude_and_more"),
+        ("api", "0004_alter_data_date"),
+        ("api", "0005_provincerequest"),
+        ("api", "0006_alter_provincerequest_province"),
+        ("api", "0007_predict_alter_provincerequest_province"),
+        ("api", "0008_alter_predict_date"),
+    ]
+
+    dependencies = [
+        ("api", "0002_alter_data_date"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Predict",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.CharField(max_length=255)),
+                ("lat", models.FloatField()),
+                ("lon", models.FloatField()),
+                ("name", models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ProvinceRequest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("province", models.IntegerField()),
+                ("date", models.DateField()),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name="data",
+            name="coordinates",
+        ),
+        migrations.AddField(
+            model_name="data",
+            name="latitude",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="data",
+            name="longitude",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="date",
+            field=models.DateField(),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="description",
+            field=models.TextField(default=""),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="level",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="location",
+            field=models.CharField(default="", max_length=1000),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="operator",
+            field=models.CharField(default="", max_length=500),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="tracking",
+            field=models.CharField(default="", max_length=500),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="txt",
+            field=models.CharField(default="", max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="upkeep",
+            field=models.CharField(default="", max_length=500),
+        ),
+    ]
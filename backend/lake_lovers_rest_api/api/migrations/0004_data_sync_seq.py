@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:12
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill_sync_seq(apps, schema_editor):
+    Data = apps.get_model("api", "Data")
+    SyncCounter = apps.get_model("api", "SyncCounter")
+    Data.objects.update(sync_seq=F("id"))
+    last = Data.objects.aggregate(last=Max("id"))["last"] or 0
+    SyncCounter.objects.update_or_create(name="data", defaults={"value": last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_data_service_request_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("value", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="data",
+            name="sync_seq",
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(backfill_sync_seq, migrations.RunPython.noop),
+    ]
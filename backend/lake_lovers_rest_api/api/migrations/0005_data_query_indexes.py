@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_data_sync_seq"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="data",
+            index=models.Index(
+                fields=["operator", "date"], name="api_data_operator_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="data",
+            index=models.Index(
+                fields=["date", "latitude", "longitude"],
+                name="api_data_date_lat_lon_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="data",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="api_data_lat_lon_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+# ELY-keskusten koodit migraation kirjoitushetkellä (api.provinces.PROVINCES voi muuttua myöhemmin)
+PROVINCES = {
+    1: "Lapin elinkeino-, liikenne- ja ympäristökeskus",
+    2: "Pohjois-Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    3: "Kainuun elinkeino-, liikenne- ja ympäristökeskus",
+    4: "Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    5: "Etelä-Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    6: "Keski-Suomen elinkeino-, liikenne- ja ympäristökeskus",
+    7: "Pohjois-Savon elinkeino-, liikenne- ja ympäristökeskus",
+    8: "Pohjois-Karjalan elinkeino-, liikenne- ja ympäristökeskus",
+    9: "Satakunnan elinkeino-, liikenne- ja ympäristökeskus",
+    10: "Pirkanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    11: "Hämeen elinkeino-, liikenne- ja ympäristökeskus",
+    12: "Etelä-Savon elinkeino-, liikenne- ja ympäristökeskus",
+    13: "Kaakkois-Suomen elinkeino-, liikenne- ja ympäristökeskus",
+    14: "Varsinais-Suomen elinkeino-, liikenne- ja ympäristökeskus",
+    15: "Uudenmaan elinkeino-, liikenne- ja ympäristökeskus",
+}
+
+
+def backfill_province(apps, schema_editor):
+    Data = apps.get_model("api", "Data")
+    for code, name in PROVINCES.items():
+        Data.objects.filter(operator=name).update(province=code, operator="")
+
+
+def restore_operator(apps, schema_editor):
+    Data = apps.get_model("api", "Data")
+    for code, name in PROVINCES.items():
+        Data.objects.filter(province=code).update(operator=name, province=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_data_query_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="data",
+            name="api_data_operator_date_idx",
+        ),
+        migrations.AddField(
+            model_name="data",
+            name="province",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="data",
+            name="operator",
+            field=models.CharField(blank=True, default="", max_length=500),
+        ),
+        migrations.RunPython(backfill_province, restore_operator),
+        migrations.AddIndex(
+            model_name="data",
+            index=models.Index(
+                fields=["province", "date"], name="api_data_province_date_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_bulletin"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LocationClick",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cell_lat", models.FloatField()),
+                ("cell_lon", models.FloatField()),
+                ("radius_km", models.FloatField()),
+                ("location", models.CharField(default="", max_length=1000)),
+                ("clicks", models.IntegerField(default=0)),
+                ("last_clicked", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("cell_lat", "cell_lon", "radius_km"),
+                        name="api_locationclick_cell_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,8 +1,34 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+
+class SyncCounter(models.Model):
+    """Monotoninen muutosnumerolaskuri Data-rivien delta-hakua varten."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    @classmethod
+    def reserve(cls, count=1, name="data"):
+        """
+        Varaa count peräkkäistä numeroa ja palauttaa ensimmäisen. Kutsuttava samassa
+        transaktiossa kuin rivien kirjoitus, jolloin numerot näkyvät lukijoille
+        kasvavassa järjestyksessä.
+        """
+        cls.objects.get_or_create(name=name)
+        cls.objects.filter(name=name).update(value=F("value") + count)
+        return cls.objects.get(name=name).value - count + 1
+
+def assign_sync_seq(rows):
+    """Antaa bulk_create/bulk_update-riveille uudet muutosnumerot (kutsu transaktion sisällä)."""
+    if not rows:
+        return
+    first = SyncCounter.reserve(len(rows))
+    for offset, row in enumerate(rows):
+        row.sync_seq = first + offset
 
 class Data(models.Model):
     location = models.CharField(max_length=1000, default="")
-    operator = models.CharField(max_length=500, default="")
+    # Vain ELY-keskukset, joilla ei ole koodia (esim. Ahvenanmaa); muut tallennetaan province-koodina
+    operator = models.CharField(max_length=500, default="", blank=True)
     date = models.DateField()
     level = models.IntegerField(default=0)
     txt = models.CharField(max_length=100, default="")
@@ -11,6 +37,27 @@ class Data(models.Model):
     description = models.TextField(default="")
     latitude = models.FloatField(default=0)
     longitude = models.FloatField(default=0)
+    # ELY-keskuksen koodi (api.provinces.PROVINCES)
+    province = models.PositiveSmallIntegerField(null=True, blank=True)
+    # SYKE:n kansalaishavaintosyötteen tunniste; tyhjä CSV-aineistosta tuoduilla riveillä
+    service_request_id = models.CharField(max_length=100, null=True, blank=True, unique=True)
+    # Kasvaa jokaisessa lisäyksessä ja muutoksessa; /api/data/?since=<cursor> hakee vain uudemmat
+    sync_seq = models.BigIntegerField(default=0, db_index=True)
+
+    class Meta:
+        indexes = [
+            # ELY-keskus + päivämäärä (ProvinceView, ?province=&date_from=)
+            models.Index(fields=["province", "date"], name="api_data_province_date_idx"),
+            # Aikaikkuna + rajausalue (kartan näkymä)
+            models.Index(fields=["date", "latitude", "longitude"], name="api_data_date_lat_lon_idx"),
+            # Pelkkä rajausalue
+            models.Index(fields=["latitude", "longitude"], name="api_data_lat_lon_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.sync_seq = SyncCounter.reserve()
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -29,4 +76,38 @@ class Predict(models.Model):
     name = models.CharField(max_length=255)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class Bulletin(models.Model):
+    """Kielimallin laatima sinilevätiedote; luodaan generate_bulletin-komennolla."""
+    date_from = models.DateField()
+    date_to = models.DateField()
+    # Syötekoosteen tiiviste: samasta datasta ei laadita uutta tiedotetta
+    input_digest = models.CharField(max_length=64, unique=True)
+    observations = models.IntegerField(default=0)
+    llm_model = models.CharField(max_length=100, default="")
+    text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+
+    def __str__(self):
+        return f"{self.date_from} - {self.date_to}"
+
+class LocationClick(models.Model):
+    """Paikallisen tiivistelmän hakumäärä per solu; suosituimmat esigeneroidaan."""
+    cell_lat = models.FloatField()
+    cell_lon = models.FloatField()
+    radius_km = models.FloatField()
+    location = models.CharField(max_length=1000, default="")
+    clicks = models.IntegerField(default=0)
+    last_clicked = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cell_lat", "cell_lon", "radius_km"], name="api_locationclick_cell_uniq"),
+        ]
+
+    def __str__(self):
+        return self.location
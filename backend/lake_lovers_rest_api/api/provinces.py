@@ -0,0 +1,38 @@
+PROVINCES = {
+    1 : "Lapin elinkeino-, liikenne- ja ympäristökeskus",
+    2 : "Pohjois-Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    3 : "Kainuun elinkeino-, liikenne- ja ympäristökeskus",
+    4 : "Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    5 : "Etelä-Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    6 : "Keski-Suomen elinkeino-, liikenne- ja ympäristökeskus",
+    7 : "Pohjois-Savon elinkeino-, liikenne- ja ympäristökeskus",
+    8 : "Pohjois-Karjalan elinkeino-, liikenne- ja ympäristökeskus",
+    9 : "Satakunnan elinkeino-, liikenne- ja ympäristökeskus",
+    10 : "Pirkanmaan elinkeino-, liikenne- ja ympäristökeskus",
+    11 : "Hämeen elinkeino-, liikenne- ja ympäristökeskus",
+    12 : "Etelä-Savon elinkeino-, liikenne- ja ympäristökeskus",
+    13 : "Kaakkois-Suomen elinkeino-, liikenne- ja ympäristökeskus",
+    14 : "Varsinais-Suomen elinkeino-, liikenne- ja ympäristökeskus",
+    15 : "Uudenmaan elinkeino-, liikenne- ja ympäristökeskus",
+}
+
+# Käänteinen haku: ELY-keskuksen nimi -> koodi
+PROVINCE_IDS = {name: code for code, name in PROVINCES.items()}
+
+
+def split_operator(operator):
+    """
+    Jakaa ELY-keskuksen nimen tallennettavaan muotoon (province, operator):
+    tunnetut keskukset koodina, muut (esim. Ahvenanmaa) alkuperäisenä merkkijonona.
+    """
+    code = PROVINCE_IDS.get(operator)
+    if code is not None:
+        return code, ""
+    return None, operator or ""
+
+
+def operator_name(province, operator):
+    """Palauttaa ELY-keskuksen koko nimen tallennetuista kentistä."""
+    if province is not None:
+        return PROVINCES.get(province, operator)
+    return operator
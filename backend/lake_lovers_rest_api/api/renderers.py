@@ -0,0 +1,124 @@
+import datetime
+import json
+import struct
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from .listing import render_json
+
+# Binäärimuodon numeeriset kentät; muut kentät kulkevat otsakkeen JSON-taulukkoina
+BINARY_DTYPES = {
+    "id": "uint32",
+    "latitude": "float32",
+    "longitude": "float32",
+    "level": "uint8",
+    "province": "uint8",   # 0 = ei koodia
+    "date": "int32",       # päiviä 1970-01-01:stä
+    "sync_seq": "uint32",
+}
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def split_rows(data):
+    """
+    Erottaa vastauksen havaintorivit ja muut kentät (sivutuksen next, delta-haun cursor).
+    Palauttaa (None, data), jos vastaus ei ole havaintolistaus (esim. virheilmoitus).
+    """
+    if isinstance(data, list):
+        return data, {}
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        return data["results"], {k: v for k, v in data.items() if k != "results"}
+    return None, data
+
+
+def columns_of(rows):
+    names = list(rows[0]) if rows else []
+    return {name: [row[name] for row in rows] for name in names}
+
+
+class RowsRenderer(BaseRenderer):
+    """Yhteinen pohja: virheet ja muut kuin havaintolistaukset palautetaan tavallisena JSONina."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get("response")
+        rows, meta = split_rows(data)
+        if rows is None or (response is not None and response.status_code >= 400):
+            if response is not None:
+                response["Content-Type"] = "application/json"
+            return JSONRenderer().render(data, renderer_context=renderer_context)
+        return self.render_rows(rows, meta)
+
+    def render_rows(self, rows, meta):
+        raise NotImplementedError
+
+
+class ColumnarJSONRenderer(RowsRenderer):
+    """{"count": n, "columns": {"id": [...], "latitude": [...], ...}} – kenttien nimet vain kerran."""
+    media_type = "application/vnd.lakelovers.columnar+json"
+    format = "columnar"
+    charset = None
+
+    def render_rows(self, rows, meta):
+        return render_json({**meta, "count": len(rows), "columns": columns_of(rows)})
+
+
+class GeoJSONRenderer(RowsRenderer):
+    """GeoJSON FeatureCollection; latitude/longitude siirtyvät geometriaan, muut kentät ominaisuuksiin."""
+    media_type = "application/geo+json"
+    format = "geojson"
+    charset = None
+
+    def render_rows(self, rows, meta):
+        features = []
+        for row in rows:
+            properties = {k: v for k, v in row.items() if k not in ("id", "latitude", "longitude")}
+            feature = {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [row.get("longitude"), row.get("latitude")]},
+                "properties": properties,
+            }
+            if "id" in row:
+                feature["id"] = row["id"]
+            features.append(feature)
+        return render_json({"type": "FeatureCollection", **meta, "features": features})
+
+
+class BinaryRenderer(RowsRenderer):
+    """
+    Tyypitetyt taulukot karttamerkeille:
+
+        uint32 (little-endian)  otsakkeen pituus N
+        N tavua                 JSON-otsake: count, muut kentät ja "fields"-kuvaukset
+        data                    numeeriset kentät peräkkäin little-endian-taulukoina
+
+    Otsake täytetään välilyönneillä niin, että data alkaa 4:llä jaollisesta kohdasta ja
+    jokainen taulukko on tasattu, jolloin selain voi lukea sen suoraan (new Float32Array(buf, offset, count)).
+    Kenttien offset on suhteessa data-osan alkuun. Muut kuin numeeriset kentät ovat otsakkeessa arvolistoina.
+    """
+    media_type = "application/vnd.lakelovers.markers"
+    format = "binary"
+    charset = None
+
+    def render_rows(self, rows, meta):
+        fields = []
+        arrays = []
+        offset = 0
+        for name, values in columns_of(rows).items():
+            dtype = BINARY_DTYPES.get(name)
+            if dtype is None or (name != "province" and None in values):
+                fields.append({"name": name, "values": values})
+                continue
+            if name == "date":
+                values = [(datetime.date.fromisoformat(v) - EPOCH).days for v in values]
+            elif name == "province":
+                values = [v or 0 for v in values]
+            array = np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+            fields.append({"name": name, "dtype": dtype, "offset": offset})
+            arrays.append(array.tobytes())
+            offset += len(arrays[-1])
+            padding = -offset % 4
+            arrays.append(b"\0" * padding)
+            offset += padding
+
+        header = json.dumps({**meta, "count": len(rows), "fields": fields}, ensure_ascii=False).encode("utf-8")
+        header += b" " * (-(4 + len(header)) % 4)
+        return struct.pack("<I", len(header)) + header + b"".join(arrays)
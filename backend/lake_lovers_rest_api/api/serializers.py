@@ -1,18 +1,116 @@
 from rest_framework import serializers
-from .models import Data, ProvinceRequest, Predict
+from .models import Data, ProvinceRequest, Predict, Bulletin
+from .provinces import operator_name
 
 
 class DataSerializer(serializers.ModelSerializer):
+    # ELY-keskuksen koko nimi: tallennettu koodina (province) tai tuntemattomana merkkijonona
+    operator = serializers.SerializerMethodField()
+
     class Meta:
         model = Data
-        fields = '__all__'
+        # Mallin kenttäjärjestys (ilmoitettu operator-kenttä siirtyisi muuten heti id:n perään)
+        fields = [f.name for f in Data._meta.fields]
+
+    def get_operator(self, obj):
+        return operator_name(obj.province, obj.operator)
+
+    def __init__(self, *args, **kwargs):
+        # Valinnainen kenttärajaus (projektio), esim. DataSerializer(items, many=True, fields=["id", "date"])
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class DataQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    province = serializers.IntegerField(required=False, min_value=1, max_value=15)
+    min_level = serializers.IntegerField(required=False, min_value=0, max_value=3)
+    lat_min = serializers.FloatField(required=False)
+    lat_max = serializers.FloatField(required=False)
+    lon_min = serializers.FloatField(required=False)
+    lon_max = serializers.FloatField(required=False)
+    since = serializers.IntegerField(required=False, min_value=0)
+    after = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=5000)
+    stream = serializers.BooleanField(required=False, default=False)
 
 class ProvinceRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProvinceRequest 
         fields = '__all__'
 
+class ProvinceRangeRequestSerializer(serializers.Serializer):
+    provinces = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=15), allow_empty=False)
+    date_from = serializers.DateField()
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        data.setdefault("date_to", data["date_from"])
+        if data["date_to"] < data["date_from"]:
+            raise serializers.ValidationError("date_to ei voi olla ennen date_from-päivää.")
+        return data
+
 class PredictSerializer(serializers.ModelSerializer):
     class Meta:
         model = Predict
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class HotspotQuerySerializer(serializers.Serializer):
+    temp_factor = serializers.FloatField(required=False, default=1.02)
+    precip_factor = serializers.FloatField(required=False, default=1.2)
+    wind_factor = serializers.FloatField(required=False, default=1.0)
+    year = serializers.IntegerField(required=False, default=2026, min_value=2000, max_value=2100)
+    months = serializers.CharField(required=False, default="5,6,7,8,9")
+    top_n = serializers.IntegerField(required=False, default=10, min_value=1, max_value=1000)
+    province = serializers.IntegerField(required=False, min_value=1, max_value=15)
+    lat_min = serializers.FloatField(required=False)
+    lat_max = serializers.FloatField(required=False)
+    lon_min = serializers.FloatField(required=False)
+    lon_max = serializers.FloatField(required=False)
+
+    def validate_months(self, value):
+        try:
+            months = tuple(sorted({int(m) for m in value.split(",") if m.strip()}))
+        except ValueError:
+            raise serializers.ValidationError("Kuukaudet pilkuilla eroteltuina, esim. '5,6,7'.")
+        if not months or any(m < 1 or m > 12 for m in months):
+            raise serializers.ValidationError("Kuukausien tulee olla väliltä 1-12.")
+        return months
+
+    def validate(self, data):
+        bbox = [data.get(k) for k in ("lat_min", "lat_max", "lon_min", "lon_max")]
+        if any(v is not None for v in bbox) and any(v is None for v in bbox):
+            raise serializers.ValidationError("Rajausalueeseen tarvitaan lat_min, lat_max, lon_min ja lon_max.")
+        return data
+
+class ClusterQuerySerializer(serializers.Serializer):
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+    lat_min = serializers.FloatField(min_value=-90, max_value=90)
+    lat_max = serializers.FloatField(min_value=-90, max_value=90)
+    lon_min = serializers.FloatField(min_value=-180, max_value=180)
+    lon_max = serializers.FloatField(min_value=-180, max_value=180)
+
+    def validate(self, data):
+        if data["lat_min"] > data["lat_max"] or data["lon_min"] > data["lon_max"]:
+            raise serializers.ValidationError("Rajausalueen minimin tulee olla pienempi kuin maksimin.")
+        return data
+
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, min_value=0, max_value=500)
+    k = serializers.IntegerField(required=False, default=10, min_value=1, max_value=100)
+    recent = serializers.IntegerField(required=False, default=5, min_value=0, max_value=50)
+
+class LocalSummaryQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lon = serializers.FloatField(min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(required=False, default=10, min_value=1, max_value=50)
+
+class BulletinSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Bulletin
+        fields = ['id', 'date_from', 'date_to', 'observations', 'llm_model', 'text', 'created_at']
@@ -1,3 +1,1169 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import sys
+import tempfile
+import threading
+from unittest import mock, skipUnless
+import joblib
+import numpy as np
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from xgboost import XGBClassifier
+from .listing import DataRows, render_json
+from .models import Bulletin, Data, LocationClick
+from .provinces import PROVINCE_IDS, PROVINCES
+from .serializers import DataSerializer
+from .util import aineisto, kehote, kielimalli, klusterointi, paikallinen, paikkaindeksi
+from .util.Ennustaja import FEATURE_ORDER, RISKITASOT, predict_func
+from .util.Ennustaja2 import Skenaario, ai_predict_hotspots, luo_ennuste_datakehys_ilmastomuutoksella
+from .util.ilmastotaulukko import MIN_HAVAINNOT, hae_ilmastotaulukko, rakenna_ilmastotaulukko
+from .util.kansalaishavainnot import synkronoi
+from .util.riskialuevalimuisti import hae_riskialueet
+from .util.mallirekisteri import INPUT_FILE, MODEL_FILE, SÄÄSARAKKEET, lataa_historia, lataa_malli, rekisteri
+from .util.viikkotiedote import laadi_viikkotiedote
 
-# Create your tests here.
+# Rikastusskriptien apumoduulit (saa_asiakas, saavarasto, ...) ovat backend-hakemistossa
+sys.path.insert(0, str(settings.BASE_DIR.parent))
+import saa_asiakas  # noqa: E402
+import saavarasto  # noqa: E402
+import Datan_yhd  # noqa: E402
+
+
+def feed_item(service_request_id, level=2, status="open", requested="2025-07-01T10:00:00+03:00"):
+    return {
+        "service_request_id": service_request_id,
+        "requested_datetime": requested,
+        "status": status,
+        "agency_responsible": "SYKE",
+        "description": "Levää rannassa",
+        "lat": 61.5,
+        "long": 24.0,
+        "attributes": {"algaebloom_singlevaluelist_201808151546174": str(level)},
+    }
+
+
+class StandInFeed:
+    """Paikallinen HTTP-palvelin, joka tarjoilee SYKE-syötteen korvikkeen testeille."""
+
+    def __init__(self, items):
+        self.items = items
+        feed = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(feed.items).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/requests.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FeedSyncTests(TestCase):
+    def setUp(self):
+        self.feed = StandInFeed([feed_item("a1"), feed_item("a2", level=0)])
+        self.addCleanup(self.feed.close)
+
+    def test_sync_inserts_new_observations(self):
+        result = synkronoi(self.feed.url)
+
+        self.assertEqual(result["uudet"], 2)
+        row = Data.objects.get(service_request_id="a1")
+        self.assertEqual(row.level, 2)
+        self.assertEqual(row.date.isoformat(), "2025-07-01")
+        self.assertEqual(row.upkeep, "SYKE")
+
+    def test_sync_upserts_changed_and_skips_unchanged(self):
+        synkronoi(self.feed.url)
+        self.feed.items = [feed_item("a1", level=3, status="closed"), feed_item("a2", level=0), feed_item("a3")]
+
+        result = synkronoi(self.feed.url)
+
+        self.assertEqual((result["uudet"], result["muuttuneet"], result["ennallaan"]), (1, 1, 1))
+        self.assertEqual(Data.objects.filter(service_request_id__isnull=False).count(), 3)
+        self.assertEqual(Data.objects.get(service_request_id="a1").level, 3)
+
+    def test_data_view_reads_synced_rows_from_local_storage(self):
+        synkronoi(self.feed.url)
+        self.feed.close()
+
+        response = self.client.get("/api/data/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row["service_request_id"] for row in response.json()}, {"a1", "a2"})
+
+    def test_sync_assigns_province_of_nearest_station(self):
+        Data.objects.create(location="Näsijärvi", date=datetime.date(2024, 7, 1), latitude=61.55, longitude=23.9, province=10)
+        Data.objects.create(location="Vantaa", date=datetime.date(2024, 7, 1), latitude=60.3, longitude=25.0, province=15)
+        self.feed.items = [feed_item("a1"), {**feed_item("a2"), "lat": 68.5, "long": 27.0}]
+
+        synkronoi(self.feed.url)
+
+        self.assertEqual(Data.objects.get(service_request_id="a1").province, 10)
+        self.assertIsNone(Data.objects.get(service_request_id="a2").province)
+        response = self.client.get("/api/data/", {"province": 10})
+        self.assertIn("a1", {row["service_request_id"] for row in response.json()})
+
+
+class DataDeltaTests(TestCase):
+    def setUp(self):
+        self.feed = StandInFeed([feed_item("a1"), feed_item("a2")])
+        self.addCleanup(self.feed.close)
+        synkronoi(self.feed.url)
+
+    def test_since_returns_only_changes_after_cursor(self):
+        first = self.client.get("/api/data/", {"since": 0}).json()
+        self.assertEqual(len(first["results"]), 2)
+
+        self.feed.items = [feed_item("a1", level=3), feed_item("a2"), feed_item("a3")]
+        synkronoi(self.feed.url)
+        second = self.client.get("/api/data/", {"since": first["cursor"]}).json()
+
+        self.assertEqual({row["service_request_id"] for row in second["results"]}, {"a1", "a3"})
+        self.assertGreater(second["cursor"], first["cursor"])
+        self.assertEqual(self.client.get("/api/data/", {"since": second["cursor"]}).json()["results"], [])
+
+    def test_since_pages_with_limit(self):
+        page = self.client.get("/api/data/", {"since": 0, "limit": 1}).json()
+
+        self.assertEqual(len(page["results"]), 1)
+        self.assertTrue(page["has_more"])
+
+
+def create_observations():
+    for i, (lat, level, day) in enumerate([(60.1, 0, 1), (60.5, 2, 2), (61.5, 3, 3), (65.0, 1, 4)]):
+        Data.objects.create(
+            location=f"Järvi {i}",
+            province=10 if i < 3 else None,
+            date=datetime.date(2025, 7, day),
+            level=level,
+            latitude=lat,
+            longitude=24.0,
+        )
+
+
+class DataFilterTests(TestCase):
+    def setUp(self):
+        create_observations()
+
+    def test_filters_by_date_province_level_and_bbox(self):
+        response = self.client.get("/api/data/", {
+            "date_from": "2025-07-02", "province": 10, "min_level": 2,
+            "lat_min": 60, "lat_max": 61, "lon_min": 23, "lon_max": 25,
+        })
+
+        self.assertEqual([row["location"] for row in response.json()], ["Järvi 1"])
+        self.assertEqual(response.json()[0]["operator"], 10)
+
+    def test_projection_and_keyset_pagination(self):
+        first = self.client.get("/api/data/", {"fields": "id,level", "limit": 3}).json()
+        second = self.client.get("/api/data/", {"fields": "id,level", "limit": 3, "after": first["next"]}).json()
+
+        self.assertEqual(set(first["results"][0]), {"id", "level"})
+        self.assertEqual(len(first["results"]) + len(second["results"]), 4)
+        self.assertIsNone(second["next"])
+
+
+class ProvinceViewTests(TestCase):
+    def setUp(self):
+        create_observations()
+
+    def test_single_province_and_day(self):
+        response = self.client.post("/api/province/", {"province": 10, "date": "2025-07-02"}, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row["location"] for row in response.json()], ["Järvi 1"])
+
+    def test_grouped_by_province_and_day(self):
+        response = self.client.post("/api/province/", {
+            "provinces": [10, 15], "date_from": "2025-07-01", "date_to": "2025-07-02",
+        }, content_type="application/json")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(list(response.json()["10"]), ["2025-07-01", "2025-07-02"])
+        self.assertEqual(response.json()["10"]["2025-07-01"][0]["operator"], "Pirkanmaan elinkeino-, liikenne- ja ympäristökeskus")
+        self.assertEqual(response.json()["15"], {})
+
+
+class DataStreamTests(TestCase):
+    def setUp(self):
+        create_observations()
+
+    def test_stream_matches_buffered_response(self):
+        buffered = self.client.get("/api/data/", {"province": 10})
+        streamed = self.client.get("/api/data/", {"province": 10, "stream": 1})
+
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(json.loads(b"".join(streamed.streaming_content)), buffered.json())
+
+    def test_stream_spans_several_chunks(self):
+        with mock.patch("api.views.DATA_STREAM_CHUNK", 3):
+            streamed = self.client.get("/api/data/", {"stream": 1, "fields": "id,level"})
+
+        self.assertEqual(len(json.loads(b"".join(streamed.streaming_content))), 4)
+
+
+class FastListingParityTests(TestCase):
+    def setUp(self):
+        create_observations()
+        Data.objects.create(
+            location="Kastelholm", operator="Ahvenanmaan maakunta", date=datetime.date(2025, 8, 1),
+            level=2, description="Rivi\u2028vaihto ja \"lainaus\" äöå", latitude=60.2312345678, longitude=19.99,
+            service_request_id="x1",
+        )
+
+    def assertRendersLikeSerializer(self, fields=None, province_codes=False):
+        items = Data.objects.order_by("id")
+        expected = DataSerializer(items, many=True, fields=fields).data
+        if province_codes:
+            expected = [
+                {**row, "operator": PROVINCE_IDS.get(row["operator"], row["operator"])} if "operator" in row else row
+                for row in expected
+            ]
+
+        fast = render_json(DataRows(fields, province_codes).rows(items))
+
+        self.assertEqual(fast, JSONRenderer().render(expected))
+
+    def test_all_fields_byte_identical(self):
+        self.assertRendersLikeSerializer()
+        self.assertRendersLikeSerializer(province_codes=True)
+
+    def test_projection_byte_identical(self):
+        self.assertRendersLikeSerializer(fields=["id", "operator", "latitude", "date"], province_codes=True)
+
+
+class DataFormatTests(TestCase):
+    def setUp(self):
+        create_observations()
+
+    def test_columnar(self):
+        response = self.client.get("/api/data/", {"format": "columnar", "fields": "id,level"})
+
+        self.assertEqual(response["Content-Type"], "application/vnd.lakelovers.columnar+json")
+        body = json.loads(response.content)
+        self.assertEqual(body["count"], 4)
+        self.assertEqual(list(body["columns"]), ["id", "level"])
+        self.assertEqual(body["columns"]["level"], [0, 2, 3, 1])
+
+    def test_geojson_by_accept_header(self):
+        response = self.client.get("/api/data/", {"fields": "level"}, HTTP_ACCEPT="application/geo+json")
+
+        body = json.loads(response.content)
+        self.assertEqual(body["type"], "FeatureCollection")
+        self.assertEqual(body["features"][0]["geometry"], {"type": "Point", "coordinates": [24.0, 60.1]})
+        self.assertEqual(body["features"][0]["properties"], {"level": 0})
+
+    def test_binary_typed_arrays(self):
+        response = self.client.get("/api/data/", {"format": "binary", "fields": "latitude,level,date"})
+
+        length = int.from_bytes(response.content[:4], "little")
+        header = json.loads(response.content[4:4 + length])
+        body = response.content[4 + length:]
+        fields = {f["name"]: f for f in header["fields"]}
+        self.assertEqual((4 + length) % 4, 0)
+        self.assertEqual(header["count"], 4)
+        lat = np.frombuffer(body, dtype="<f4", count=4, offset=fields["latitude"]["offset"])
+        level = np.frombuffer(body, dtype="u1", count=4, offset=fields["level"]["offset"])
+        days = np.frombuffer(body, dtype="<i4", count=4, offset=fields["date"]["offset"])
+        np.testing.assert_allclose(lat, [60.1, 60.5, 61.5, 65.0], rtol=1e-6)
+        self.assertEqual(level.tolist(), [0, 2, 3, 1])
+        self.assertEqual(datetime.date(1970, 1, 1) + datetime.timedelta(days=int(days[0])), datetime.date(2025, 7, 1))
+
+    def test_errors_stay_json(self):
+        response = self.client.get("/api/data/", {"format": "binary", "limit": 0})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("limit", json.loads(response.content))
+
+
+class ClusterTests(TestCase):
+    finland = {"lat_min": 59, "lat_max": 70, "lon_min": 19, "lon_max": 32}
+
+    def setUp(self):
+        klusterointi.indeksi = klusterointi.KlusteriIndeksi()
+        create_observations()
+
+    def test_low_zoom_merges_and_high_zoom_splits(self):
+        low = self.client.get("/api/clusters/", {"zoom": 2, **self.finland}).json()["clusters"]
+        high = self.client.get("/api/clusters/", {"zoom": 12, **self.finland}).json()["clusters"]
+
+        self.assertEqual(sum(c["count"] for c in low), 4)
+        self.assertLess(len(low), 4)
+        self.assertEqual(len(high), 4)
+        self.assertEqual(max(c["max_level"] for c in low), 3)
+
+    def test_index_updates_incrementally(self):
+        self.client.get("/api/clusters/", {"zoom": 12, **self.finland})
+        row = Data.objects.get(level=3)
+        row.level = 0
+        row.save()
+        Data.objects.create(location="Uusi", date=datetime.date(2025, 7, 5), level=2, latitude=62.0, longitude=25.0)
+
+        clusters = self.client.get("/api/clusters/", {"zoom": 0, **self.finland}).json()["clusters"]
+
+        self.assertEqual(clusters, [{"lat": clusters[0]["lat"], "lon": clusters[0]["lon"], "count": 5, "max_level": 2, "levels": [2, 1, 2, 0]}])
+
+    def test_viewport_limits_results(self):
+        clusters = self.client.get("/api/clusters/", {"zoom": 12, "lat_min": 64, "lat_max": 66, "lon_min": 23, "lon_max": 25}).json()["clusters"]
+
+        self.assertEqual([(c["count"], c["lat"]) for c in clusters], [(1, 65.0)])
+
+
+class NearbyTests(TestCase):
+    def setUp(self):
+        paikkaindeksi.asemat = paikkaindeksi.Asemaindeksi()
+        create_observations()
+        Data.objects.create(location="Järvi 0", date=datetime.date(2025, 7, 9), level=1, latitude=60.1, longitude=24.0)
+
+    def test_radius_returns_nearest_stations_with_recent_observations(self):
+        stations = self.client.get("/api/nearby/", {"lat": 60.12, "lon": 24.0, "radius_km": 50, "recent": 1}).json()
+
+        self.assertEqual([s["location"] for s in stations], ["Järvi 0", "Järvi 1"])
+        self.assertAlmostEqual(stations[0]["distance_km"], 2.22, places=2)
+        self.assertEqual([o["date"] for o in stations[0]["observations"]], ["2025-07-09"])
+
+    def test_k_nearest_without_radius_and_incremental_update(self):
+        self.client.get("/api/nearby/", {"lat": 60.0, "lon": 24.0})
+        Data.objects.create(location="Uusi", date=datetime.date(2025, 7, 10), level=0, latitude=70.0, longitude=27.0)
+
+        stations = self.client.get("/api/nearby/", {"lat": 69.9, "lon": 27.0, "k": 2, "recent": 0}).json()
+
+        self.assertEqual([s["location"] for s in stations], ["Uusi", "Järvi 3"])
+
+    def test_observations_for_all_stations_in_one_query(self):
+        self.client.get("/api/nearby/", {"lat": 60.0, "lon": 24.0, "recent": 0})
+
+        with self.assertNumQueries(2):  # Indeksin päivitys + havainnot
+            stations = self.client.get("/api/nearby/", {"lat": 60.0, "lon": 24.0, "k": 4, "recent": 2}).json()
+
+        self.assertEqual([len(s["observations"]) for s in stations], [2, 1, 1, 1])
+        self.assertEqual([o["date"] for o in stations[0]["observations"]], ["2025-07-09", "2025-07-01"])
+
+
+@override_settings(LLM_BACKEND="fake", LLM_MODEL="fake-test", LLM_FAKE_DELAY=0.2)
+class AiSummaryCacheTests(TestCase):
+    def setUp(self):
+        caches["ai"].clear()
+        kielimalli._taustajärjestelmät.clear()
+        self.feed = StandInFeed([feed_item("a1"), feed_item("a2", level=0)])
+        self.addCleanup(self.feed.close)
+        synkronoi(self.feed.url)
+
+    def test_identical_input_is_generated_once(self):
+        first = self.client.get("/api/ai/")
+        second = self.client.get("/api/ai/")
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 1)
+
+    def test_new_observations_invalidate(self):
+        first = self.client.get("/api/ai/").json()
+        self.feed.items.append(feed_item("a3", level=3))
+        synkronoi(self.feed.url)
+
+        self.assertNotEqual(self.client.get("/api/ai/").json(), first)
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 2)
+
+    def test_concurrent_requests_share_one_generation(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            texts = list(pool.map(lambda _: kielimalli.generoi("sama", "järjestelmä", "kehote", 0.4), range(8)))
+
+        self.assertEqual(len(set(texts)), 1)
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 1)
+
+
+@override_settings(LLM_BACKEND="fake", LLM_MODEL="fake-test", LLM_FAKE_DELAY=0.05)
+class AiStreamTests(TestCase):
+    def setUp(self):
+        caches["ai"].clear()
+        kielimalli._taustajärjestelmät.clear()
+        create_observations()
+        Data.objects.filter(location="Järvi 0").update(service_request_id="a1")
+
+    async def read_events(self):
+        response = await self.async_client.get("/api/ai/stream/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode("utf-8")
+        events = [block.split("\n") for block in body.strip().split("\n\n")]
+        return [(lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))) for lines in events]
+
+    async def test_streams_chunks_then_done_and_matches_cached_text(self):
+        events = await self.read_events()
+
+        self.assertGreater(len(events), 2)
+        self.assertEqual(events[-1], ("done", ""))
+        text = "".join(data for event, data in events if event == "chunk")
+
+        cached = await self.read_events()
+        summary = await self.async_client.get("/api/ai/")
+
+        self.assertEqual(cached, [("chunk", text), ("done", "")])
+        self.assertEqual(summary.json(), text)
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 1)
+
+    async def test_prompt_error_is_sent_as_error_event(self):
+        with mock.patch("api.views.ai_summary_prompt", side_effect=ValueError("ei havaintoja")):
+            events = await self.read_events()
+
+        self.assertEqual(events, [("error", "ei havaintoja")])
+
+
+class PromptBuilderTests(TestCase):
+    def setUp(self):
+        for i in range(300):
+            Data.objects.create(
+                location=f"Järvi {i % 40}", province=i % 15 + 1, date=datetime.date(2025, 7, 1 + i % 7),
+                level=i % 4, description=f"Havainto {i}: " + "vihreää levää rannassa " * 10,
+                latitude=61.0, longitude=24.0,
+            )
+
+    def test_aggregates_observations(self):
+        df = kehote.lue_havainnot(datetime.date(2025, 7, 1), datetime.date(2025, 7, 7))
+        prompt = kehote.rakenna_kehote(df, "OHJE", budjetti=100000)
+
+        self.assertEqual(prompt.havaintoja, 300)
+        self.assertEqual(prompt.karsittuja_rivejä, 0)
+        self.assertIn("Havaintoja yhteensä 300 (01.07.2025 - 07.07.2025), 40 havaintopaikkaa, 15 ELY-keskusta.", prompt.teksti)
+        self.assertIn("Erittäin runsaasti levää: 75 havaintoa", prompt.teksti)
+        self.assertEqual(len(kehote.kohteet(df)), kehote.KOHTEITA)
+        self.assertTrue(all(len(r) < kehote.OTTEEN_PITUUS + 60 for r in kehote.lisätiedot(df)))
+
+    def test_budget_trims_least_important_sections_first(self):
+        df = kehote.lue_havainnot(datetime.date(2025, 7, 1), datetime.date(2025, 7, 7))
+        prompt = kehote.rakenna_kehote(df, "OHJE", budjetti=400)
+
+        self.assertLessEqual(prompt.tokenit, 400)
+        self.assertGreater(prompt.karsittuja_rivejä, 0)
+        self.assertIn("YLEISTILANNE", prompt.teksti)
+        self.assertNotIn("LISÄTIEDOT", prompt.teksti)
+
+    def test_unknown_level_does_not_break_prompt(self):
+        Data.objects.create(location="Järvi X", province=10, date=datetime.date(2025, 7, 7), level=7,
+                            description="Outo taso syötteessä", latitude=61.0, longitude=24.0)
+        df = kehote.lue_havainnot(datetime.date(2025, 7, 1), datetime.date(2025, 7, 7))
+
+        prompt = kehote.rakenna_kehote(df, "OHJE", budjetti=100000)
+
+        self.assertIn("Järvi X (Pirkanmaan elinkeino-, liikenne- ja ympäristökeskus): tuntematon levätilanne (7)", prompt.teksti)
+
+
+@override_settings(LLM_BACKEND="fake", LLM_MODEL="fake-test", LLM_FAKE_DELAY=0)
+class BulletinTests(TestCase):
+    def setUp(self):
+        kielimalli._taustajärjestelmät.clear()
+        create_observations()
+
+    def test_no_bulletin_yet(self):
+        self.assertEqual(self.client.get("/api/bulletin/").status_code, 404)
+
+    def test_generated_once_per_input_and_served_from_storage(self):
+        first = laadi_viikkotiedote()
+        again = laadi_viikkotiedote()
+
+        self.assertEqual(first.pk, again.pk)
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 1)
+        self.assertEqual((first.date_from, first.date_to), (datetime.date(2025, 6, 14), datetime.date(2025, 7, 4)))
+
+        response = self.client.get("/api/bulletin/").json()
+        self.assertEqual((response["text"], response["observations"]), (first.text, 4))
+
+    def test_new_observations_produce_new_bulletin(self):
+        laadi_viikkotiedote()
+        Data.objects.create(location="Uusi", date=datetime.date(2025, 7, 5), level=3, latitude=62.0, longitude=25.0)
+
+        latest = laadi_viikkotiedote()
+
+        self.assertEqual(Bulletin.objects.count(), 2)
+        self.assertEqual(self.client.get("/api/bulletin/").json()["id"], latest.id)
+
+
+def use_temporary_summary_cache(test):
+    """Ohjaa paikallisten tiivistelmien levyvälimuistin testikohtaiseen hakemistoon."""
+    kansio = tempfile.TemporaryDirectory()
+    test.addCleanup(kansio.cleanup)
+    asetukset = override_settings(CACHES={
+        **settings.CACHES,
+        "local-summaries": {**settings.CACHES["local-summaries"], "LOCATION": kansio.name},
+    })
+    asetukset.enable()
+    test.addCleanup(asetukset.disable)
+
+
+@override_settings(LLM_BACKEND="fake", LLM_MODEL="fake-test", LLM_FAKE_DELAY=0)
+class LocalSummaryTests(TestCase):
+    def setUp(self):
+        use_temporary_summary_cache(self)
+        caches["ai"].clear()
+        kielimalli._taustajärjestelmät.clear()
+        paikkaindeksi.asemat = paikkaindeksi.Asemaindeksi()
+        create_observations()
+
+    def test_nearby_clicks_share_cached_summary(self):
+        first = self.client.get("/api/local-summary/", {"lat": 60.11, "lon": 24.01, "radius_km": 50})
+        second = self.client.get("/api/local-summary/", {"lat": 60.09, "lon": 23.99, "radius_km": 50})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first.json()["cell"], [60.1, 24.0])
+        self.assertEqual(first.json()["latest_observation"], "2025-07-02")
+        self.assertEqual(first.json()["observations"], 2)
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 1)
+
+        click = LocationClick.objects.get()
+        self.assertEqual((click.cell_lat, click.cell_lon, click.clicks), (60.1, 24.0, 2))
+
+    def test_new_observation_invalidates_cell(self):
+        paikallinen.tiivistelmä(60.1, 24.0, 50)
+        Data.objects.create(location="Järvi 0", date=datetime.date(2025, 7, 9), level=3, latitude=60.1, longitude=24.0)
+
+        summary = paikallinen.tiivistelmä(60.1, 24.0, 50)
+
+        self.assertEqual(summary["latest_observation"], "2025-07-09")
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 2)
+
+    def test_no_stations_within_radius(self):
+        response = self.client.get("/api/local-summary/", {"lat": 68.0, "lon": 27.0, "radius_km": 10})
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(LocationClick.objects.exists())
+
+    def test_repeat_click_updates_last_clicked(self):
+        paikallinen.tiivistelmä(60.1, 24.0, 50, kirjaa_klikkaus=True)
+        first = LocationClick.objects.get().last_clicked
+
+        paikallinen.tiivistelmä(60.1, 24.0, 50, kirjaa_klikkaus=True)
+
+        click = LocationClick.objects.get()
+        self.assertEqual(click.clicks, 2)
+        self.assertGreater(click.last_clicked, first)
+
+
+# Komento generoi säikeissä, jotka näkevät vain commitoidut rivit
+@override_settings(LLM_BACKEND="fake", LLM_MODEL="fake-test", LLM_FAKE_DELAY=0)
+class LocalSummaryPregenerationTests(TransactionTestCase):
+    def setUp(self):
+        use_temporary_summary_cache(self)
+        caches["ai"].clear()
+        kielimalli._taustajärjestelmät.clear()
+        paikkaindeksi.asemat = paikkaindeksi.Asemaindeksi()
+        create_observations()
+
+    def test_pregenerated_summary_is_shared_across_processes(self):
+        LocationClick.objects.create(cell_lat=60.1, cell_lon=24.0, radius_km=50, location="Järvi 0", clicks=3)
+        call_command("pregenerate_local_summaries", top=1, workers=1, stdout=open(os.devnull, "w"))
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 1)
+
+        # Uusi välimuistiolio ja tyhjä prosessikohtainen välimuisti vastaavat palvelinprosessia
+        syöte = kielimalli.syötetiiviste(
+            paikallinen.KEHOTE_VERSIO, 60.1, 24.0, 50.0, datetime.date(2025, 7, 2), datetime.date.today(),
+        )
+        avain = kielimalli.välimuistiavain(kielimalli.hae_taustajärjestelmä(), syöte)
+        self.assertIsNotNone(caches.create_connection("local-summaries").get(avain))
+        caches["ai"].clear()
+        caches._connections = type(caches._connections)()
+
+        response = self.client.get("/api/local-summary/", {"lat": 60.1, "lon": 24.0, "radius_km": 50})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(kielimalli.hae_taustajärjestelmä().kutsut, 1)
+
+
+def stand_in_history(n=400):
+    """Pieni rikastettu aineisto Datan_yhd.py:n tulostemuodossa: 10 asemaa kahdessa ELY-keskuksessa."""
+    rng = np.random.default_rng(0)
+    asema = np.arange(n) % 10
+    return pd.DataFrame({
+        "Päivämäärä": pd.Timestamp("2024-05-01") + pd.to_timedelta(rng.integers(0, 150, n), unit="D"),
+        "LevätilanneNum": rng.integers(0, 4, n),
+        "Latitude_DD": 60 + asema * 0.3,
+        "Longitude_DD": 24 + asema * 0.2,
+        "ELY-keskus": np.where(asema < 5, PROVINCES[10], PROVINCES[15]),
+        "Ilma_Lämpötila_7d_C": rng.normal(16, 3, n),
+        "Sadanta_7d_mm": rng.gamma(2, 2, n),
+        "Tuuli_7d_ms": rng.normal(12, 2, n),
+    })
+
+
+def train_stand_in_model(historia, polku, seed=0):
+    """Kouluttaa pienen mallin Oppimismalli.py:n piirteillä ja tallentaa sen kuten oikean mallin."""
+    päivä = historia["Päivämäärä"].dt.dayofyear
+    X = historia.assign(
+        DayOfYear_sin=np.sin(2 * np.pi * päivä / 365),
+        DayOfYear_cos=np.cos(2 * np.pi * päivä / 365),
+        Vuosi=historia["Päivämäärä"].dt.year,
+    )[FEATURE_ORDER]
+    malli = XGBClassifier(n_estimators=5, max_depth=2, random_state=seed, subsample=0.8)
+    malli.fit(X, historia["LevätilanneNum"])
+    joblib.dump(malli, polku)
+
+
+def use_stand_in_model(test):
+    """Ohjaa mallirekisterin testikohtaisen hakemiston korvikemalliin ja -historiaan."""
+    kansio = tempfile.TemporaryDirectory()
+    test.addCleanup(kansio.cleanup)
+    test.history_path = os.path.join(kansio.name, "rikastettu_sinileva_data.csv")
+    test.model_path = os.path.join(kansio.name, "levamalli_xgboost.joblib")
+    historia = stand_in_history()
+    historia.to_csv(test.history_path, sep=";", index=False)
+    train_stand_in_model(historia, test.model_path)
+
+    rekisteri.rekisteröi("malli", test.model_path, lataa_malli)
+    rekisteri.rekisteröi("historia", test.history_path, lataa_historia)
+    rekisteri.tyhjennä()
+
+    def palauta():
+        rekisteri.rekisteröi("malli", MODEL_FILE, lataa_malli)
+        rekisteri.rekisteröi("historia", INPUT_FILE, lataa_historia)
+        rekisteri.tyhjennä()
+    test.addCleanup(palauta)
+
+
+class PredictBatchTests(TestCase):
+    def setUp(self):
+        use_stand_in_model(self)
+        self.points = [
+            {"date": "15.7.2026", "lat": 60.3, "lon": 24.2, "name": "Järvi A"},
+            {"date": "2026-06-01", "lat": 61.5, "lon": 25.0, "name": "Järvi B"},
+            {"date": "1.9.2026", "lat": 62.4, "lon": 25.6, "name": "Järvi C"},
+        ]
+
+    def test_batch_matches_single_point_predictions(self):
+        response = self.client.post("/api/predict/", self.points, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        expected = [predict_func(p["date"], p["lat"], p["lon"], p["name"]) for p in self.points]
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(expected)))
+
+    def test_batch_size_limit(self):
+        with mock.patch("api.views.PREDICT_BATCH_MAX", 2):
+            response = self.client.post("/api/predict/", self.points, content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("detail", response.json())
+
+    def test_invalid_item_reports_errors_per_item(self):
+        points = [self.points[0], {"date": "1.7.2026", "lat": "pohjoinen", "name": "Järvi D"}]
+
+        response = self.client.post("/api/predict/", points, content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
+        # Virheet indeksoidaan listan paikan mukaan; kelvolliset pisteet eivät näy vastauksessa
+        self.assertEqual(list(response.json()), ["1"])
+        self.assertEqual(set(response.json()["1"]), {"lat", "lon"})
+
+    def test_missing_model_returns_503(self):
+        os.remove(self.model_path)
+        rekisteri.tyhjennä()
+
+        single = self.client.post("/api/predict/", self.points[0], content_type="application/json")
+        batch = self.client.post("/api/predict/", self.points, content_type="application/json")
+
+        # Ennustus ei saa sulkea palvelinprosessia (exit) vaan vastaa 503
+        self.assertEqual((single.status_code, batch.status_code), (503, 503))
+        self.assertIn("detail", single.json())
+
+
+def touch_later(polku):
+    """Siirtää tiedoston muokkausaikaa eteenpäin (rekisterin allekirjoitus muuttuu varmasti)."""
+    tila = os.stat(polku)
+    os.utime(polku, ns=(tila.st_atime_ns, tila.st_mtime_ns + 10**9))
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        use_stand_in_model(self)
+
+    def test_model_loaded_once_and_reloaded_after_change(self):
+        malli = rekisteri.hae("malli")
+        self.assertIs(rekisteri.hae("malli"), malli)
+
+        train_stand_in_model(stand_in_history(), self.model_path, seed=1)
+        touch_later(self.model_path)
+
+        self.assertIsNot(rekisteri.hae("malli"), malli)
+
+    def test_derived_entries_follow_their_source(self):
+        taulukko = rekisteri.hae("ilmasto")
+        self.assertIs(rekisteri.hae("ilmasto"), taulukko)
+
+        stand_in_history().head(200).to_csv(self.history_path, sep=";", index=False)
+        touch_later(self.history_path)
+
+        self.assertIsNot(rekisteri.hae("ilmasto"), taulukko)
+        self.assertEqual(len(rekisteri.hae("historia")), 200)
+
+
+class ClimateTableTests(TestCase):
+    def setUp(self):
+        use_stand_in_model(self)
+        self.historia = rekisteri.hae("historia")
+
+    def test_matches_mean_of_nearest_station_rows(self):
+        arvot, globaali = hae_ilmastotaulukko().hae_keskiarvot([60.7], [24.5], [7], k=3)
+
+        asemat = self.historia[["Latitude_DD", "Longitude_DD"]].drop_duplicates().to_numpy()
+        lähimmät = asemat[np.argsort(np.hypot(asemat[:, 0] - 60.7, asemat[:, 1] - 24.5))[:3]]
+        rivit = self.historia[
+            self.historia["Latitude_DD"].isin(lähimmät[:, 0])
+            & (self.historia["Päivämäärä"].dt.month == 7)
+        ]
+        self.assertFalse(globaali[0])
+        np.testing.assert_allclose(arvot[0], rivit[SÄÄSARAKKEET].astype(float).mean().to_numpy(), rtol=1e-6)
+
+    def test_falls_back_to_monthly_mean_with_few_observations(self):
+        harvat = self.historia[self.historia["Päivämäärä"].dt.month == 9].head(MIN_HAVAINNOT - 1)
+        self.historia = self.historia[(self.historia["Päivämäärä"].dt.month != 9) | self.historia.index.isin(harvat.index)]
+        self.historia.to_csv(self.history_path, sep=";", index=False)
+        touch_later(self.history_path)
+
+        taulukko = hae_ilmastotaulukko()
+        arvot, globaali = taulukko.hae_keskiarvot([60.0], [24.0], [9], k=10)
+
+        self.assertTrue(globaali[0])
+        np.testing.assert_allclose(arvot[0], taulukko.globaalit[8])
+
+    def test_undated_rows_still_count_as_stations(self):
+        # Asemalla on vain päiväämättömiä rivejä: se on silti naapuriehdokas, mutta sen tilastot ovat tyhjät
+        päiväämätön = self.historia.iloc[[0]].assign(Latitude_DD=70.0, Longitude_DD=28.0, Päivämäärä=pd.NaT)
+        taulukko = rakenna_ilmastotaulukko(pd.concat([self.historia, päiväämätön], ignore_index=True))
+
+        self.assertEqual(len(taulukko.asemat), len(self.historia[["Latitude_DD", "Longitude_DD"]].drop_duplicates()) + 1)
+        self.assertEqual(taulukko.lukumäärät[taulukko.asemat[:, 0] == 70.0].sum(), 0)
+        np.testing.assert_array_equal(taulukko.lukumäärät.sum(axis=0), hae_ilmastotaulukko().lukumäärät.sum(axis=0))
+
+
+class HotspotScenarioTests(TestCase):
+    def setUp(self):
+        use_stand_in_model(self)
+
+    def test_top_n_ordered_by_score(self):
+        tulos = ai_predict_hotspots(Skenaario(top_n=7))
+
+        luokka = {nimi: num for num, nimi in RISKITASOT.items()}
+        pisteet = [luokka[r["Ennustettu Leväriski"]] + r["Todennäköisyys"] for r in tulos]
+        self.assertEqual(len(tulos), 7)
+        self.assertEqual(pisteet, sorted(pisteet, reverse=True))
+
+    def test_province_and_bbox_limit_stations(self):
+        # Asemat 5-9 (lat 61.5-62.7) kuuluvat Uudenmaan ELY-keskukseen
+        ely = ai_predict_hotspots(Skenaario(ely=PROVINCES[15], top_n=100))
+        bbox = ai_predict_hotspots(Skenaario(bbox=(60.0, 60.65, 23.0, 25.0), kuukaudet=(6, 7), top_n=100))
+
+        leveys = lambda r: float(r["Sijainti"].split(",")[0].split(":")[1])
+        self.assertEqual(len(ely), 5 * 5)
+        self.assertTrue(all(leveys(r) >= 61.5 for r in ely))
+        self.assertEqual(len(bbox), 3 * 2)
+        self.assertTrue(all(leveys(r) <= 60.65 for r in bbox))
+
+    def test_grid_applies_scenario_factors(self):
+        skenaario = Skenaario(lämpötilakerroin=1.5, sadantakerroin=2.0, tuulikerroin=0.5, kuukaudet=(6, 8))
+        globaalit = hae_ilmastotaulukko().globaalit
+
+        df, X = luo_ennuste_datakehys_ilmastomuutoksella(rekisteri.hae("asemat"), globaalit, skenaario)
+
+        self.assertEqual(list(X.columns), FEATURE_ORDER)
+        self.assertEqual(len(X), 10 * 2)
+        kesäkuu = X[df["Kuukausi"] == 6].iloc[0]
+        np.testing.assert_allclose(
+            kesäkuu[["Ilma_Lämpötila_7d_C", "Sadanta_7d_mm", "Tuuli_7d_ms"]].to_numpy(dtype=float),
+            globaalit[5] * [1.5, 2.0, 0.5],
+        )
+
+    def test_missing_history_raises_instead_of_exiting(self):
+        os.remove(self.history_path)
+        rekisteri.tyhjennä()
+
+        with self.assertRaises(FileNotFoundError):
+            ai_predict_hotspots(Skenaario(top_n=3))
+        self.assertEqual(self.client.get("/api/predict/", {"top_n": 3}).status_code, 503)
+
+
+class HotspotCacheTests(TestCase):
+    def setUp(self):
+        use_stand_in_model(self)
+        caches["hotspots"].clear()
+        self.addCleanup(caches["hotspots"].clear)
+        laskenta = mock.patch("api.util.riskialuevalimuisti.ai_predict_hotspots", wraps=ai_predict_hotspots)
+        self.laskenta = laskenta.start()
+        self.addCleanup(laskenta.stop)
+
+    def test_identical_scenario_served_from_cache(self):
+        first = self.client.get("/api/predict/", {"top_n": 3})
+        second = self.client.get("/api/predict/", {"top_n": 3})
+
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(self.laskenta.call_count, 1)
+
+        self.client.get("/api/predict/", {"top_n": 4})
+        self.assertEqual(self.laskenta.call_count, 2)
+
+    def test_changed_model_forces_recompute(self):
+        hae_riskialueet(Skenaario(top_n=3))
+        train_stand_in_model(stand_in_history(), self.model_path, seed=1)
+        touch_later(self.model_path)
+
+        hae_riskialueet(Skenaario(top_n=3))
+        hae_riskialueet(Skenaario(top_n=3))
+
+        self.assertEqual(self.laskenta.call_count, 2)
+
+    def test_disk_tier_survives_memory_cache_loss(self):
+        kansio = tempfile.TemporaryDirectory()
+        self.addCleanup(kansio.cleanup)
+        levy = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": kansio.name}
+
+        with override_settings(CACHES={**settings.CACHES, "hotspots-disk": levy}):
+            first = hae_riskialueet(Skenaario(top_n=3))
+            caches["hotspots"].clear()
+            again = hae_riskialueet(Skenaario(top_n=3))
+
+        self.assertEqual(first, again)
+        self.assertEqual(self.laskenta.call_count, 1)
+
+
+def weather_body(alku, loppu):
+    """Open-Meteo-arkiston daily-vastaus pyydetylle jaksolle (arvot päivän järjestysnumerosta)."""
+    päivät = pd.date_range(alku, loppu).strftime("%Y-%m-%d").tolist()
+    arvot = [float(i) for i in range(len(päivät))]
+    return {"daily": {
+        "time": päivät, "temperature_2m_mean": arvot, "temperature_2m_max": arvot,
+        "precipitation_sum": arvot, "wind_speed_10m_mean": arvot,
+    }}
+
+
+class StandInWeather:
+    """
+    Paikallinen Open-Meteo-arkiston korvike: vastaa ensin tilat-listan HTTP-tiloilla
+    (esim. 429 Retry-After-otsakkeella) ja sen jälkeen säädatalla. Pyynnöt kirjataan.
+    """
+
+    def __init__(self, tilat=()):
+        self.tilat = list(tilat)
+        self.pyynnöt = []
+        weather = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = parse_qs(urlparse(self.path).query)
+                weather.pyynnöt.append(params)
+                tila = weather.tilat.pop(0) if weather.tilat else 200
+                body = json.dumps(weather_body(params["start_date"][0], params["end_date"][0]) if tila == 200 else {"reason": "Too many requests"}).encode("utf-8")
+                self.send_response(tila)
+                if tila == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/archive"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class WeatherClientTests(SimpleTestCase):
+    def setUp(self):
+        self.haut = [(60.0 + i / 10, 24.0, datetime.date(2024, 6, 1), datetime.date(2024, 6, 7)) for i in range(3)]
+
+    def serve(self, tilat):
+        weather = StandInWeather(tilat)
+        self.addCleanup(weather.close)
+        return weather
+
+    def test_rate_limited_request_is_retried_and_rate_halved(self):
+        weather = self.serve([429])
+
+        # Yksi pyyntö kerrallaan: vain ensimmäinen pyyntö saa 429-vastauksen
+        tulos = saa_asiakas.hae_jaksot(self.haut, url=weather.url, rinnakkaisia=1, nopeus=50.0)
+
+        self.assertEqual(sorted(tulos.onnistuneet), [0, 1, 2])
+        self.assertEqual(tulos.epäonnistuneet, {})
+        self.assertEqual((tulos.pyyntöjä, tulos.uudelleenyrityksiä), (4, 1))
+        self.assertEqual(len(weather.pyynnöt), 4)
+        self.assertEqual(tulos.hidastuksia, 1)
+        # Puolitus 25:een, jonka jälkeen kolme onnistumista kasvattaa nopeutta 0.1 kerrallaan
+        self.assertAlmostEqual(tulos.nopeus, 25.3)
+        self.assertEqual(len(tulos.onnistuneet[0]), 7)
+
+    def test_gives_up_after_all_attempts_are_rate_limited(self):
+        weather = self.serve([429] * saa_asiakas.YRITYKSIÄ)
+
+        tulos = saa_asiakas.hae_jaksot(self.haut[:1], url=weather.url, rinnakkaisia=1, nopeus=50.0)
+
+        self.assertEqual(tulos.onnistuneet, {})
+        self.assertEqual(tulos.epäonnistuneet, {0: f"HTTP 429 ({saa_asiakas.YRITYKSIÄ} yritystä)"})
+        self.assertEqual(tulos.uudelleenyrityksiä, saa_asiakas.YRITYKSIÄ - 1)
+        self.assertLess(tulos.nopeus, 50.0)
+
+
+class CountingFetcher:
+    """Säävaraston lataajan korvike: kirjaa haut ja palauttaa säädataa ilman verkkoa."""
+
+    def __init__(self):
+        self.haut = []
+
+    def __call__(self, lat, lon, alku, loppu):
+        self.haut.append((lat, lon, alku, loppu))
+        return saa_asiakas.paivittaiset_dataframeksi(weather_body(alku, loppu))
+
+
+class WeatherStoreTests(SimpleTestCase):
+    def setUp(self):
+        kansio = tempfile.TemporaryDirectory()
+        self.addCleanup(kansio.cleanup)
+        self.varasto = saavarasto.Saavarasto(os.path.join(kansio.name, "saavarasto.sqlite3"))
+        self.lataaja = CountingFetcher()
+        self.kesäkuu = lambda päivä: datetime.date(2024, 6, päivä)
+
+    def test_locations_are_rounded_to_the_grid(self):
+        self.assertEqual(saavarasto.ruutu(60.04, 24.06), (60.0, 24.1))
+        self.assertEqual(saavarasto.ruutu(59.96, 24.14), (60.0, 24.1))
+
+        self.varasto.hae_jakso(60.04, 24.06, self.kesäkuu(1), self.kesäkuu(7), lataaja=self.lataaja)
+        df = self.varasto.hae_jakso(59.96, 24.14, self.kesäkuu(1), self.kesäkuu(7), lataaja=self.lataaja)
+
+        # Saman 0,1°:n ruudun sijainnit jakavat varaston rivit
+        self.assertEqual(self.lataaja.haut, [(60.0, 24.1, self.kesäkuu(1), self.kesäkuu(7))])
+        self.assertEqual(len(df), 7)
+
+    def test_only_missing_ranges_are_fetched(self):
+        self.varasto.hae_jakso(60.0, 24.0, self.kesäkuu(1), self.kesäkuu(3), lataaja=self.lataaja)
+        self.varasto.hae_jakso(60.0, 24.0, self.kesäkuu(6), self.kesäkuu(7), lataaja=self.lataaja)
+        self.lataaja.haut.clear()
+
+        df = self.varasto.hae_jakso(60.0, 24.0, self.kesäkuu(1), self.kesäkuu(10), lataaja=self.lataaja)
+
+        self.assertEqual(self.lataaja.haut, [
+            (60.0, 24.0, self.kesäkuu(4), self.kesäkuu(5)),
+            (60.0, 24.0, self.kesäkuu(8), self.kesäkuu(10)),
+        ])
+        self.assertEqual(df["Päivämäärä"].dt.day.tolist(), list(range(1, 11)))
+
+    def test_second_lookup_uses_no_network(self):
+        ensimmäinen = self.varasto.hae_jakso(60.0, 24.0, self.kesäkuu(1), self.kesäkuu(14), lataaja=self.lataaja)
+        toinen = self.varasto.hae_jakso(60.0, 24.0, self.kesäkuu(1), self.kesäkuu(14), lataaja=self.lataaja)
+
+        self.assertEqual(len(self.lataaja.haut), 1)
+        pd.testing.assert_frame_equal(ensimmäinen, toinen)
+
+    def test_recent_days_with_missing_values_are_refetched(self):
+        tänään = datetime.date.today()
+        daily = self.lataaja(60.0, 24.0, tänään - datetime.timedelta(days=2), tänään)
+        daily.loc[daily.index[-1], "Lämpötila_C"] = np.nan
+
+        # Arkistoon vasta täydentyvää päivää ei tallenneta, joten se haetaan seuraavalla kerralla
+        self.assertEqual(self.varasto.tallenna(60.0, 24.0, daily), 2)
+        self.assertEqual(self.varasto.puuttuvat_jaksot(60.0, 24.0, daily["Päivämäärä"].min(), tänään), [(tänään, tänään)])
+
+
+class IncrementalEnrichmentTests(SimpleTestCase):
+    """Datan_yhd.rikasta_inkrementaalisesti: tarkistuspisteet ja säädatattomien rivien uusinnat."""
+
+    def setUp(self):
+        kansio = tempfile.TemporaryDirectory()
+        self.addCleanup(kansio.cleanup)
+        self.output = os.path.join(kansio.name, "rikastettu_sinileva_data.csv")
+        self.checkpoints = os.path.join(kansio.name, "rikastus_checkpoint")
+        self.havainnot = pd.DataFrame({
+            "Havaintopaikka": [f"Järvi {i}" for i in range(6)],
+            "Latitude_DD": [60.0 + i / 10 for i in range(6)],
+            "Longitude_DD": 24.0,
+            "Päivämäärä": pd.date_range("2024-06-01", periods=6),
+            "LevätilanneNum": [i % 4 for i in range(6)],
+        })
+        self.ilman_säätä = set()   # Paikat, joille korvike ei anna säädataa
+        self.kaatuu_erässä = None  # Monesko rikastuskutsu keskeyttää ajon
+        self.rikastetut = []       # Rikastetut paikat kutsuittain
+        liitos = mock.patch("Datan_yhd.liita_openmeteo_lampotilat", side_effect=self.stand_in_enrichment)
+        liitos.start()
+        self.addCleanup(liitos.stop)
+
+    def stand_in_enrichment(self, df, varasto):
+        if len(self.rikastetut) + 1 == self.kaatuu_erässä:
+            raise RuntimeError("keskeytys")
+        self.rikastetut.append(df["Havaintopaikka"].tolist())
+        df = df.drop(columns=["Ilma_Lämpötila_7d_C", "Sadanta_7d_mm", "Tuuli_7d_ms"], errors="ignore").copy()
+        sää = [np.nan if paikka in self.ilman_säätä else 15.0 for paikka in df["Havaintopaikka"]]
+        df["Ilma_Lämpötila_7d_C"] = df["Sadanta_7d_mm"] = df["Tuuli_7d_ms"] = sää
+        return df, pd.DataFrame(), pd.DataFrame()
+
+    def enrich(self):
+        return Datan_yhd.rikasta_inkrementaalisesti(
+            self.havainnot, self.output, self.checkpoints, erakoko=2, varasto=mock.sentinel.varasto,
+        )[0]
+
+    def assert_each_observation_once(self, df):
+        self.assertEqual(sorted(df["Havaintopaikka"]), sorted(self.havainnot["Havaintopaikka"]))
+        levy = Datan_yhd.lue_rikastettu(self.output)
+        self.assertEqual(sorted(levy["Havaintopaikka"]), sorted(self.havainnot["Havaintopaikka"]))
+        self.assertEqual(os.listdir(self.checkpoints), [])
+
+    def test_resume_after_crash_writes_no_duplicates_and_skips_no_rows(self):
+        self.kaatuu_erässä = 3
+        with self.assertRaises(RuntimeError):
+            self.enrich()
+        self.assertEqual(len(os.listdir(self.checkpoints)), 2)
+
+        self.kaatuu_erässä = None
+        df = self.enrich()
+
+        # Jatkoajo rikastaa vain tarkistuspisteistä puuttuvan erän
+        self.assertEqual(self.rikastetut[2:], [["Järvi 4", "Järvi 5"]])
+        self.assert_each_observation_once(df)
+        self.assertTrue(df["Ilma_Lämpötila_7d_C"].notna().all())
+
+    def test_rows_without_weather_are_kept_and_retried_a_bounded_number_of_times(self):
+        self.ilman_säätä = {"Järvi 1"}
+
+        for _ in range(Datan_yhd.RIKASTUSYRITYKSIÄ + 1):
+            df = self.enrich()
+
+        self.assert_each_observation_once(df)
+        # Ensimmäinen ajo rikastaa kaikki, seuraavat vain säädatattoman rivin, kunnes yritykset loppuvat
+        uusinnat = [erä for erä in self.rikastetut if erä == ["Järvi 1"]]
+        self.assertEqual(len(uusinnat), Datan_yhd.RIKASTUSYRITYKSIÄ - 1)
+        rivi = df.set_index("Havaintopaikka").loc["Järvi 1"]
+        self.assertTrue(np.isnan(rivi["Ilma_Lämpötila_7d_C"]))
+        self.assertEqual(rivi["Rikastusyrityksiä"], Datan_yhd.RIKASTUSYRITYKSIÄ)
+
+        self.ilman_säätä = set()
+        self.assertEqual(self.enrich()["Ilma_Lämpötila_7d_C"].isna().sum(), 1)
+
+    def test_checkpoint_only_resume_keeps_rows_without_weather(self):
+        self.ilman_säätä = {"Järvi 4"}
+        tallenna = Datan_yhd.tallenna_atomisesti
+
+        def kaatuu_koonnissa(df, polku):
+            if polku == self.output:
+                raise RuntimeError("keskeytys")
+            tallenna(df, polku)
+
+        # Kaikki erät tarkistuspisteissä, mutta koonti jäi kirjoittamatta. Yksi yritys per rivi,
+        # joten jatkoajo vain kokoaa tarkistuspisteet eikä rikasta mitään.
+        with mock.patch("Datan_yhd.RIKASTUSYRITYKSIÄ", 1):
+            with mock.patch("Datan_yhd.tallenna_atomisesti", side_effect=kaatuu_koonnissa):
+                with self.assertRaises(RuntimeError):
+                    self.enrich()
+            df = self.enrich()
+
+        self.assertEqual(len(self.rikastetut), 3)
+        self.assert_each_observation_once(df)
+        self.assertTrue(np.isnan(df.set_index("Havaintopaikka").loc["Järvi 4", "Ilma_Lämpötila_7d_C"]))
+
+
+class DatasetFileTests(SimpleTestCase):
+    """aineisto.lue: tyypit, Parquet-kopion tuoreus ja CSV-varapolku."""
+
+    def setUp(self):
+        kansio = tempfile.TemporaryDirectory()
+        self.addCleanup(kansio.cleanup)
+        self.csv = os.path.join(kansio.name, "rikastettu_sinileva_data.csv")
+        self.data = pd.DataFrame({
+            "Havaintopaikka": ["Järvi A", "Järvi B", "Järvi A"],
+            "ELY-keskus": [PROVINCES[15], PROVINCES[15], PROVINCES[1]],
+            "Päivämäärä": ["2024-06-01", "2024-06-02", "2024-07-01"],
+            "Latitude_DD": [60.123456, 61.5, 60.123456],
+            "Longitude_DD": [24.5, 25.0, 24.5],
+            "LevätilanneNum": [0, 2, 3],
+            "Ilma_Lämpötila_7d_C": [15.5, np.nan, 18.25],
+        })
+        self.data.to_csv(self.csv, sep=";", index=False)
+
+    def rewrite_csv(self, **muutokset):
+        """Kirjoittaa CSV:n muutetuilla arvoilla (Parquet-kopio jää ennalleen)."""
+        self.data.assign(**muutokset).to_csv(self.csv, sep=";", index=False)
+
+    def test_csv_is_read_with_compact_dtypes(self):
+        df = aineisto.lue(self.csv)
+
+        self.assertEqual(df["Havaintopaikka"].dtype, "category")
+        self.assertEqual(df["ELY-keskus"].dtype, "category")
+        self.assertTrue(pd.api.types.is_datetime64_dtype(df["Päivämäärä"]))
+        self.assertEqual(df["Latitude_DD"].dtype, np.float64)
+        self.assertEqual(df["LevätilanneNum"].dtype, np.int8)
+        self.assertEqual(df["Ilma_Lämpötila_7d_C"].dtype, np.float32)
+        self.assertEqual(df["Latitude_DD"].iloc[0], 60.123456)
+
+    def test_missing_integers_fall_back_to_float32(self):
+        self.rewrite_csv(LevätilanneNum=[0, np.nan, 3])
+
+        self.assertEqual(aineisto.lue(self.csv)["LevätilanneNum"].dtype, np.float32)
+
+    @skipUnless(aineisto.PARQUET_KÄYTÖSSÄ, "pyarrow puuttuu")
+    def test_newer_parquet_is_read_instead_of_csv(self):
+        aineisto.tallenna_parquet(self.data, self.csv)
+        self.rewrite_csv(LevätilanneNum=[1, 1, 1])
+        touch_later(aineisto.parquet_polku(self.csv))
+
+        df = aineisto.lue(self.csv)
+
+        self.assertTrue(aineisto.parquet_ajan_tasalla(self.csv))
+        self.assertEqual(df["LevätilanneNum"].tolist(), [0, 2, 3])
+        pd.testing.assert_frame_equal(df, aineisto.tyypitä(self.data))
+
+    @skipUnless(aineisto.PARQUET_KÄYTÖSSÄ, "pyarrow puuttuu")
+    def test_stale_parquet_falls_back_to_csv(self):
+        aineisto.tallenna_parquet(self.data, self.csv)
+        self.rewrite_csv(LevätilanneNum=[1, 1, 1])
+        touch_later(self.csv)
+
+        self.assertFalse(aineisto.parquet_ajan_tasalla(self.csv))
+        self.assertEqual(aineisto.lue(self.csv)["LevätilanneNum"].tolist(), [1, 1, 1])
+
+    def test_csv_is_read_without_parquet_copy(self):
+        self.assertFalse(os.path.exists(aineisto.parquet_polku(self.csv)))
+        self.assertFalse(aineisto.parquet_ajan_tasalla(self.csv))
+        self.assertEqual(aineisto.lue(self.csv)["LevätilanneNum"].tolist(), [0, 2, 3])
+
+    def test_csv_is_read_without_pyarrow(self):
+        with mock.patch.object(aineisto, "PARQUET_KÄYTÖSSÄ", False):
+            self.assertIsNone(aineisto.tallenna_parquet(self.data, self.csv))
+            df = aineisto.lue(self.csv)
+
+        self.assertFalse(os.path.exists(aineisto.parquet_polku(self.csv)))
+        pd.testing.assert_frame_equal(df, aineisto.tyypitä(self.data))
+
+    def test_column_subset_from_csv(self):
+        df = aineisto.lue(self.csv, ["Päivämäärä", "Latitude_DD", "Ilma_Lämpötila_7d_C"])
+
+        self.assertEqual(list(df.columns), ["Päivämäärä", "Latitude_DD", "Ilma_Lämpötila_7d_C"])
+        self.assertEqual(df["Ilma_Lämpötila_7d_C"].dtype, np.float32)
+
+    @skipUnless(aineisto.PARQUET_KÄYTÖSSÄ, "pyarrow puuttuu")
+    def test_column_subset_from_parquet_matches_csv(self):
+        sarakkeet = ["Päivämäärä", "Latitude_DD", "Ilma_Lämpötila_7d_C"]
+        csv = aineisto.lue(self.csv, sarakkeet)
+        aineisto.tallenna_parquet(self.data, self.csv)
+
+        parquet = aineisto.lue(self.csv, sarakkeet)
+
+        self.assertEqual(list(parquet.columns), sarakkeet)
+        pd.testing.assert_frame_equal(parquet, csv)
@@ -1,10 +1,15 @@
 from django.urls import path
-from .views import DataView, AiView, ProvinceView, PredictView
+from .views import DataView, AiView, ai_stream, ProvinceView, PredictView, ClusterView, NearbyView, LocalSummaryView, BulletinView
 
 
 urlpatterns = [
     path('data/', DataView.as_view(), name='items'),
     path('ai/', AiView.as_view(), name='items'),
+    path('ai/stream/', ai_stream, name='items'),
     path('province/', ProvinceView.as_view(), name='items'),
     path('predict/', PredictView.as_view(), name='items'),
+    path('clusters/', ClusterView.as_view(), name='items'),
+    path('nearby/', NearbyView.as_view(), name='items'),
+    path('local-summary/', LocalSummaryView.as_view(), name='items'),
+    path('bulletin/', BulletinView.as_view(), name='items'),
 ]
\ No newline at end of file
@@ -1,18 +1,14 @@
 import pandas as pd
 import numpy as np
-import os
-import joblib # Tarvitaan mallin lataamiseen
-from sklearn.neighbors import NearestNeighbors
 from xgboost import XGBClassifier
-from typing import Dict, Any
-import pathlib
+from typing import Dict, Any, List
+from .mallirekisteri import MODEL_FILE, hae_malli
+from .ilmastotaulukko import Ilmastotaulukko, hae_ilmastotaulukko
 
 # ************************************************
 # ASETUKSET JA VAKIOT
 # ************************************************
-file_path = pathlib.Path().resolve() 
-INPUT_FILE = os.path.join(file_path, 'api/util/rikastettu_sinileva_data.csv') 
-MODEL_FILE = os.path.join(file_path, 'api/util/levamalli_xgboost.joblib') # Mallitiedosto
+# Malli ja historiallinen data ladataan kerran per prosessi mallirekisterin kautta
 
 print(MODEL_FILE)
 
@@ -32,39 +28,20 @@ RISKITASOT = {
 # 1. APUFUNKTIOT (Kopiotoitu pääohjelmasta)
 # ************************************************
 
-def hae_historialliset_keskiarvot(df_alkuperäinen: pd.DataFrame, lat: float, lon: float, kuukausi: int, k: int = 5) -> dict:
+def hae_historialliset_keskiarvot(taulukko: Ilmastotaulukko, lat: float, lon: float, kuukausi: int, k: int = 5) -> dict:
     """
-    Hakee lähimmän k=5 pisteen sääpiirteiden (7d) kuukausikeskiarvot alkuperäisestä datasta.
-    (HUOM: vaatii, että df_alkuperäinen sisältää jo DayOfYear_sin/cos sarakkeet)
+    Hakee lähimmän k=5 pisteen sääpiirteiden (7d) kuukausikeskiarvot valmiista ilmastotaulukosta.
+    (Asemat ja niiden kuukausitilastot on laskettu kerran, ks. ilmastotaulukko.py)
     """
-    # ... (Funktion sisältö on sama kuin edellisessä viestissäsi) ...
-    
-    # 1. Etsi K lähintä naapuria (Lähimmät Lat/Lon-pisteet datasta)
-    mittauspisteet = df_alkuperäinen[['Latitude_DD', 'Longitude_DD']].drop_duplicates().copy()
-    
-    nn = NearestNeighbors(n_neighbors=k, algorithm='ball_tree').fit(mittauspisteet)
-    distances, indices = nn.kneighbors([[lat, lon]])
-    lähimmät_koordinaatit = mittauspisteet.iloc[indices[0]]
-    
-    # 2. Suodata data sijainnin ja kuukauden perusteella
-    df_suodatettu_kuukausi = df_alkuperäinen[df_alkuperäinen['Päivämäärä'].dt.month == kuukausi].copy()
-    
-    # Valitaan rivit, joiden Lat/Lon täsmää lähimpiin pisteisiin
-    lähimmät_latlon_parit = set(zip(lähimmät_koordinaatit['Latitude_DD'], lähimmät_koordinaatit['Longitude_DD']))
-    
-    df_tyypillinen = df_suodatettu_kuukausi[
-        df_suodatettu_kuukausi.apply(lambda row: (row['Latitude_DD'], row['Longitude_DD']) in lähimmät_latlon_parit, axis=1)
-    ].copy()
-    
-    # 3. Laske tyypilliset arvot
-    if df_tyypillinen.empty or len(df_tyypillinen) < 5:
-        df_tyypillinen = df_suodatettu_kuukausi.copy()
+    arvot, globaali = taulukko.hae_keskiarvot([lat], [lon], [kuukausi], k)
+
+    if globaali[0]:
         print(f"VAROITUS: Ei riittävästi historiallista dataa lähimmiltä pisteiltä. Käytetään kuukauden {kuukausi} globaalia keskiarvoa.")
 
     tyypilliset_arvot = {
-        'Ilma_Lämpötila_7d_C': df_tyypillinen['Ilma_Lämpötila_7d_C'].mean(),
-        'Sadanta_7d_mm': df_tyypillinen['Sadanta_7d_mm'].mean(),
-        'Tuuli_7d_ms': df_tyypillinen['Tuuli_7d_ms'].mean()
+        'Ilma_Lämpötila_7d_C': arvot[0, 0],
+        'Sadanta_7d_mm': arvot[0, 1],
+        'Tuuli_7d_ms': arvot[0, 2]
     }
     
     if np.isnan(tyypilliset_arvot['Ilma_Lämpötila_7d_C']):
@@ -72,7 +49,7 @@ def hae_historialliset_keskiarvot(df_alkuperäinen: pd.DataFrame, lat: float, lo
 
     return tyypilliset_arvot
 
-def ennusta_riski_koordinaatille(malli: XGBClassifier, df_alkuperäinen: pd.DataFrame, päivämäärä: str, sijainti: dict) -> dict:
+def ennusta_riski_koordinaatille(malli: XGBClassifier, taulukko: Ilmastotaulukko, päivämäärä: str, sijainti: dict) -> dict:
     """
     Hakee ensin historialliset keskiarvot datasta ja tekee ennusteen.
     """
@@ -87,7 +64,7 @@ def ennusta_riski_koordinaatille(malli: XGBClassifier, df_alkuperäinen: pd.Data
     
     # HAE TYP. ARVOT DATASTA
     try:
-        tyypilliset_sääarvot = hae_historialliset_keskiarvot(df_alkuperäinen, sijainti['lat'], sijainti['lon'], kuukausi)
+        tyypilliset_sääarvot = hae_historialliset_keskiarvot(taulukko, sijainti['lat'], sijainti['lon'], kuukausi)
     except ValueError as e:
         return {"VIRHE": str(e)}
 
@@ -123,32 +100,91 @@ def ennusta_riski_koordinaatille(malli: XGBClassifier, df_alkuperäinen: pd.Data
         "Todennäköisyydet": {RISKITASOT[i]: prob for i, prob in enumerate(ennuste_todennäköisyydet)}
     }
 
+def ennusta_riski_koordinaateille(malli: XGBClassifier, taulukko: Ilmastotaulukko, pisteet: List[dict]) -> List[dict]:
+    """
+    Eräennustus: sama tulos kuin ennusta_riski_koordinaatille jokaiselle pisteelle,
+    mutta piirrematriisi rakennetaan kerralla ja malli ajetaan yhdellä predict_proba-kutsulla.
+    Pisteet ovat muotoa {'päivämäärä': str, 'nimi': str, 'lat': float, 'lon': float}.
+    """
+    tulokset: List[Any] = [None] * len(pisteet)
+    if not pisteet:
+        return tulokset
+
+    # 1. Päivämäärät (vektorisoitu, yksittäinen varajäsennys vain poikkeaville muodoille)
+    pvmt = pd.to_datetime(pd.Series([p['päivämäärä'] for p in pisteet]), format='%d.%m.%Y', errors='coerce')
+    for i in np.flatnonzero(pvmt.isna().to_numpy()):
+        try:
+            pvmt.iloc[i] = pd.to_datetime(pisteet[i]['päivämäärä'])
+            if pd.isna(pvmt.iloc[i]):
+                raise ValueError(pisteet[i]['päivämäärä'])
+        except ValueError:
+            tulokset[i] = {"VIRHE": "Annettu päivämäärä on virheellisessä muodossa. Käytä esim. 'D.M.YYYY' tai 'YYYY-MM-DD'."}
+    kelvolliset = np.array([t is None for t in tulokset])
+    pvmt = pd.DatetimeIndex(pvmt[kelvolliset])
+    if not kelvolliset.any():
+        return tulokset
+
+    # 2. Tyypilliset sääarvot ilmastotaulukosta kaikille pisteille kerralla
+    lat = np.array([p['lat'] for p in pisteet], dtype=float)[kelvolliset]
+    lon = np.array([p['lon'] for p in pisteet], dtype=float)[kelvolliset]
+    arvot, globaali = taulukko.hae_keskiarvot(lat, lon, pvmt.month.to_numpy())
+    if globaali.any():
+        print(f"VAROITUS: {int(globaali.sum())}/{len(globaali)} pisteelle käytetään kuukauden globaalia keskiarvoa.")
+
+    # 3. Piirrematriisi FEATURE_ORDER-järjestyksessä ja yksi ennustuskutsu
+    DayOfYear = pvmt.dayofyear.to_numpy()
+    X_new = pd.DataFrame({
+        'Latitude_DD': lat,
+        'Longitude_DD': lon,
+        'Ilma_Lämpötila_7d_C': arvot[:, 0],
+        'Sadanta_7d_mm': arvot[:, 1],
+        'Tuuli_7d_ms': arvot[:, 2],
+        'DayOfYear_sin': np.sin(2 * np.pi * DayOfYear / 365),
+        'DayOfYear_cos': np.cos(2 * np.pi * DayOfYear / 365),
+        'Vuosi': pvmt.year.to_numpy()
+    }, columns=FEATURE_ORDER)
+
+    puuttuva_sää = np.isnan(arvot[:, 0])
+    todennäköisyydet = np.empty((len(X_new), 0))
+    if (~puuttuva_sää).any():
+        todennäköisyydet = malli.predict_proba(X_new[~puuttuva_sää])
+    luokat = malli.classes_[np.argmax(todennäköisyydet, axis=1)] if len(todennäköisyydet) else []
+
+    # 4. Tulosten kokoaminen alkuperäiseen järjestykseen
+    rivi = 0
+    for j, i in enumerate(np.flatnonzero(kelvolliset)):
+        if puuttuva_sää[j]:
+            tulokset[i] = {"VIRHE": "Koulutusdatasta puuttuu kokonaan säädataa kyseiseltä kuukaudelta. Ennustetta ei voida laskea."}
+            continue
+        tulokset[i] = {
+            "Sijainti": pisteet[i]['nimi'],
+            "Päivämäärä": pvmt[j].strftime('%d.%m.%Y'),
+            "Tyypilliset Arvot": {
+                'Ilma_Lämpötila_7d_C': arvot[j, 0],
+                'Sadanta_7d_mm': arvot[j, 1],
+                'Tuuli_7d_ms': arvot[j, 2]
+            },
+            "Ennustettu Leväriski": RISKITASOT.get(luokat[rivi], "Tuntematon riski"),
+            "Todennäköisyydet": {RISKITASOT[k]: prob for k, prob in enumerate(todennäköisyydet[rivi])}
+        }
+        rivi += 1
+    return tulokset
+
 # ************************************************
 # 2. PÄÄOHJELMA SUORITUS (Ennustus)
 # ************************************************
 
 def predict_func(date, lat, lon, name):
-    print("Ladataan malli ja historiallinen data...")
     try:
-        # Ladataan malli
-        malli = joblib.load(MODEL_FILE)
-        
-        # Ladataan rikastettu data historiallisten arvojen hakua varten
-        df_alkuperäinen = pd.read_csv(INPUT_FILE, sep=';')
-        df_alkuperäinen['Päivämäärä'] = pd.to_datetime(df_alkuperäinen['Päivämäärä'], errors='coerce')
-        df_alkuperäinen['DayOfYear'] = df_alkuperäinen['Päivämäärä'].dt.dayofyear
-        
-        # Laske sin/cos, koska malli tarvitsee niitä
-        df_alkuperäinen['DayOfYear_sin'] = np.sin(2 * np.pi * df_alkuperäinen['DayOfYear'] / 365)
-        df_alkuperäinen['DayOfYear_cos'] = np.cos(2 * np.pi * df_alkuperäinen['DayOfYear'] / 365)
-        
-        # Puhdista puuttuvista sää/levä-tiedoista.
-        df_alkuperäinen = df_alkuperäinen.dropna(subset=['Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms', 'LevätilanneNum']).copy()
+        # Malli ja historiasta laskettu ilmastotaulukko rekisteristä;
+        # levyltä luetaan vain, jos tiedostot ovat muuttuneet edellisen latauksen jälkeen.
+        malli = hae_malli()
+        ilmastotaulukko = hae_ilmastotaulukko()
 
     except FileNotFoundError as e:
         print(f"VIRHE: Vaadittu tiedostoa ei löytynyt: {e}")
         print("Varmista, että olet ajanut koulutusskriptin ja että tiedostot ovat oikeassa paikassa.")
-        exit()
+        raise
 
     # KÄYTTÄJÄN SYÖTE: Pielavesi/Lahdenpohja
     ENNUSTE_PVM = date
@@ -158,7 +194,7 @@ def predict_func(date, lat, lon, name):
         'lon': lon
     }
 
-    tulos = ennusta_riski_koordinaatille(malli, df_alkuperäinen, ENNUSTE_PVM, ENNAKOITU_SIJAINTI)
+    tulos = ennusta_riski_koordinaatille(malli, ilmastotaulukko, ENNUSTE_PVM, ENNAKOITU_SIJAINTI)
     
     print("\n" + "="*50)
     print(" ENNAKOITU LEVÄRISKI (Dynaaminen Haku)")
@@ -175,4 +211,18 @@ def predict_func(date, lat, lon, name):
         for riski, prob in tulos['Todennäköisyydet'].items():
             print(f"   - {riski}: {prob*100:.2f}%")
     print("="*50)
-    return tulos
\ No newline at end of file
+    return tulos
+
+def predict_batch_func(points: List[dict]) -> List[dict]:
+    """Ennustaa leväriskin listalle pisteitä ({'date', 'lat', 'lon', 'name'}) yhdellä mallikutsulla."""
+    try:
+        malli = hae_malli()
+        ilmastotaulukko = hae_ilmastotaulukko()
+    except FileNotFoundError as e:
+        print(f"VIRHE: Vaadittu tiedostoa ei löytynyt: {e}")
+        raise
+
+    pisteet = [{'päivämäärä': p['date'], 'nimi': p['name'], 'lat': p['lat'], 'lon': p['lon']} for p in points]
+    tulokset = ennusta_riski_koordinaateille(malli, ilmastotaulukko, pisteet)
+    print(f"Eräennuste laskettu {len(tulokset)} pisteelle.")
+    return tulokset
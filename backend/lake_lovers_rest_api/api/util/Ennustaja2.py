@@ -1,18 +1,15 @@
 import pandas as pd
 import numpy as np
-import os
-import joblib 
 from xgboost import XGBClassifier
-from typing import Dict, Any, List
-import pathlib
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+from .mallirekisteri import rekisteri, hae_malli
+from .ilmastotaulukko import hae_ilmastotaulukko
 
 # ************************************************
 # ASETUKSET JA VAKIOT
 # ************************************************
-# HUOM! Muokkaa tämä polku vastaamaan omaa koneesi hakemistoa!
-file_path = pathlib.Path().resolve()
-INPUT_FILE = os.path.join(file_path, 'api/util/rikastettu_sinileva_data.csv') 
-MODEL_FILE = os.path.join(file_path, 'api/util/levamalli_xgboost.joblib')
+# Tiedostopolut määritellään mallirekisterissä (mallirekisteri.py)
 
 # Piirteiden järjestys (kriittinen ennustuksessa)
 FEATURE_ORDER = [
@@ -31,55 +28,73 @@ RISKITASOT = {
 # 1. ILMASTOMUUTOSSKENAARION DATAN VALMISTELU
 # ************************************************
 
-def luo_ennuste_datakehys_ilmastomuutoksella(df_alkuperäinen: pd.DataFrame, target_year: int) -> pd.DataFrame:
+@dataclass(frozen=True)
+class Skenaario:
+    """Ilmastomuutosskenaarion parametrit (oletukset vastaavat alkuperäistä kiinteää skenaariota)."""
+    lämpötilakerroin: float = 1.02  # Simuloitu lämpeneminen: Lämpötila x1.02 (+2%)
+    sadantakerroin: float = 1.2     # Simuloitu sadannan kasvu: Sadanta x1.2 (+20%)
+    tuulikerroin: float = 1.0
+    vuosi: int = 2026               # Tuleva vuosi ennustukseen
+    kuukaudet: Tuple[int, ...] = (5, 6, 7, 8, 9) # Toukokuu - Syyskuu
+    top_n: int = 10                 # Kuinka monta korkeimman riskin aluetta listataan
+    ely: Optional[str] = None       # Rajaus ELY-keskuksen mukaan
+    bbox: Optional[Tuple[float, float, float, float]] = None # (lat_min, lat_max, lon_min, lon_max)
+
+def muodosta_asemat(df_alkuperäinen: pd.DataFrame) -> pd.DataFrame:
+    """Uniikit mittauspisteet (Lat/Lon) ELY-keskuksineen alkuperäisessä esiintymisjärjestyksessä."""
+    return df_alkuperäinen[['Latitude_DD', 'Longitude_DD', 'ELY-keskus']].drop_duplicates(
+        subset=['Latitude_DD', 'Longitude_DD']
+    ).reset_index(drop=True)
+
+rekisteri.rekisteröi_johdettu('asemat', 'historia', muodosta_asemat)
+
+def rajaa_asemat(asemat: pd.DataFrame, skenaario: Skenaario) -> pd.DataFrame:
+    """Suodattaa asemat skenaarion ELY- ja bbox-rajauksen mukaan."""
+    maski = np.ones(len(asemat), dtype=bool)
+    if skenaario.ely is not None:
+        maski &= (asemat['ELY-keskus'] == skenaario.ely).to_numpy()
+    if skenaario.bbox is not None:
+        lat_min, lat_max, lon_min, lon_max = skenaario.bbox
+        lat = asemat['Latitude_DD'].to_numpy()
+        lon = asemat['Longitude_DD'].to_numpy()
+        maski &= (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+    return asemat[maski]
+
+def luo_ennuste_datakehys_ilmastomuutoksella(asemat: pd.DataFrame, kuukausikeskiarvot: np.ndarray, skenaario: Skenaario) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
-    Luo ennustedatakehyksen käyttäen globaaleja kuukausikeskiarvoja, 
-    soveltaen ilmastonmuutoskertoimia.
+    Luo ennustedatakehyksen käyttäen globaaleja kuukausikeskiarvoja (12 x 3 taulukko),
+    soveltaen skenaarion ilmastonmuutoskertoimia. Ruudukko (Sijainti x Kuukausi)
+    muodostetaan yhdellä ristitulolla ilman silmukoita.
     """
-    test_months = [5, 6, 7, 8, 9] # Toukokuu - Syyskuu
-    
-    # 1. Laske tyypilliset sääolosuhteet KUUKAUSITTAIN koko alueella
-    monthly_avg_weather = df_alkuperäinen.groupby(df_alkuperäinen['Päivämäärä'].dt.month)[
-        ['Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms']
-    ].mean().reset_index()
-    monthly_avg_weather.rename(columns={'Päivämäärä': 'Kuukausi'}, inplace=True)
+    kuukaudet = np.asarray(skenaario.kuukaudet, dtype=int)
+    lat = asemat['Latitude_DD'].to_numpy()
+    lon = asemat['Longitude_DD'].to_numpy()
+
+    # 1. Kuukausittainen sää kertoimilla (M x 3)
+    kertoimet = np.array([skenaario.lämpötilakerroin, skenaario.sadantakerroin, skenaario.tuulikerroin])
+    sää = kuukausikeskiarvot[kuukaudet - 1] * kertoimet
+
+    # 2. Ajalliset piirteet kerran kuukautta kohden (15. päivä)
+    päivämäärät = pd.to_datetime([f'{skenaario.vuosi}-{m}-15' for m in kuukaudet])
+    DayOfYear = päivämäärät.dayofyear.to_numpy()
+
+    # 3. Ristitulo: kuukausi ulompana, sijainti sisempänä (kuten alkuperäisessä ruudukossa)
+    S, M = len(lat), len(kuukaudet)
+    kk_indeksi = np.repeat(np.arange(M), S)
+    df_ennuste_valmis = pd.DataFrame({
+        'Latitude_DD': np.tile(lat, M),
+        'Longitude_DD': np.tile(lon, M),
+        'Kuukausi': kuukaudet[kk_indeksi],
+        'Ilma_Lämpötila_7d_C': sää[kk_indeksi, 0],
+        'Sadanta_7d_mm': sää[kk_indeksi, 1],
+        'Tuuli_7d_ms': sää[kk_indeksi, 2],
+        'Päivämäärä': päivämäärät[kk_indeksi],
+        'DayOfYear': DayOfYear[kk_indeksi],
+        'DayOfYear_sin': np.sin(2 * np.pi * DayOfYear / 365)[kk_indeksi],
+        'DayOfYear_cos': np.cos(2 * np.pi * DayOfYear / 365)[kk_indeksi],
+        'Vuosi': skenaario.vuosi,
+    })
 
-    # ILMASTOMUUTOS: KÄYTETÄÄN LISÄTTÄÄN KERTOIME
-    
-    # Simuloitu lämpeneminen: Lämpötila x1.02 (+2%)
-    monthly_avg_weather['Ilma_Lämpötila_7d_C'] *= 1.02 
-    
-    # Simuloitu sadannan kasvu: Sadanta x1.2 (+20%)
-    monthly_avg_weather['Sadanta_7d_mm'] *= 1.2 
-    
-    # 2. Luo Uniikki ruudukko (Lat/Lon)
-    locations_df = df_alkuperäinen[['Latitude_DD', 'Longitude_DD']].drop_duplicates().reset_index(drop=True)
-    
-    # 3. Yhdistä ruudukko ja kuukausi-sää (Cross Join)
-    full_prediction_grid = pd.DataFrame()
-    for month in test_months:
-        locs = locations_df.copy()
-        locs['Kuukausi'] = month
-        full_prediction_grid = pd.concat([full_prediction_grid, locs], ignore_index=True)
-
-    # Liitä kuukausittaiset SÄÄ-ÄÄRIARVOT
-    df_ennuste_valmis = pd.merge(
-        full_prediction_grid,
-        monthly_avg_weather,
-        on='Kuukausi',
-        how='left'
-    )
-
-    # 4. Lisää ajalliset piirteet
-    df_ennuste_valmis['Päivämäärä'] = df_ennuste_valmis['Kuukausi'].apply(
-        lambda m: pd.to_datetime(f'{target_year}-{m}-15')
-    )
-    df_ennuste_valmis['DayOfYear'] = df_ennuste_valmis['Päivämäärä'].dt.dayofyear
-    df_ennuste_valmis['DayOfYear_sin'] = np.sin(2 * np.pi * df_ennuste_valmis['DayOfYear'] / 365)
-    df_ennuste_valmis['DayOfYear_cos'] = np.cos(2 * np.pi * df_ennuste_valmis['DayOfYear'] / 365)
-    df_ennuste_valmis['Vuosi'] = target_year
-    df_ennuste_valmis['Sijainti'] = "Lat: " + df_ennuste_valmis['Latitude_DD'].round(4).astype(str) + ", Lon: " + df_ennuste_valmis['Longitude_DD'].round(4).astype(str)
-    
     # Valitse vain mallin vaatimat piirteet
     X_pred = df_ennuste_valmis[FEATURE_ORDER].fillna(0)
     
@@ -90,35 +105,53 @@ def luo_ennuste_datakehys_ilmastomuutoksella(df_alkuperäinen: pd.DataFrame, tar
 # 2. AUTOMAATTINEN RISKIN ETSINTÄ (Yhden askeleen ennustus)
 # ************************************************
 
+def valitse_top_n(pisteytys: np.ndarray, luokat: np.ndarray, n: int) -> np.ndarray:
+    """
+    Palauttaa n parhaan rivin indeksit järjestyksessä (Pisteytys, RiskitasoNum laskevasti)
+    osittaisella lajittelulla. Tasapisteissä aiempi rivi voittaa, kuten vakaassa lajittelussa.
+    """
+    n = min(n, len(pisteytys))
+    if n <= 0:
+        return np.empty(0, dtype=int)
+    kynnys = np.partition(pisteytys, len(pisteytys) - n)[len(pisteytys) - n]
+    ylemmät = np.flatnonzero(pisteytys > kynnys)
+    tasapisteet = np.flatnonzero(pisteytys == kynnys)[:n - len(ylemmät)]
+    valitut = np.concatenate([ylemmät, tasapisteet])
+    järjestys = np.lexsort((valitut, -luokat[valitut], -pisteytys[valitut]))
+    return valitut[järjestys]
+
 def etsi_top_n_riskialuetta_optimoidusti(malli: XGBClassifier, df_valmis: pd.DataFrame, X_pred: pd.DataFrame, n: int = 10) -> List[Dict[str, Any]]:
     """
     Ennustaa koko datakehykselle kerralla ja palauttaa TOP N korkeimman riskin paikat.
     """
-    # 1. Ennustus koko datakehykselle
-    predictions_num = malli.predict(X_pred)
-    probabilities = malli.predict_proba(X_pred)
+    if X_pred.empty:
+        return []
 
-    df_valmis['RiskitasoNum'] = predictions_num
+    # 1. Ennustus koko datakehykselle (luokka = todennäköisimmän luokan indeksi)
+    probabilities = malli.predict_proba(X_pred)
+    predictions_num = malli.classes_[np.argmax(probabilities, axis=1)]
     
     # 2. Laske pisteytys: Pisteytys = RiskitasoNum + Todennäköisyys (korkein ennustetulle luokalle)
     max_probs = np.max(probabilities, axis=1)
-    df_valmis['Todennäköisyys'] = max_probs
-    df_valmis['Pisteytys'] = df_valmis['RiskitasoNum'] + df_valmis['Todennäköisyys']
-    
-    # 3. Lajittelu ja TOP N haku
-    df_results_sorted = df_valmis.sort_values(by=['Pisteytys', 'RiskitasoNum'], ascending=False)
+    pisteytys = predictions_num + max_probs.astype(float)
     
-    # Muokkaa tulostusmuotoa
+    # 3. TOP N haku osittaisella lajittelulla
+    top_indeksit = valitse_top_n(pisteytys, predictions_num, n)
+    lat = df_valmis['Latitude_DD'].to_numpy()
+    lon = df_valmis['Longitude_DD'].to_numpy()
+    päivämäärät = df_valmis['Päivämäärä']
+
+    # Muokkaa tulostusmuotoa (vain valituille riveille)
     top_results_list = []
-    for index, row in df_results_sorted.head(n).iterrows():
+    for index in top_indeksit:
         # Etsi kaikkien luokkien todennäköisyydet tulostusta varten
         full_probs = {RISKITASOT[i]: prob for i, prob in enumerate(probabilities[index])}
         
         top_results_list.append({
-            "Sijainti": row['Sijainti'],
-            "Päivämäärä": row['Päivämäärä'].strftime('%d.%m.%Y'),
-            "Ennustettu Leväriski": RISKITASOT.get(row['RiskitasoNum']),
-            "Todennäköisyys": row['Todennäköisyys'],
+            "Sijainti": f"Lat: {float(np.round(lat[index], 4))}, Lon: {float(np.round(lon[index], 4))}",
+            "Päivämäärä": päivämäärät.iloc[index].strftime('%d.%m.%Y'),
+            "Ennustettu Leväriski": RISKITASOT.get(predictions_num[index]),
+            "Todennäköisyys": float(max_probs[index]),
             "Todennäköisyydet": full_probs
         })
         
@@ -128,41 +161,34 @@ def etsi_top_n_riskialuetta_optimoidusti(malli: XGBClassifier, df_valmis: pd.Dat
 # 3. PÄÄOHJELMA SUORITUS
 # ************************************************
 
-def ai_predict_hotspots():
-    print("Ladataan malli ja historiallinen data...")
-    TARGET_YEAR = 2026 # Tuleva vuosi ennustukseen
-    TOP_N = 10 # Kuinka monta korkeimman riskin aluetta listataan
-
+def ai_predict_hotspots(skenaario: Skenaario = Skenaario()):
     try:
-        # 1. Ladataan malli ja data
-        malli = joblib.load(MODEL_FILE)
-        df_alkuperäinen = pd.read_csv(INPUT_FILE, sep=';')
-        
-        # 2. Valmistellaan data
-        df_alkuperäinen['Päivämäärä'] = pd.to_datetime(df_alkuperäinen['Päivämäärä'], errors='coerce')
-        df_alkuperäinen['DayOfYear'] = df_alkuperäinen['Päivämäärä'].dt.dayofyear
-        df_alkuperäinen = df_alkuperäinen.dropna(subset=['Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms', 'LevätilanneNum']).copy()
+        # 1-2. Malli, asemat ja kuukausikeskiarvot jaetusta rekisteristä (ladataan vain muuttuneina)
+        malli = hae_malli()
+        asemat = rekisteri.hae('asemat')
+        kuukausikeskiarvot = hae_ilmastotaulukko().globaalit
 
     except FileNotFoundError as e:
         print(f"VIRHE: Vaadittu tiedostoa ei löytynyt: {e}")
         print("Varmista, että olet ajanut koulutusskriptin ja että tiedostot ovat oikeassa paikassa.")
-        exit()
+        raise
 
     # 3. VALMISTELE ENNUSTEDATA ILMASTOMUUTOSSKENAARIOLLA
     try:
-        # Käytetään ilmastonmuutoskertoimia ennustedatan luomiseen
-        df_valmis, X_pred = luo_ennuste_datakehys_ilmastomuutoksella(df_alkuperäinen, TARGET_YEAR) 
+        # Käytetään skenaarion ilmastonmuutoskertoimia ennustedatan luomiseen
+        asemat = rajaa_asemat(asemat, skenaario)
+        df_valmis, X_pred = luo_ennuste_datakehys_ilmastomuutoksella(asemat, kuukausikeskiarvot, skenaario)
     except Exception as e:
         print(f"VIRHE DATAN VALMISTELUSSA: {e}")
-        exit()
+        raise
 
     # 4. SUORITETAAN TOP N RISKIALUEEN ETSINTÄ
     print("Suoritetaan ennustus (batch prediction) ilmastonmuutos-ruudukolle kerralla...")
-    top_risk_list = etsi_top_n_riskialuetta_optimoidusti(malli, df_valmis, X_pred, TOP_N)
+    top_risk_list = etsi_top_n_riskialuetta_optimoidusti(malli, df_valmis, X_pred, skenaario.top_n)
     
     print("\n" + "="*80)
-    print(f"TOP {TOP_N} ENNUSTETUT KORKEIMMAN LEVÄRISKIN PAIKAT VUONNA {TARGET_YEAR}")
-    print(f"   (Ilmastomuutos-skenaario: Lämpötila x1.02, Sadanta x1.2)")
+    print(f"TOP {skenaario.top_n} ENNUSTETUT KORKEIMMAN LEVÄRISKIN PAIKAT VUONNA {skenaario.vuosi}")
+    print(f"   (Ilmastomuutos-skenaario: Lämpötila x{skenaario.lämpötilakerroin}, Sadanta x{skenaario.sadantakerroin}, Tuuli x{skenaario.tuulikerroin})")
     print("="*80)
 
     if not top_risk_list:
@@ -0,0 +1,116 @@
+import os
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandasin Parquet-moottori)
+    PARQUET_KÄYTÖSSÄ = True
+except ImportError:
+    PARQUET_KÄYTÖSSÄ = False
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+# Rikastetun datan kanoninen muoto on puolipisteellä eroteltu CSV (Datan_yhd.py). Sen viereen
+# kirjoitetaan tyypitetty Parquet-kopio (sama nimi, .parquet), jota luetaan aina kun se on
+# vähintään yhtä tuore kuin CSV. Muuten (tai ilman pyarrow-kirjastoa) luetaan CSV samoilla tyypeillä.
+
+KATEGORIAT = ['Havaintopaikka', 'ELY-keskus', 'LevätilanneTxt', 'Seuranta', 'Ylläpito']
+PIIRTEET_FLOAT32 = ['Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms']
+# Koordinaatit pidetään float64:nä: niillä tunnistetaan asemat ja ne palautetaan API-vastauksissa
+KOORDINAATIT = ['Latitude_DD', 'Longitude_DD']
+KOKONAISLUVUT = {'LevätilanneNum': 'int8', 'Vuosi': 'int16', 'DayOfYear': 'int16', 'Rikastusyrityksiä': 'int8'}
+
+# ************************************************
+# 1. TYYPIT
+# ************************************************
+
+def parquet_polku(polku: str) -> str:
+    return os.path.splitext(polku)[0] + '.parquet'
+
+def tyypitä(df: pd.DataFrame) -> pd.DataFrame:
+    """Muuntaa tunnetut sarakkeet tiiviisiin tyyppeihin (tuntemattomat sarakkeet ennallaan)."""
+    df = df.copy()
+    if 'Päivämäärä' in df.columns:
+        df['Päivämäärä'] = pd.to_datetime(df['Päivämäärä'], errors='coerce')
+    for sarake in KATEGORIAT:
+        if sarake in df.columns:
+            df[sarake] = df[sarake].astype('category')
+    for sarake in PIIRTEET_FLOAT32:
+        if sarake in df.columns:
+            df[sarake] = pd.to_numeric(df[sarake], errors='coerce').astype(np.float32)
+    for sarake in KOORDINAATIT:
+        if sarake in df.columns:
+            df[sarake] = pd.to_numeric(df[sarake], errors='coerce').astype(np.float64)
+    for sarake, tyyppi in KOKONAISLUVUT.items():
+        if sarake in df.columns:
+            arvot = pd.to_numeric(df[sarake], errors='coerce')
+            # Puuttuvia arvoja ei voi esittää kokonaislukuina: silloin float32
+            df[sarake] = arvot.astype(tyyppi) if arvot.notna().all() else arvot.astype(np.float32)
+    return df
+
+def csv_tyypit(sarakkeet: Optional[List[str]] = None) -> dict:
+    """read_csv-funktion dtype-parametri (kategoriat ja float32 suoraan lukuvaiheessa)."""
+    tyypit = {s: 'category' for s in KATEGORIAT}
+    tyypit.update({s: np.float32 for s in PIIRTEET_FLOAT32})
+    tyypit.update({s: np.float64 for s in KOORDINAATIT})
+    if sarakkeet is not None:
+        tyypit = {s: t for s, t in tyypit.items() if s in sarakkeet}
+    return tyypit
+
+# ************************************************
+# 2. LUKU JA KIRJOITUS
+# ************************************************
+
+def parquet_ajan_tasalla(polku: str) -> bool:
+    """Onko polun Parquet-kopio olemassa ja vähintään yhtä tuore kuin CSV."""
+    pq = parquet_polku(polku)
+    if not PARQUET_KÄYTÖSSÄ or not os.path.exists(pq):
+        return False
+    return not os.path.exists(polku) or os.path.getmtime(pq) >= os.path.getmtime(polku)
+
+def lue(polku: str, sarakkeet: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lukee rikastetun datan tyypitettynä. polku on CSV-tiedosto; sen Parquet-kopiota käytetään,
+    jos se on ajan tasalla. sarakkeet rajaa luettavat sarakkeet (Parquet lukee vain ne levyltä).
+    """
+    if parquet_ajan_tasalla(polku):
+        return tyypitä(pd.read_parquet(parquet_polku(polku), columns=sarakkeet))
+
+    df = pd.read_csv(polku, sep=';', usecols=sarakkeet, dtype=csv_tyypit(sarakkeet))
+    return tyypitä(df)
+
+def tallenna_parquet(df: pd.DataFrame, polku: str) -> Optional[str]:
+    """
+    Kirjoittaa tyypitetyn Parquet-kopion CSV-polun viereen (atomisesti). Palauttaa Parquet-polun
+    tai None, jos pyarrow ei ole käytettävissä.
+    """
+    if not PARQUET_KÄYTÖSSÄ:
+        print("pyarrow puuttuu: Parquet-kopiota ei kirjoitettu, data luetaan CSV:stä.")
+        return None
+    pq = parquet_polku(polku)
+    tyypitä(df).to_parquet(pq + '.tmp', index=False)
+    os.replace(pq + '.tmp', pq)
+    return pq
+
+# ************************************************
+# 3. MUUNNOS KOMENTORIVILTÄ
+# ************************************************
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    lähde = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rikastettu_sinileva_data.csv')
+    alku = time.perf_counter()
+    df_csv = pd.read_csv(lähde, sep=';')
+    csv_aika = time.perf_counter() - alku
+    print(f"CSV: {len(df_csv)} riviä, {csv_aika:.3f} s, {df_csv.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+
+    pq = tallenna_parquet(df_csv, lähde)
+    if pq:
+        alku = time.perf_counter()
+        df_pq = lue(lähde)
+        print(f"Parquet: {pq} ({os.path.getsize(pq) / 1e6:.1f} MB), luku {time.perf_counter() - alku:.3f} s, "
+              f"{df_pq.memory_usage(deep=True).sum() / 1e6:.1f} MB")
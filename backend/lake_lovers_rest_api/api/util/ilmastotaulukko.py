@@ -0,0 +1,81 @@
+import pandas as pd
+import numpy as np
+from sklearn.neighbors import BallTree
+from typing import Tuple
+from .mallirekisteri import rekisteri, SÄÄSARAKKEET
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+MIN_HAVAINNOT = 5 # Alle tämän havaintomäärän käytetään kuukauden globaalia keskiarvoa
+
+# ************************************************
+# 1. ILMASTOTAULUKKO
+# ************************************************
+
+class Ilmastotaulukko:
+    """
+    Asemakohtaiset kuukausittaiset 7 päivän säätilastot valmiiksi laskettuna.
+
+    Taulukkoon tallennetaan summat ja havaintomäärät (asema x kuukausi x piirre),
+    jolloin k lähimmän aseman keskiarvo saadaan yhdellä indeksihaulla ja pienellä
+    taulukkoredusoinnilla. Tulos on sama kuin kaikkien lähimpien asemien kuukauden
+    havaintorivien keskiarvo.
+    """
+
+    def __init__(self, asemat: np.ndarray, summat: np.ndarray, lukumäärät: np.ndarray,
+                 globaalit: np.ndarray, globaalit_lkm: np.ndarray):
+        self.asemat = asemat                # (S, 2) lat/lon
+        self.summat = summat                # (S, 12, 3)
+        self.lukumäärät = lukumäärät        # (S, 12)
+        self.globaalit = globaalit          # (12, 3) kuukauden globaali keskiarvo
+        self.globaalit_lkm = globaalit_lkm  # (12,)
+        self.puu = BallTree(asemat)
+
+    def hae_keskiarvot(self, lat: np.ndarray, lon: np.ndarray, kuukausi: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Palauttaa (N, 3) taulukon tyypillisiä sääarvoja sekä totuusarvotaulukon
+        riveistä, joilla jouduttiin käyttämään kuukauden globaalia keskiarvoa.
+        """
+        pisteet = np.column_stack([np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)])
+        kk = np.asarray(kuukausi, dtype=int) - 1
+        k = min(k, len(self.asemat))
+
+        _, indeksit = self.puu.query(pisteet, k=k)              # (N, k)
+        summat = self.summat[indeksit, kk[:, None]].sum(axis=1)   # (N, 3)
+        lukumäärät = self.lukumäärät[indeksit, kk[:, None]].sum(axis=1)
+
+        globaali = lukumäärät < MIN_HAVAINNOT
+        with np.errstate(invalid='ignore', divide='ignore'):
+            arvot = summat / lukumäärät[:, None]
+        arvot[globaali] = self.globaalit[kk[globaali]]
+        return arvot, globaali
+
+def rakenna_ilmastotaulukko(df: pd.DataFrame) -> Ilmastotaulukko:
+    """Laskee asema x kuukausi -säätilastot valmistellusta historiadatasta."""
+    # Asemajoukko kaikista riveistä (kuten alkuperäisessä drop_duplicates-haussa), myös niistä,
+    # joiden päivämäärä puuttuu; kuukausitilastoihin summataan vain päivätyt rivit.
+    asemat, aseman_id = np.unique(df[['Latitude_DD', 'Longitude_DD']].to_numpy(), axis=0, return_inverse=True)
+    kuukausi = df['Päivämäärä'].dt.month
+    päivätty = kuukausi.notna().to_numpy()
+    aseman_id = aseman_id.ravel()[päivätty]
+    kk = kuukausi[päivätty].to_numpy(dtype=int) - 1
+    arvot = df.loc[päivätty, SÄÄSARAKKEET].to_numpy(dtype=float)
+
+    summat = np.zeros((len(asemat), 12, len(SÄÄSARAKKEET)))
+    lukumäärät = np.zeros((len(asemat), 12))
+    np.add.at(summat, (aseman_id, kk), arvot)
+    np.add.at(lukumäärät, (aseman_id, kk), 1)
+
+    globaalit_lkm = lukumäärät.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        globaalit = summat.sum(axis=0) / globaalit_lkm[:, None]
+
+    print(f"Ilmastotaulukko rakennettu: {len(asemat)} asemaa x 12 kuukautta.")
+    return Ilmastotaulukko(asemat, summat, lukumäärät, globaalit, globaalit_lkm)
+
+# Lasketaan uudelleen aina, kun rekisterin historiadata ladataan uudelleen
+rekisteri.rekisteröi_johdettu('ilmasto', 'historia', rakenna_ilmastotaulukko)
+
+def hae_ilmastotaulukko() -> Ilmastotaulukko:
+    return rekisteri.hae('ilmasto')
@@ -0,0 +1,128 @@
+import requests
+import numpy as np
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_date, parse_datetime
+from sklearn.neighbors import BallTree
+from ..models import Data, assign_sync_seq
+from .paikkaindeksi import MAAN_SÄDE_KM
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+DEFAULT_FEED_URL = "https://rajapinnat.ymparisto.fi/api/kansalaishavainnot/1.0/requests.json?service_code=algaebloom_service_code_201808151546171&extension=true"
+LEVEL_ATTRIBUTE = "algaebloom_singlevaluelist_201808151546174"
+SYNC_FIELDS = ["date", "level", "txt", "upkeep", "description", "latitude", "longitude", "province", "operator", "sync_seq"]
+ID_CHUNK = 500 # SQLite:n muuttujarajan alapuolella pysyvä IN-kyselyn koko
+ELY_ETÄISYYS_KM = 50 # Tätä kauempana lähimmästä tunnetusta havaintopaikasta ELY-keskus jätetään tyhjäksi
+
+# ************************************************
+# 1. SYÖTTEEN HAKU JA MUUNNOS
+# ************************************************
+
+def hae_syote(url: Optional[str] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Hakee SYKE:n levähavaintosyötteen (Open311-muotoinen JSON-lista)."""
+    url = url or getattr(settings, "SYKE_FEED_URL", DEFAULT_FEED_URL)
+    timeout = timeout or getattr(settings, "SYKE_FEED_TIMEOUT", 20)
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+def _päivämäärä(arvo: Optional[str]) -> Optional[date]:
+    if not arvo:
+        return None
+    aika = parse_datetime(arvo)
+    if aika is not None:
+        return aika.date()
+    return parse_date(arvo[:10])
+
+def muunna_havainto(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Muuntaa yhden syötteen havainnon Data-mallin kentiksi (None, jos havainto on puutteellinen)."""
+    päivämäärä = _päivämäärä(item.get("requested_datetime"))
+    if not item.get("service_request_id") or päivämäärä is None:
+        return None
+    try:
+        level = int((item.get("attributes") or {}).get(LEVEL_ATTRIBUTE, 0) or 0)
+    except (TypeError, ValueError):
+        level = 0
+    return {
+        "date": päivämäärä,
+        "level": level,
+        "txt": item.get("status") or "",
+        "upkeep": item.get("agency_responsible") or "",
+        "description": item.get("description") or "",
+        "latitude": float(item.get("lat") or 0),
+        "longitude": float(item.get("long") or 0),
+    }
+
+def täydennä_ely_keskukset(havainnot: Iterable[Dict[str, Any]]) -> None:
+    """
+    Syötteessä ei ole ELY-keskusta: province- ja operator-kentät otetaan lähimmältä
+    CSV-aineistosta tuodulta havaintopaikalta (haversine-BallTree). Kauempana kuin
+    ELY_ETÄISYYS_KM olevat havainnot jäävät ilman ELY-keskusta.
+    """
+    havainnot = list(havainnot)
+    asemat = list(
+        Data.objects.filter(service_request_id__isnull=True)
+        .exclude(province__isnull=True, operator="")
+        .values_list("latitude", "longitude", "province", "operator")
+        .distinct()
+    )
+    for kentät in havainnot:
+        kentät["province"], kentät["operator"] = None, ""
+    if not havainnot or not asemat:
+        return
+
+    puu = BallTree(np.radians([(lat, lon) for lat, lon, _, _ in asemat]), metric="haversine")
+    pisteet = np.radians([(k["latitude"], k["longitude"]) for k in havainnot])
+    etäisyydet, indeksit = puu.query(pisteet, k=1)
+    for kentät, etäisyys, i in zip(havainnot, etäisyydet[:, 0], indeksit[:, 0]):
+        if etäisyys * MAAN_SÄDE_KM <= ELY_ETÄISYYS_KM:
+            kentät["province"], kentät["operator"] = asemat[i][2], asemat[i][3]
+
+# ************************************************
+# 2. SYNKRONOINTI PAIKALLISEEN TIETOKANTAAN
+# ************************************************
+
+def synkronoi(url: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, int]:
+    """
+    Hakee syötteen ja päivittää (upsert) sen Data-tauluun service_request_id:n mukaan.
+    Vain uudet ja muuttuneet rivit kirjoitetaan. Palauttaa lukumäärät.
+    """
+    havainnot = {}
+    for item in hae_syote(url, timeout):
+        kentät = muunna_havainto(item)
+        if kentät is not None:
+            havainnot[str(item["service_request_id"])] = kentät
+    täydennä_ely_keskukset(havainnot.values())
+
+    tunnisteet = list(havainnot)
+    olemassa = {}
+    for i in range(0, len(tunnisteet), ID_CHUNK):
+        for rivi in Data.objects.filter(service_request_id__in=tunnisteet[i:i + ID_CHUNK]):
+            olemassa[rivi.service_request_id] = rivi
+
+    uudet, muuttuneet = [], []
+    for tunniste, kentät in havainnot.items():
+        rivi = olemassa.get(tunniste)
+        if rivi is None:
+            uudet.append(Data(service_request_id=tunniste, **kentät))
+        elif any(getattr(rivi, k) != v for k, v in kentät.items()):
+            for k, v in kentät.items():
+                setattr(rivi, k, v)
+            muuttuneet.append(rivi)
+
+    with transaction.atomic():
+        # Muutosnumerot varataan samassa transaktiossa, jotta delta-haku ei ohita rivejä
+        assign_sync_seq(uudet + muuttuneet)
+        Data.objects.bulk_create(uudet, batch_size=ID_CHUNK)
+        Data.objects.bulk_update(muuttuneet, SYNC_FIELDS, batch_size=ID_CHUNK)
+
+    return {
+        "haettu": len(havainnot),
+        "uudet": len(uudet),
+        "muuttuneet": len(muuttuneet),
+        "ennallaan": len(havainnot) - len(uudet) - len(muuttuneet),
+    }
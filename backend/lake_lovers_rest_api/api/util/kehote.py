@@ -0,0 +1,139 @@
+import math
+import datetime
+import pandas as pd
+from dataclasses import dataclass
+from typing import List, Optional
+from ..models import Data
+from ..provinces import PROVINCES
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+LEVÄTILAT = {0: "Ei levää", 1: "Vähäinen määrä levää", 2: "Runsaasti levää", 3: "Erittäin runsaasti levää"}
+MERKKIÄ_PER_TOKEN = 4      # Karkea arvio suomenkieliselle tekstille (Gemini ~4 merkkiä / token)
+KOHTEITA = 10              # Kohteiden TOP-lista ennen budjetin karsintaa
+LISÄTIETOJA = 10           # Lisätieto-otteiden enimmäismäärä ennen budjetin karsintaa
+OTTEEN_PITUUS = 160        # Yksittäisen Lisätiedot-otteen enimmäispituus merkkeinä
+
+def levätila(taso) -> str:
+    """Levätason nimi; syötteen tuntematon taso (muu kuin 0-3) ei kaada kehotteen rakentamista."""
+    return LEVÄTILAT.get(taso, f"Tuntematon levätilanne ({taso})")
+
+# ************************************************
+# 1. DATAN LUKU
+# ************************************************
+
+def lue_havainnot(alku: datetime.date, loppu: datetime.date) -> pd.DataFrame:
+    """Lukee Data-taulun havainnot aikaväliltä muutokset.py:n sarakenimillä."""
+    rivit = Data.objects.filter(date__range=(alku, loppu)).values_list(
+        'date', 'location', 'province', 'operator', 'level', 'description',
+    )
+    df = pd.DataFrame.from_records(
+        list(rivit), columns=['Päivämäärä', 'Havaintopaikka', 'province', 'operator', 'LevätilanneNum', 'Lisätiedot'],
+    )
+    df['Päivämäärä'] = pd.to_datetime(df['Päivämäärä'])
+    df['ELY-keskus'] = df['province'].map(PROVINCES).fillna(df['operator']).replace('', 'Tuntematon ELY-keskus')
+    return df.drop(columns=['province', 'operator'])
+
+def viimeisin_päivä() -> Optional[datetime.date]:
+    return Data.objects.order_by('-date').values_list('date', flat=True).first()
+
+# ************************************************
+# 2. KOOSTEET
+# ************************************************
+
+def arvioi_tokenit(teksti: str) -> int:
+    return math.ceil(len(teksti) / MERKKIÄ_PER_TOKEN)
+
+def yleistilanne(df: pd.DataFrame) -> List[str]:
+    tasot = df['LevätilanneNum'].value_counts()
+    rivit = [
+        f"Havaintoja yhteensä {len(df)} ({df['Päivämäärä'].min():%d.%m.%Y} - {df['Päivämäärä'].max():%d.%m.%Y}), "
+        f"{df['Havaintopaikka'].nunique()} havaintopaikkaa, {df['ELY-keskus'].nunique()} ELY-keskusta."
+    ]
+    rivit += [f"{levätila(taso)}: {int(tasot.get(taso, 0))} havaintoa" for taso in LEVÄTILAT]
+    return rivit
+
+def ely_taulukko(df: pd.DataFrame) -> List[str]:
+    """Havaintomäärät ELY-keskuksittain ja levätasoittain, runsaimmat esiintymät ensin."""
+    taulukko = pd.crosstab(df['ELY-keskus'], df['LevätilanneNum']).reindex(columns=list(LEVÄTILAT), fill_value=0)
+    taulukko['runsaat'] = taulukko[2] + taulukko[3]
+    taulukko['yhteensä'] = taulukko[list(LEVÄTILAT)].sum(axis=1)
+    taulukko = taulukko.sort_values(['runsaat', 'yhteensä'], ascending=False)
+    return [
+        f"{ely}: {r['yhteensä']} havaintoa (ei levää {r[0]}, vähäinen {r[1]}, runsas {r[2]}, erittäin runsas {r[3]})"
+        for ely, r in taulukko.iterrows()
+    ]
+
+def kohteet(df: pd.DataFrame, n: int = KOHTEITA) -> List[str]:
+    """Havaintopaikat suurimman levätason, havaintomäärän ja tuoreuden mukaan."""
+    koosteet = (
+        df.groupby('Havaintopaikka')
+        .agg(maksimi=('LevätilanneNum', 'max'), havaintoja=('LevätilanneNum', 'size'),
+             viimeisin=('Päivämäärä', 'max'), ely=('ELY-keskus', 'first'))
+        .sort_values(['maksimi', 'havaintoja', 'viimeisin'], ascending=False)
+        .head(n)
+    )
+    return [
+        f"{paikka} ({r['ely']}): {levätila(r['maksimi']).lower()}, {r['havaintoja']} havaintoa, viimeisin {r['viimeisin']:%d.%m.%Y}"
+        for paikka, r in koosteet.iterrows()
+    ]
+
+def lisätiedot(df: pd.DataFrame, n: int = LISÄTIETOJA) -> List[str]:
+    """Huomionarvoiset Lisätiedot-otteet: runsaimmat ja tuoreimmat ensin, saman tekstin toistot poistettu."""
+    otteet = df.assign(teksti=df['Lisätiedot'].fillna('').str.strip().str.replace(r'\s+', ' ', regex=True))
+    otteet = otteet[otteet['teksti'] != '']
+    otteet = (
+        otteet.sort_values(['LevätilanneNum', 'Päivämäärä'], ascending=False)
+        .drop_duplicates('teksti')
+        .head(n)
+    )
+    lyhennetyt = otteet['teksti'].where(
+        otteet['teksti'].str.len() <= OTTEEN_PITUUS, otteet['teksti'].str.slice(0, OTTEEN_PITUUS - 1) + '…',
+    )
+    return [
+        f"{r['Päivämäärä']:%d.%m.%Y} {r['Havaintopaikka']} ({levätila(r['LevätilanneNum']).lower()}): {teksti}"
+        for (_, r), teksti in zip(otteet.iterrows(), lyhennetyt)
+    ]
+
+# ************************************************
+# 3. KEHOTE BUDJETIN RAJOISSA
+# ************************************************
+
+@dataclass
+class Kehote:
+    teksti: str
+    data: str      # Pelkkä havaintokooste ilman ohjetta (esim. syötetiivistettä varten)
+    tokenit: int
+    havaintoja: int
+    karsittuja_rivejä: int
+
+def rakenna_kehote(df: pd.DataFrame, ohje: str, budjetti: int) -> Kehote:
+    """
+    Liittää ohjeen ja havaintojen koosteet yhdeksi kehotteeksi, jonka arvioitu koko on
+    enintään budjetti tokenia. Jos budjetti ylittyy, rivejä karsitaan vähiten tärkeästä
+    osiosta alkaen (lisätiedot, kohteet, ELY-keskukset); yleistilanne säilyy aina.
+    """
+    osiot = [
+        ("YLEISTILANNE", yleistilanne(df) if len(df) else ["Ei havaintoja aikavälillä."]),
+        ("ELY-KESKUKSET", ely_taulukko(df) if len(df) else []),
+        ("KOHTEET", kohteet(df) if len(df) else []),
+        ("LISÄTIEDOT", lisätiedot(df) if len(df) else []),
+    ]
+
+    def kokoa() -> str:
+        return "\n\n".join(f"{otsikko}:\n" + "\n".join(f"- {r}" for r in rivit) for otsikko, rivit in osiot if rivit)
+
+    data = kokoa()
+    teksti = f"{ohje}\nDATA ALKAA TÄSTÄ:\n{data}\nDATA PÄÄTTYY TÄHÄN."
+    karsittu = 0
+    while arvioi_tokenit(teksti) > budjetti:
+        karsittavat = [rivit for _, rivit in reversed(osiot[1:]) if rivit]
+        if not karsittavat:
+            break
+        karsittavat[0].pop()
+        karsittu += 1
+        data = kokoa()
+        teksti = f"{ohje}\nDATA ALKAA TÄSTÄ:\n{data}\nDATA PÄÄTTYY TÄHÄN."
+
+    return Kehote(teksti, data, arvioi_tokenit(teksti), len(df), karsittu)
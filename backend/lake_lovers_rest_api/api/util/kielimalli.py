@@ -0,0 +1,205 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from django.conf import settings
+from django.core.cache import caches
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+AI_CACHE = 'ai'   # settings.CACHES: valmiit tiivistelmät (TTL = settings.AI_SUMMARY_TTL)
+
+# ************************************************
+# 1. TAUSTAJÄRJESTELMÄT
+# ************************************************
+
+class GeminiTaustajärjestelmä:
+    """Google Gemini. Asiakas luodaan kerran ja jaetaan kaikkien pyyntöjen kesken."""
+    nimi = 'gemini'
+
+    def __init__(self, malli: str):
+        self.malli = malli
+        self._asiakas = None
+        self._lukko = threading.Lock()
+
+    def asiakas(self):
+        if self._asiakas is None:
+            with self._lukko:
+                if self._asiakas is None:
+                    load_dotenv()
+                    # API-avain ympäristömuuttujasta API_KEY (esim. .env-tiedostosta)
+                    self._asiakas = genai.Client(api_key=os.getenv("API_KEY"))
+        return self._asiakas
+
+    def asetukset(self, system_prompt: str, temperature: float):
+        return types.GenerateContentConfig(system_instruction=system_prompt, temperature=temperature)
+
+    def generoi(self, system_prompt: str, user_prompt: str, temperature: float) -> str:
+        vastaus = self.asiakas().models.generate_content(
+            model=self.malli,
+            contents=user_prompt,
+            config=self.asetukset(system_prompt, temperature),
+        )
+        return vastaus.text
+
+    async def virtaa(self, system_prompt: str, user_prompt: str, temperature: float) -> AsyncIterator[str]:
+        """Tekstin palat sitä mukaa kuin malli tuottaa niitä (SDK:n asynkroninen rajapinta)."""
+        palat = await self.asiakas().aio.models.generate_content_stream(
+            model=self.malli,
+            contents=user_prompt,
+            config=self.asetukset(system_prompt, temperature),
+        )
+        async for pala in palat:
+            if pala.text:
+                yield pala.text
+
+class FakeTaustajärjestelmä:
+    """
+    Paikallinen korvike testeihin ja kehitykseen ilman API-avainta (LLM_BACKEND = "fake").
+    Palauttaa kehotteesta johdetun deterministisen tekstin; viive simuloi mallin vasteaikaa.
+    """
+    nimi = 'fake'
+
+    def __init__(self, viive: float = 0.0):
+        self.viive = viive
+        self.kutsut = 0
+
+    def teksti(self, system_prompt: str, user_prompt: str) -> str:
+        tiiviste = hashlib.sha256((system_prompt + user_prompt).encode('utf-8')).hexdigest()[:12]
+        return f"Testitiivistelmä {tiiviste}: kehotteessa {len(user_prompt.split())} sanaa."
+
+    def generoi(self, system_prompt: str, user_prompt: str, temperature: float) -> str:
+        self.kutsut += 1
+        time.sleep(self.viive)
+        return self.teksti(system_prompt, user_prompt)
+
+    async def virtaa(self, system_prompt: str, user_prompt: str, temperature: float) -> AsyncIterator[str]:
+        self.kutsut += 1
+        sanat = self.teksti(system_prompt, user_prompt).split(" ")
+        for i, sana in enumerate(sanat):
+            await asyncio.sleep(self.viive / len(sanat))
+            yield sana if i == 0 else " " + sana
+
+_taustajärjestelmät: Dict[Tuple[str, str], Any] = {}
+_taustajärjestelmä_lukko = threading.Lock()
+
+def hae_taustajärjestelmä():
+    """Palauttaa asetusten (LLM_BACKEND, LLM_MODEL) mukaisen taustajärjestelmän; sama olio koko prosessille."""
+    avain = (settings.LLM_BACKEND, settings.LLM_MODEL)
+    with _taustajärjestelmä_lukko:
+        if avain not in _taustajärjestelmät:
+            if settings.LLM_BACKEND == 'fake':
+                _taustajärjestelmät[avain] = FakeTaustajärjestelmä(getattr(settings, 'LLM_FAKE_DELAY', 0.0))
+            elif settings.LLM_BACKEND == 'gemini':
+                _taustajärjestelmät[avain] = GeminiTaustajärjestelmä(settings.LLM_MODEL)
+            else:
+                raise ValueError(f"Tuntematon LLM_BACKEND: {settings.LLM_BACKEND}")
+        return _taustajärjestelmät[avain]
+
+# ************************************************
+# 2. SINGLE-FLIGHT
+# ************************************************
+
+class YhteinenLaskenta:
+    """
+    Single-flight: saman avaimen samanaikaiset kutsut odottavat yhtä käynnissä olevaa
+    laskentaa ja saavat sen tuloksen (tai poikkeuksen). Koskee yhtä työprosessia.
+    """
+
+    def __init__(self):
+        self._lukko = threading.Lock()
+        self._käynnissä: Dict[str, Tuple[threading.Event, list]] = {}
+
+    def suorita(self, avain: str, laskenta: Callable[[], Any]) -> Any:
+        with self._lukko:
+            odotettava = self._käynnissä.get(avain)
+            if odotettava is None:
+                valmis, tulos = self._käynnissä[avain] = (threading.Event(), [])
+        if odotettava is not None:
+            odotettava[0].wait()
+            onnistui, arvo = odotettava[1][0]
+            if not onnistui:
+                raise arvo
+            return arvo
+
+        try:
+            arvo = laskenta()
+            tulos.append((True, arvo))
+            return arvo
+        except BaseException as e:
+            tulos.append((False, e))
+            raise
+        finally:
+            with self._lukko:
+                del self._käynnissä[avain]
+            valmis.set()
+
+_yhteinen = YhteinenLaskenta()
+
+# ************************************************
+# 3. VÄLIMUISTITETTU GENEROINTI
+# ************************************************
+
+def syötetiiviste(*osat: Any) -> str:
+    """SHA-256 syötteen osista (havainnot, kehoteversio, ...) välimuistiavaimeksi."""
+    h = hashlib.sha256()
+    for osa in osat:
+        h.update(repr(osa).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+def välimuistiavain(taustajärjestelmä, syöte: str) -> str:
+    return f"ai:{taustajärjestelmä.nimi}:{settings.LLM_MODEL}:{syöte}"
+
+def generoi(syöte: str, system_prompt: str, user_prompt: str, temperature: float, ttl: Optional[int] = None,
+            välimuisti_alias: str = AI_CACHE) -> str:
+    """
+    Palauttaa tiivistelmän välimuistista tai generoi sen. syöte on syötetiiviste() havainnoista
+    ja kehoteversiosta; taustajärjestelmä ja malli lisätään avaimeen tässä. Samanaikaiset
+    samat pyynnöt tekevät vain yhden mallikutsun. ttl oletuksena settings.AI_SUMMARY_TTL;
+    välimuisti_alias valitsee settings.CACHES-välimuistin (oletuksena prosessikohtainen 'ai').
+    """
+    taustajärjestelmä = hae_taustajärjestelmä()
+    avain = välimuistiavain(taustajärjestelmä, syöte)
+    välimuisti = caches[välimuisti_alias]
+
+    teksti = välimuisti.get(avain)
+    if teksti is not None:
+        return teksti
+
+    def laske():
+        # Toinen prosessin säie on voinut tallentaa tuloksen odottaessamme
+        teksti = välimuisti.get(avain)
+        if teksti is None:
+            teksti = taustajärjestelmä.generoi(system_prompt, user_prompt, temperature)
+            välimuisti.set(avain, teksti, settings.AI_SUMMARY_TTL if ttl is None else ttl)
+        return teksti
+
+    return _yhteinen.suorita(avain, laske)
+
+async def virtaa(syöte: str, system_prompt: str, user_prompt: str, temperature: float) -> AsyncIterator[str]:
+    """
+    Asynkroninen versio generoi()-funktiosta: välimuistissa oleva tiivistelmä palautetaan
+    yhtenä palana, muuten mallin palat välitetään heti eteenpäin ja valmis teksti
+    tallennetaan välimuistiin. Virtoja ei yhdistetä (ei single-flightia).
+    """
+    taustajärjestelmä = await asyncio.to_thread(hae_taustajärjestelmä)
+    avain = välimuistiavain(taustajärjestelmä, syöte)
+    välimuisti = caches[AI_CACHE]
+
+    teksti = await välimuisti.aget(avain)
+    if teksti is not None:
+        yield teksti
+        return
+
+    palat = []
+    async for pala in taustajärjestelmä.virtaa(system_prompt, user_prompt, temperature):
+        palat.append(pala)
+        yield pala
+    await välimuisti.aset(avain, "".join(palat), settings.AI_SUMMARY_TTL)
@@ -0,0 +1,142 @@
+import math
+import threading
+from typing import Dict, List, Tuple
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+MIN_ZOOM = 0
+MAX_ZOOM = 16          # Tätä suuremmilla zoom-tasoilla käytetään MAX_ZOOM-ruudukkoa
+SOLUJA_PER_TIILI = 4   # 256 px karttatiili jaetaan 4x4 soluun (~64 px klusterisäde)
+TASOJA = 4             # Levätasot 0-3
+
+# ************************************************
+# 1. KOORDINAATTIMUUNNOKSET
+# ************************************************
+
+def mercator(lat: float, lon: float) -> Tuple[float, float]:
+    """Web Mercator -koordinaatit välillä [0, 1] (sama projektio kuin Leaflet-kartalla)."""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = (lon + 180.0) / 360.0
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)
+    return x, y
+
+def solu(lat: float, lon: float, zoom: int) -> Tuple[int, int]:
+    jako = SOLUJA_PER_TIILI << zoom
+    x, y = mercator(lat, lon)
+    return min(int(x * jako), jako - 1), min(int(y * jako), jako - 1)
+
+# ************************************************
+# 2. RUUDUKKOINDEKSI
+# ************************************************
+
+class Klusteri:
+    """Solun koosteet: lukumäärä, koordinaattien summat ja levätasojen histogrammi."""
+    __slots__ = ('lukumäärä', 'lat_summa', 'lon_summa', 'tasot')
+
+    def __init__(self):
+        self.lukumäärä = 0
+        self.lat_summa = 0.0
+        self.lon_summa = 0.0
+        self.tasot = [0] * TASOJA
+
+    def lisää(self, lat: float, lon: float, taso: int, etumerkki: int = 1) -> None:
+        self.lukumäärä += etumerkki
+        self.lat_summa += etumerkki * lat
+        self.lon_summa += etumerkki * lon
+        self.tasot[min(max(taso, 0), TASOJA - 1)] += etumerkki
+
+    def maksimitaso(self) -> int:
+        return max(i for i, n in enumerate(self.tasot) if n > 0)
+
+class KlusteriIndeksi:
+    """
+    Havaintojen klusterit jokaiselle zoom-tasolle valmiiksi laskettuna.
+
+    Indeksi päivitetään inkrementaalisesti Data.sync_seq-kentän avulla: jokainen
+    päivitys lukee vain edellisen päivityksen jälkeen lisätyt tai muuttuneet rivit.
+    Muuttuneen rivin vanha osuus vähennetään soluistaan ennen uuden lisäämistä, joten
+    histogrammi (ja siten maksimitaso) pysyy oikeana. Poistettuja rivejä sync_seq ei
+    näytä; ne havaitaan rivimäärän muutoksesta, jolloin indeksi rakennetaan uudelleen.
+    """
+
+    def __init__(self):
+        self._lukko = threading.Lock()
+        self._tyhjennä()
+
+    def _tyhjennä(self) -> None:
+        self._tasot: List[Dict[Tuple[int, int], Klusteri]] = [{} for _ in range(MIN_ZOOM, MAX_ZOOM + 1)]
+        self._rivit: Dict[int, Tuple[float, float, int]] = {}
+        self.viimeisin_seq = 0
+
+    def _lisää_rivi(self, id: int, lat: float, lon: float, taso: int) -> None:
+        vanha = self._rivit.get(id)
+        if vanha is not None:
+            self._kirjaa(*vanha, etumerkki=-1)
+        self._rivit[id] = (lat, lon, taso)
+        self._kirjaa(lat, lon, taso, etumerkki=1)
+
+    def _kirjaa(self, lat: float, lon: float, taso: int, etumerkki: int) -> None:
+        for zoom, solut in enumerate(self._tasot, start=MIN_ZOOM):
+            avain = solu(lat, lon, zoom)
+            klusteri = solut.get(avain)
+            if klusteri is None:
+                klusteri = solut[avain] = Klusteri()
+            klusteri.lisää(lat, lon, taso, etumerkki)
+            if klusteri.lukumäärä == 0:
+                del solut[avain]
+
+    def päivitä(self, havainnot) -> int:
+        """
+        Lukee Data-taulusta viimeisimmän sync_seq-arvon jälkeiset rivit indeksiin.
+        Palauttaa käsiteltyjen rivien määrän.
+        """
+        with self._lukko:
+            käsitelty = self._lue_uudet(havainnot)
+            if havainnot.count() != len(self._rivit):
+                print("Klusteri-indeksin rivimäärä ei täsmää (rivejä poistettu), rakennetaan uudelleen...")
+                self._tyhjennä()
+                käsitelty = self._lue_uudet(havainnot)
+            return käsitelty
+
+    def _lue_uudet(self, havainnot) -> int:
+        uudet = (
+            havainnot.filter(sync_seq__gt=self.viimeisin_seq)
+            .order_by('sync_seq')
+            .values_list('id', 'latitude', 'longitude', 'level', 'sync_seq')
+        )
+        käsitelty = 0
+        for id, lat, lon, taso, seq in uudet.iterator(chunk_size=5000):
+            self._lisää_rivi(id, lat, lon, taso)
+            self.viimeisin_seq = seq
+            käsitelty += 1
+        return käsitelty
+
+    def hae(self, zoom: int, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> List[dict]:
+        """Palauttaa näkymän (rajausalueen) klusterit annetulla zoom-tasolla."""
+        zoom = min(max(zoom, MIN_ZOOM), MAX_ZOOM)
+        x0, y1 = solu(lat_min, lon_min, zoom)
+        x1, y0 = solu(lat_max, lon_max, zoom)
+
+        with self._lukko:
+            solut = self._tasot[zoom - MIN_ZOOM]
+            if (x1 - x0 + 1) * (y1 - y0 + 1) < len(solut):
+                ehdokkaat = ((k, solut.get(k)) for k in ((x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)))
+            else:
+                ehdokkaat = ((k, v) for k, v in solut.items() if x0 <= k[0] <= x1 and y0 <= k[1] <= y1)
+
+            return [
+                {
+                    "lat": k.lat_summa / k.lukumäärä,
+                    "lon": k.lon_summa / k.lukumäärä,
+                    "count": k.lukumäärä,
+                    "max_level": k.maksimitaso(),
+                    "levels": list(k.tasot),
+                }
+                for _, k in sorted(ehdokkaat, key=lambda kv: kv[0])
+                if k is not None
+            ]
+
+# Prosessinlaajuinen indeksi; päivitetään jokaisen haun yhteydessä
+indeksi = KlusteriIndeksi()
@@ -0,0 +1,161 @@
+import pandas as pd
+import numpy as np
+import os
+import hashlib
+import joblib
+import pathlib
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+from . import aineisto
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+file_path = pathlib.Path().resolve()
+INPUT_FILE = os.path.join(file_path, 'api/util/rikastettu_sinileva_data.csv')
+MODEL_FILE = os.path.join(file_path, 'api/util/levamalli_xgboost.joblib')
+# Valinnainen versiomerkki: tiedoston sisällön muuttaminen pakottaa uudelleenlatauksen,
+# vaikka mallin/datan muokkausaika ei muuttuisi (esim. kopioitu tiedosto säilyttää mtime:n).
+VERSION_FILE = os.path.join(file_path, 'api/util/malliversio.txt')
+
+SÄÄSARAKKEET = ['Ilma_Lämpötila_7d_C', 'Sadanta_7d_mm', 'Tuuli_7d_ms']
+# Ennustus tarvitsee historiasta vain nämä sarakkeet (asemat, ELY-rajaus ja ilmastotaulukko)
+HISTORIA_SARAKKEET = ['Päivämäärä', 'LevätilanneNum', 'Latitude_DD', 'Longitude_DD', 'ELY-keskus'] + SÄÄSARAKKEET
+
+# ************************************************
+# 1. LATAUSFUNKTIOT
+# ************************************************
+
+def lataa_malli(polku: str):
+    """Lataa koulutetun XGBoost-mallin levyltä."""
+    return joblib.load(polku)
+
+def lataa_historia(polku: str) -> pd.DataFrame:
+    """
+    Lukee rikastetun datan (tyypitettynä, Parquet-kopiosta jos ajan tasalla) ja valmistelee
+    sen ennustusta varten: DayOfYear sin/cos -piirteet ja puuttuvien säätietojen poisto.
+    """
+    df = aineisto.lue(polku, HISTORIA_SARAKKEET)
+    df['DayOfYear'] = df['Päivämäärä'].dt.dayofyear
+    df['DayOfYear_sin'] = np.sin(2 * np.pi * df['DayOfYear'] / 365).astype(np.float32)
+    df['DayOfYear_cos'] = np.cos(2 * np.pi * df['DayOfYear'] / 365).astype(np.float32)
+    return df.dropna(subset=SÄÄSARAKKEET + ['LevätilanneNum']).copy()
+
+# ************************************************
+# 2. REKISTERI
+# ************************************************
+
+class MalliRekisteri:
+    """
+    Prosessinlaajuinen välimuisti mallille ja historiadatalle.
+
+    Jokainen merkintä ladataan kerran per työprosessi ja ladataan uudelleen
+    automaattisesti, kun lähdetiedoston muokkausaika tai versiomerkki muuttuu.
+    Johdetut merkinnät (esim. ilmastotaulukko) lasketaan uudelleen, kun niiden
+    lähdemerkintä vaihtuu. Palautettuja olioita EI saa muokata, koska ne jaetaan
+    kaikkien pyyntöjen kesken.
+    """
+
+    def __init__(self, versiotiedosto: Optional[str] = None):
+        self._lukko = threading.RLock()
+        self._versiotiedosto = versiotiedosto
+        self._lähteet: Dict[str, Tuple[str, Callable[[str], Any]]] = {}
+        self._johdetut: Dict[str, Tuple[str, Callable[[Any], Any]]] = {}
+        # nimi -> (allekirjoitus, arvo); tallennetaan parina, jotta lukeminen ilman lukkoa on turvallista
+        self._välimuisti: Dict[str, Tuple[Any, Any]] = {}
+        self._tiivisteet: Dict[str, Tuple[Any, str]] = {}
+
+    def rekisteröi(self, nimi: str, polku: str, lataaja: Callable[[str], Any]) -> None:
+        """Rekisteröi tiedostosta ladattavan merkinnän."""
+        with self._lukko:
+            self._lähteet[nimi] = (polku, lataaja)
+            self._välimuisti.pop(nimi, None)
+
+    def rekisteröi_johdettu(self, nimi: str, lähde: str, laskija: Callable[[Any], Any]) -> None:
+        """Rekisteröi merkinnän, joka lasketaan toisen merkinnän arvosta."""
+        with self._lukko:
+            self._johdetut[nimi] = (lähde, laskija)
+            self._välimuisti.pop(nimi, None)
+
+    def _versiomerkki(self) -> Optional[str]:
+        if not self._versiotiedosto:
+            return None
+        try:
+            with open(self._versiotiedosto, encoding='utf-8') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def allekirjoitus(self, nimi: str) -> Any:
+        """Palauttaa merkinnän nykyisen lähdeallekirjoituksen (mtime, koko, versio)."""
+        if nimi in self._johdetut:
+            return self.allekirjoitus(self._johdetut[nimi][0])
+        polku, _ = self._lähteet[nimi]
+        tila = os.stat(polku)  # FileNotFoundError välitetään kutsujalle
+        return (tila.st_mtime_ns, tila.st_size, self._versiomerkki())
+
+    def tiiviste(self, nimi: str) -> str:
+        """
+        Palauttaa lähdetiedoston sisällön SHA-256-tiivisteen (versiomerkki mukaan lukien).
+        Tiedosto luetaan uudelleen vain, kun sen allekirjoitus on muuttunut.
+        """
+        if nimi in self._johdetut:
+            return self.tiiviste(self._johdetut[nimi][0])
+        allekirjoitus = self.allekirjoitus(nimi)
+        tallennettu = self._tiivisteet.get(nimi)
+        if tallennettu is not None and tallennettu[0] == allekirjoitus:
+            return tallennettu[1]
+
+        polku, _ = self._lähteet[nimi]
+        h = hashlib.sha256()
+        with open(polku, 'rb') as f:
+            for lohko in iter(lambda: f.read(1 << 20), b''):
+                h.update(lohko)
+        h.update(str(allekirjoitus[2]).encode('utf-8'))
+        self._tiivisteet[nimi] = (allekirjoitus, h.hexdigest())
+        return h.hexdigest()
+
+    def hae(self, nimi: str) -> Any:
+        """Palauttaa merkinnän arvon ja lataa sen tarvittaessa uudelleen."""
+        allekirjoitus = self.allekirjoitus(nimi)
+        tallennettu = self._välimuisti.get(nimi)
+        if tallennettu is not None and tallennettu[0] == allekirjoitus:
+            return tallennettu[1]
+
+        with self._lukko:
+            # Toinen säie on voinut ladata arvon sillä välin
+            tallennettu = self._välimuisti.get(nimi)
+            if tallennettu is not None and tallennettu[0] == allekirjoitus:
+                return tallennettu[1]
+
+            if nimi in self._johdetut:
+                lähde, laskija = self._johdetut[nimi]
+                print(f"Lasketaan '{nimi}' uudelleen lähteestä '{lähde}'...")
+                arvo = laskija(self.hae(lähde))
+            else:
+                polku, lataaja = self._lähteet[nimi]
+                print(f"Ladataan '{nimi}' tiedostosta {os.path.basename(polku)}...")
+                arvo = lataaja(polku)
+
+            self._välimuisti[nimi] = (allekirjoitus, arvo)
+            return arvo
+
+    def tyhjennä(self) -> None:
+        """Unohtaa kaikki ladatut arvot (seuraava haku lataa ne uudelleen)."""
+        with self._lukko:
+            self._välimuisti.clear()
+            self._tiivisteet.clear()
+
+# ************************************************
+# 3. OLETUSREKISTERI
+# ************************************************
+
+rekisteri = MalliRekisteri(VERSION_FILE)
+rekisteri.rekisteröi('malli', MODEL_FILE, lataa_malli)
+rekisteri.rekisteröi('historia', INPUT_FILE, lataa_historia)
+
+def hae_malli():
+    return rekisteri.hae('malli')
+
+def hae_historia() -> pd.DataFrame:
+    return rekisteri.hae('historia')
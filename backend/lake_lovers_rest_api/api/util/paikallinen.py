@@ -0,0 +1,141 @@
+import re
+import datetime
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+from typing import Optional
+import pandas as pd
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Max, Q
+from django.utils import timezone
+from ..models import Data, LocationClick
+from . import kielimalli, paikkaindeksi
+from .kehote import LEVÄTILAT
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+KEHOTE_VERSIO = 1
+PAIKALLINEN_CACHE = 'local-summaries'   # Levyvälimuisti (settings.CACHES), jaettu esigeneroinnin kanssa
+SOLU_ASTE = 0.05        # Klikkaus pyöristetään tämän kokoiseen soluun (~5 km); solu jakaa välimuistin
+ASEMIA_ENINTÄÄN = 200   # Säteen sisältä huomioitavien havaintopaikkojen enimmäismäärä
+HISTORIA = 10           # Kehotteeseen otettavien viimeisimpien havaintojen määrä
+
+SYSTEM_PROMPT = (
+    "Olet vesistöasiantuntija. Laadi lyhyt, informatiivinen yhteenveto annetun vesistön sinilevätilanteesta. "
+    "**Perustele vesistön laatu (LevätilanneNum) ja sinilevätilanteen tyypillisyys (poikkeuksellisuus) annettujen historiallisten havaintojen perusteella, erityisesti päivämääriin ja LevätilanneNum-arvoihin nojautuen.** "
+    "LevätilanneNum-arvoihin liittyvät merkitykset ovat: 0 = Ei levää, 1 = Vähäinen määrä levää, 2 = Runsaasti levää, 3 = Erittäin runsaasti levää, älä käytä numeroita sellaisenaan vaan merkityksi. "
+    "Käytä netistä löytyviä luotettavia lähteitä tarvittaessa taustatiedon tarkistamiseen, kuten jos viimeisimmästä havainnosta on pitkä aika on levätilanne luultavasti muuttunut. "
+    "Tarkoitus on tietää millainen tilanne vesistössä on sinilevän osalta TÄLLÄ HETKELLÄ. "
+    "Vastaa AINOASTAAN suomeksi. Maksimi 150 sanaa."
+)
+
+# ************************************************
+# 1. SOLU JA LÄHIALUE
+# ************************************************
+
+def solu(lat: float, lon: float) -> tuple:
+    """Pyöristää koordinaatit solun keskipisteeseen."""
+    return round(round(lat / SOLU_ASTE) * SOLU_ASTE, 6), round(round(lon / SOLU_ASTE) * SOLU_ASTE, 6)
+
+def lähialueen_havainnot(asemat: list):
+    """Data-rivit annetuilta havaintopaikoilta ((latitude, longitude) -indeksi)."""
+    ehto = reduce(or_, (Q(latitude=a["latitude"], longitude=a["longitude"]) for a in asemat))
+    return Data.objects.filter(ehto)
+
+@dataclass
+class Konteksti:
+    nimi: str
+    viimeisin: datetime.date
+    havaintoja: int
+    user_prompt: str
+
+def rakenna_konteksti(nimi: str, havainnot, säde_km: float) -> Konteksti:
+    """muutokset.analysoi_paikallisesti-funktion kehote Data-taulun riveistä."""
+    df = pd.DataFrame.from_records(
+        list(havainnot.order_by('-date', '-id').values_list('location', 'date', 'level', 'description')),
+        columns=['Havaintopaikka', 'Päivämäärä', 'LevätilanneNum', 'Lisätiedot'],
+    )
+    viimeisin_havainto = df.iloc[0]
+    historiallinen_data = df.head(HISTORIA).copy()
+    historiallinen_data['Päivämäärä'] = pd.to_datetime(historiallinen_data['Päivämäärä']).dt.strftime('%d.%m.%Y')
+    historiallinen_sinilevatilanne = "Viimeiset 10 havaintoa (uudemmasta vanhempaan, LevätilanneNum 0-3):\n" + historiallinen_data[['Päivämäärä', 'LevätilanneNum']].to_string(index=False)
+    viimeisin_levatila = LEVÄTILAT.get(viimeisin_havainto['LevätilanneNum'], "Tuntematon")
+    lisätiedot = viimeisin_havainto['Lisätiedot'] or 'Ei lisätietoja.'
+    viimeisin_pvm = viimeisin_havainto['Päivämäärä'].strftime('%d.%m.%Y')
+
+    tanaan = datetime.date.today().strftime('%d.%m.%Y')
+    user_prompt = f"""
+Laadi tiivistelmän otsikko ainoastaan muodossa '**{nimi} ({säde_km:g} km säde) – Sinilevätilanne**'.
+
+Tee tiivistelmä alueen '{nimi}' lähialueen havainnoista.
+
+- **Tämänhetkinen Päivämäärä:** {tanaan}
+- **Alueen Viimeisin Havainto:** {viimeisin_havainto['Havaintopaikka']} ({viimeisin_pvm}), Levätilanne: {viimeisin_levatila}.
+- **Viimeisimmän havainnon Lisätiedot:** {lisätiedot}
+- **Viimeisimmän havainnon LevätilanneNum:** {viimeisin_havainto['LevätilanneNum']}
+- **Historiallinen Levätilanne (Viimeiset 10 kpl alueelta):**
+{historiallinen_sinilevatilanne}
+- **Koko datamäärä haetulta alueelta:** {len(df)} havaintoa.
+- **HUOMIO: Tämänhetkinen päivämäärä on {tanaan}. Huomioi, miten pitkä aika on kulunut viimeisimmästä havainnosta ({viimeisin_pvm}) ja tee paras veikkaus TÄMÄN HETKISEN levätilanteen osalta. Esimerkiksi syksyllä/talvella vanhat havainnot eivät ole enää luotettavia.**
+
+Laadi yhteenveto, jossa kerrot:
+1. Kohteen tämänhetkisen sinilevätilanteen (viimeisin havainto, huomioiden veikkauksen ajankohdan muutoksen vuoksi).
+2. Arvioi vesistön sinilevätilanteen tyypillisyyden / poikkeuksellisuuden (esim. onko tilanne pysyvä, poikkeuksellisen runsas/matala tai esiintyykö levää harvinaiseen aikaan) perustuen annettuihin historiallisiin tietoihin.
+3. Huomioi ajan muutos ja mahdollinen levätilanteen kehitys.
+4. Perustuen Lisätietoihin, mainitse kaikki laadulliset havainnot.
+5. Annat lyhyen suosituksen käyttäytymisestä sinilevän esiintyessä.
+"""
+    return Konteksti(nimi, viimeisin_havainto['Päivämäärä'], len(df), user_prompt)
+
+# ************************************************
+# 2. TIIVISTELMÄ VÄLIMUISTIN KAUTTA
+# ************************************************
+
+def tiivistelmä(lat: float, lon: float, säde_km: float = 10, kirjaa_klikkaus: bool = False) -> Optional[dict]:
+    """
+    Paikallinen sinilevätiivistelmä klikatun pisteen solulle. Konteksti ja kielimallin
+    vastaus tallennetaan prosessien yhteiseen levyvälimuistiin avaimella (solu, säde,
+    alueen viimeisin havaintopäivä, päivämäärä), joten saman solun klikkaukset eivät odota
+    mallia uudelleen ennen kuin alueelle tulee uusi havainto. Palauttaa None, jos säteellä ei ole havaintoja.
+    """
+    solu_lat, solu_lon = solu(lat, lon)
+    paikkaindeksi.asemat.päivitä(Data.objects.all())
+    asemat = paikkaindeksi.asemat.hae(solu_lat, solu_lon, säde_km, ASEMIA_ENINTÄÄN)
+    if not asemat:
+        return None
+
+    nimi = re.sub(r'\s*\([\d\.]+\)', '', asemat[0]["location"]).strip()
+    havainnot = lähialueen_havainnot(asemat)
+    viimeisin = havainnot.aggregate(viimeisin=Max('date'))['viimeisin']
+    if kirjaa_klikkaus:
+        kirjaa(solu_lat, solu_lon, säde_km, nimi)
+
+    syöte = kielimalli.syötetiiviste(KEHOTE_VERSIO, solu_lat, solu_lon, säde_km, viimeisin, datetime.date.today())
+    välimuisti = caches[PAIKALLINEN_CACHE]
+    konteksti = välimuisti.get(f"paikallinen:{syöte}")
+    if konteksti is None:
+        konteksti = rakenna_konteksti(nimi, havainnot, säde_km)
+        välimuisti.set(f"paikallinen:{syöte}", konteksti, settings.LOCAL_SUMMARY_TTL)
+
+    teksti = kielimalli.generoi(syöte, SYSTEM_PROMPT, konteksti.user_prompt, temperature=0.2,
+                                ttl=settings.LOCAL_SUMMARY_TTL, välimuisti_alias=PAIKALLINEN_CACHE)
+    return {
+        "location": konteksti.nimi,
+        "cell": [solu_lat, solu_lon],
+        "radius_km": säde_km,
+        "latest_observation": konteksti.viimeisin.isoformat(),
+        "observations": konteksti.havaintoja,
+        "summary": teksti,
+    }
+
+def kirjaa(solu_lat: float, solu_lon: float, säde_km: float, nimi: str) -> None:
+    """Kasvattaa solun klikkauslaskuria (esigenerointi valitsee suosituimmat solut)."""
+    klikkaus, luotu = LocationClick.objects.get_or_create(
+        cell_lat=solu_lat, cell_lon=solu_lon, radius_km=säde_km, defaults={"location": nimi, "clicks": 1},
+    )
+    if not luotu:
+        LocationClick.objects.filter(pk=klikkaus.pk).update(
+            clicks=F("clicks") + 1, location=nimi, last_clicked=timezone.now(),
+        )
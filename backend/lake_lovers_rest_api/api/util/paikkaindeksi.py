@@ -0,0 +1,86 @@
+import threading
+import numpy as np
+from sklearn.neighbors import BallTree
+from typing import Dict, List, Optional, Tuple
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+MAAN_SÄDE_KM = 6371.0
+
+# ************************************************
+# 1. ASEMAINDEKSI
+# ************************************************
+
+class Asemaindeksi:
+    """
+    Havaintopaikkojen (uniikit lat/lon-parit) BallTree-indeksi haversine-metriikalla.
+
+    Säde- ja k-lähimmän haut ovat logaritmisia asemien määrään nähden, eikä niissä
+    käydä läpi havaintotaulua. Indeksi päivitetään Data.sync_seq-kentän avulla:
+    päivitys lukee vain uudet tai muuttuneet rivit ja rakentaa puun uudelleen vain,
+    jos joukossa oli ennestään tuntematon havaintopaikka.
+    """
+
+    def __init__(self):
+        self._lukko = threading.Lock()
+        self._paikat: Dict[Tuple[float, float], int] = {}
+        self._nimet: List[str] = []
+        self._koordinaatit = np.empty((0, 2))
+        self._puu: Optional[BallTree] = None
+        self.viimeisin_seq = 0
+
+    def päivitä(self, havainnot) -> int:
+        """Lisää indeksiin viimeisimmän sync_seq-arvon jälkeen tulleet havaintopaikat. Palauttaa uusien asemien määrän."""
+        with self._lukko:
+            uudet = (
+                havainnot.filter(sync_seq__gt=self.viimeisin_seq)
+                .order_by('sync_seq')
+                .values_list('latitude', 'longitude', 'location', 'sync_seq')
+            )
+            lisätyt = []
+            for lat, lon, nimi, seq in uudet.iterator(chunk_size=5000):
+                indeksi = self._paikat.get((lat, lon))
+                if indeksi is None:
+                    self._paikat[(lat, lon)] = len(self._nimet)
+                    self._nimet.append(nimi)
+                    lisätyt.append((lat, lon))
+                else:
+                    self._nimet[indeksi] = nimi  # Uusin nimi voittaa
+                self.viimeisin_seq = seq
+
+            if lisätyt:
+                self._koordinaatit = np.vstack([self._koordinaatit, np.array(lisätyt, dtype=float)])
+                self._puu = BallTree(np.radians(self._koordinaatit), metric='haversine')
+            return len(lisätyt)
+
+    def hae(self, lat: float, lon: float, säde_km: Optional[float] = None, k: int = 10) -> List[dict]:
+        """
+        Palauttaa enintään k lähintä asemaa etäisyysjärjestyksessä; säde_km rajaa tuloksen
+        annetun säteen sisälle.
+        """
+        with self._lukko:
+            puu, koordinaatit, nimet = self._puu, self._koordinaatit, self._nimet
+        if puu is None:
+            return []
+
+        piste = np.radians([[lat, lon]])
+        if säde_km is None:
+            etäisyydet, indeksit = puu.query(piste, k=min(k, len(koordinaatit)))
+            etäisyydet, indeksit = etäisyydet[0], indeksit[0]
+        else:
+            indeksit, etäisyydet = puu.query_radius(piste, r=säde_km / MAAN_SÄDE_KM, return_distance=True, sort_results=True)
+            etäisyydet, indeksit = etäisyydet[0][:k], indeksit[0][:k]
+
+        return [
+            {
+                "location": nimet[i],
+                "latitude": float(koordinaatit[i, 0]),
+                "longitude": float(koordinaatit[i, 1]),
+                "distance_km": float(d * MAAN_SÄDE_KM),
+            }
+            for i, d in zip(indeksit, etäisyydet)
+        ]
+
+# Prosessinlaajuinen indeksi; päivitetään jokaisen haun yhteydessä
+asemat = Asemaindeksi()
@@ -0,0 +1,79 @@
+import hashlib
+import dataclasses
+import threading
+from typing import Any, Dict, List
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from .mallirekisteri import rekisteri
+from .Ennustaja2 import Skenaario, ai_predict_hotspots
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+MUISTI_CACHE = 'hotspots'          # LRU-muistivälimuisti (settings.CACHES)
+LEVY_CACHE = 'hotspots-disk'       # Valinnainen levytaso, säilyy uudelleenkäynnistysten yli
+
+# ************************************************
+# 1. VÄLIMUISTIAVAIN
+# ************************************************
+
+def välimuistiavain(skenaario: Skenaario) -> str:
+    """Avain = mallitiedoston tiiviste + rikastetun datan tiiviste + skenaarion parametrit."""
+    h = hashlib.sha256()
+    h.update(rekisteri.tiiviste('malli').encode('utf-8'))
+    h.update(rekisteri.tiiviste('historia').encode('utf-8'))
+    h.update(repr(dataclasses.astuple(skenaario)).encode('utf-8'))
+    return f"riskialueet:{h.hexdigest()}"
+
+def _levy():
+    try:
+        return caches[LEVY_CACHE]
+    except InvalidCacheBackendError:
+        return None
+
+# ************************************************
+# 2. HAKU VÄLIMUISTIN KAUTTA
+# ************************************************
+
+def hae_riskialueet(skenaario: Skenaario = Skenaario()) -> List[Dict[str, Any]]:
+    """
+    Palauttaa skenaarion TOP N -riskialueet. Järjestys: muisti -> levy -> laskenta.
+    Koska avain sisältää mallin ja datan tiivisteet, vanhentunutta tulosta ei tarvitse mitätöidä.
+    """
+    avain = välimuistiavain(skenaario)
+    muisti = caches[MUISTI_CACHE]
+
+    tulos = muisti.get(avain)
+    if tulos is not None:
+        return tulos
+
+    levy = _levy()
+    if levy is not None:
+        tulos = levy.get(avain)
+        if tulos is not None:
+            muisti.set(avain, tulos, None)
+            return tulos
+
+    tulos = ai_predict_hotspots(skenaario)
+    muisti.set(avain, tulos, None)
+    if levy is not None:
+        levy.set(avain, tulos, None)
+    return tulos
+
+# ************************************************
+# 3. LÄMMITYS KÄYNNISTYKSESSÄ
+# ************************************************
+
+def lämmitä() -> None:
+    """Laskee oletusskenaarion valmiiksi, jotta kojelaudan aloitusnäkymä latautuu heti."""
+    try:
+        hae_riskialueet(Skenaario())
+        print("Riskialueiden välimuisti lämmitetty (oletusskenaario).")
+    except Exception as e:
+        print(f"VAROITUS: Riskialueiden välimuistin lämmitys epäonnistui: {e}")
+
+def lämmitä_taustalla() -> None:
+    """Käynnistää lämmityksen taustasäikeessä, jos se on sallittu asetuksissa."""
+    if getattr(settings, 'HOTSPOT_CACHE_WARMUP', False):
+        threading.Thread(target=lämmitä, name='riskialue-lammitys', daemon=True).start()
@@ -0,0 +1,74 @@
+import datetime
+from typing import Optional
+from django.conf import settings
+from ..models import Bulletin
+from . import kehote, kielimalli
+
+# ************************************************
+# ASETUKSET JA VAKIOT
+# ************************************************
+TIEDOTE_VERSIO = 1     # Kasvatetaan, kun kehotteita muutetaan
+PÄIVIÄ = 20            # Tiedotteen aikaikkuna tuoreimmasta havainnosta taaksepäin
+
+SYSTEM_PROMPT = (
+    "Olet Suomen Ympäristökeskuksen (SYKE) asiantuntija ja laadit virallisia sinilevätiedotteita. "
+    "Tuota analyyttinen ja yleistajuinen raportti annetusta datasta. **Käytä LISÄTIEDOT-osion sisältöä (jos se ei ole tyhjä) antamaan laadullista lisätietoa havainnoista.** "
+    "Vastaa AINOASTAAN suomeksi, yhtenäisenä, tyyliltään virallista tiedotetta muistuttavana raporttina, jossa ei ole numeroituja luetteloita. Maksimipituus 400 sanaa. **Älä toista samaa informaatiota.**"
+)
+
+# ************************************************
+# 1. TIEDOTTEEN LAADINTA
+# ************************************************
+
+def ohje(aloitus: datetime.date, viimeisin: datetime.date, päivät: int) -> str:
+    """muutokset.laadi_viikkotiedote-funktion käyttäjäkehote koosteelle sovitettuna."""
+    tanaan = datetime.date.today().strftime('%d.%m.%Y')
+    return f"""Tämänhetkinen päivämäärä on: {tanaan}.
+Analysoi alla oleva {päivät} viimeisimmän päivän sinilevähavaintojen kooste ja laadi siitä tiivis, viikoittaista sinilevätiedotetta vastaava yhteenveto.
+Enemmän painoarvoa on viimeisimmillä havainnoilla mutta huomioi miten sinilevä tilanteet voi muuttua ja mahdollisesti pysyä.
+Muodosta tiedote kolmeen yhtenäiseen pääkappaleeseen:
+1.  **Yleistilanne ja yhteenveto:** Aloita tiivistelmän yleiskuvauksella havaintojen aikaväliltä ({aloitus:%d.%m.%Y} - {viimeisin:%d.%m.%Y}). Kerro, kuinka monessa havainnossa levää havaittiin ja kuinka monessa havaittiin runsas/erittäin runsas esiintymä.
+2.  **Alueellinen katsaus ja laadullinen tieto:** Kuvaile ne ELY-keskusten alueet (2-3 keskeisintä) ja vesistöt, joissa runsaita tai erittäin runsaita leväesiintymiä havaittiin eniten. **Sisällytä LISÄTIEDOT-osion laadulliset huomiot luontevasti tähän osioon.** Mainitse havainnot paikoittain tarkasti (esim. järven nimi).
+3.  **Toimenpideohjeistus:** Päätä tiedote lyhyeen ja ytimekkääseen ohjeistukseen siitä, mitä toimenpiteitä sinilevän havaitseminen vaatii.
+"""
+
+def laadi_viikkotiedote(päivät: int = PÄIVIÄ, pakota: bool = False) -> Optional[Bulletin]:
+    """
+    Laatii tiedotteen Data-taulun viimeisimpien päivien havainnoista ja tallentaa sen.
+    Jos samasta syötteestä on jo tiedote, palautetaan se ilman mallikutsua (ellei pakota).
+    Palauttaa None, jos aikaikkunassa ei ole havaintoja.
+    """
+    viimeisin = kehote.viimeisin_päivä()
+    if viimeisin is None:
+        print(f"Ei havaintoja viimeisen {päivät} päivän ajalta. Tiedotetta ei voida laatia.")
+        return None
+    aloitus = viimeisin - datetime.timedelta(days=päivät)
+    df = kehote.lue_havainnot(aloitus, viimeisin)
+    if df.empty:
+        print(f"Ei havaintoja viimeisen {päivät} päivän ajalta. Tiedotetta ei voida laatia.")
+        return None
+
+    koottu = kehote.rakenna_kehote(df, ohje(aloitus, viimeisin, päivät), settings.AI_PROMPT_TOKEN_BUDGET)
+    # Tiiviste ilman ohjeen päivämäärää: sama data -> sama tiedote
+    tiiviste = kielimalli.syötetiiviste(TIEDOTE_VERSIO, aloitus, viimeisin, koottu.data)
+
+    olemassa = Bulletin.objects.filter(input_digest=tiiviste).first()
+    if olemassa is not None and not pakota:
+        print(f"Tiedote aikavälille {aloitus:%d.%m.%Y} - {viimeisin:%d.%m.%Y} on jo ajan tasalla.")
+        return olemassa
+
+    print(f"LAADITAAN VIIKKOTIEDOTE AIKAVÄLILLE: {aloitus:%d.%m.%Y} - {viimeisin:%d.%m.%Y} "
+          f"({koottu.havaintoja} havaintoa, ~{koottu.tokenit} tokenia)")
+    teksti = kielimalli.hae_taustajärjestelmä().generoi(SYSTEM_PROMPT, koottu.teksti, temperature=0.2)
+
+    tiedote, _ = Bulletin.objects.update_or_create(
+        input_digest=tiiviste,
+        defaults={
+            "date_from": aloitus,
+            "date_to": viimeisin,
+            "observations": koottu.havaintoja,
+            "llm_model": settings.LLM_MODEL,
+            "text": teksti,
+        },
+    )
+    return tiedote
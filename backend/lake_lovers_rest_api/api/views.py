@@ -1,166 +1,350 @@
+import datetime
+import json
+from functools import reduce
+from operator import or_
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.http import StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Data
-from .serializers import DataSerializer, ProvinceRequestSerializer, PredictSerializer
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
-import os
-import requests
-from .util.Ennustaja import predict_func
-from .util.Ennustaja2 import ai_predict_hotspots
-import json
+from rest_framework.settings import api_settings
+from .models import Data, Bulletin
+from .listing import DATA_FIELDS, DataRows, json_response, render_json
+from .renderers import BinaryRenderer, ColumnarJSONRenderer, GeoJSONRenderer
+from .provinces import PROVINCES
+from .serializers import (
+    DataQuerySerializer, ProvinceRequestSerializer, ProvinceRangeRequestSerializer,
+    PredictSerializer, HotspotQuerySerializer, ClusterQuerySerializer, NearbyQuerySerializer, BulletinSerializer,
+    LocalSummaryQuerySerializer,
+)
+from .util.Ennustaja import predict_func, predict_batch_func
+from .util.Ennustaja2 import Skenaario
+from .util.riskialuevalimuisti import hae_riskialueet
+from .util import kehote, kielimalli, klusterointi, paikallinen, paikkaindeksi
+
+# Eräennusteen pisteiden enimmäismäärä yhdessä pyynnössä
+PREDICT_BATCH_MAX = 5000
+# Vastaus ennuste- ja riskialuepyyntöihin, kun mallia tai historiaa ei ole vielä koulutettu
+MODEL_MISSING = {"detail": "Ennustemallia ei löytynyt. Aja koulutusskripti ensin."}
+# /api/data/-sivutuksen ja delta-haun rivien enimmäismäärä per vastaus
+DATA_PAGE_LIMIT = 5000
+# Kasvatetaan aina, kun AiView:n kehotteita muutetaan (vanhat välimuistiin tallennetut tiivistelmät ohitetaan)
+AI_PROMPT_VERSION = 2
+# Kannasta kerralla luettavien rivien määrä ?stream=1-vastauksessa
+DATA_STREAM_CHUNK = 2000
+
+def stream_data(items, fields=None, chunk_size=None):
+    """
+    Tuottaa JSON-taulukon paloina: queryset luetaan .iterator()-kutsulla chunk_size
+    rivin erissä, joten muistissa on kerrallaan vain yksi erä riippumatta tuloksen koosta.
+    Tuloste on sama kuin puskuroidussa vastauksessa.
+    """
+    chunk_size = chunk_size or DATA_STREAM_CHUNK
+    rows = DataRows(fields, province_codes=True)
+    separator = b""
+    yield b"["
+    for row in rows.values(items).iterator(chunk_size=chunk_size):
+        yield separator + render_json(rows.to_dict(row))
+        separator = b","
+    yield b"]"
 
-PROVINCES = {
-    1 : "Lapin elinkeino-, liikenne- ja ympäristökeskus",
-    2 : "Pohjois-Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
-    3 : "Kainuun elinkeino-, liikenne- ja ympäristökeskus",
-    4 : "Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
-    5 : "Etelä-Pohjanmaan elinkeino-, liikenne- ja ympäristökeskus",
-    6 : "Keski-Suomen elinkeino-, liikenne- ja ympäristökeskus",
-    7 : "Pohjois-Savon elinkeino-, liikenne- ja ympäristökeskus",
-    8 : "Pohjois-Karjalan elinkeino-, liikenne- ja ympäristökeskus",
-    9 : "Satakunnan elinkeino-, liikenne- ja ympäristökeskus",
-    10 : "Pirkanmaan elinkeino-, liikenne- ja ympäristökeskus",
-    11 : "Hämeen elinkeino-, liikenne- ja ympäristökeskus",
-    12 : "Etelä-Savon elinkeino-, liikenne- ja ympäristökeskus",
-    13 : "Kaakkois-Suomen elinkeino-, liikenne- ja ympäristökeskus",
-    14 : "Varsinais-Suomen elinkeino-, liikenne- ja ympäristökeskus",
-    15 : "Uudenmaan elinkeino-, liikenne- ja ympäristökeskus",
-}
+def filter_data(items, params):
+    """Rajaa havainnot päivämäärävälin, ELY-keskuksen, levätason ja rajausalueen mukaan."""
+    if "date_from" in params:
+        items = items.filter(date__gte=params["date_from"])
+    if "date_to" in params:
+        items = items.filter(date__lte=params["date_to"])
+    if "province" in params:
+        items = items.filter(province=params["province"])
+    if "min_level" in params:
+        items = items.filter(level__gte=params["min_level"])
+    if "lat_min" in params:
+        items = items.filter(latitude__gte=params["lat_min"])
+    if "lat_max" in params:
+        items = items.filter(latitude__lte=params["lat_max"])
+    if "lon_min" in params:
+        items = items.filter(longitude__gte=params["lon_min"])
+    if "lon_max" in params:
+        items = items.filter(longitude__lte=params["lon_max"])
+    return items
+
+def parse_fields(request):
+    """?fields=id,latitude,longitude -> kenttälista (None = kaikki kentät)."""
+    if not request.query_params.get("fields"):
+        return None
+    fields = [f.strip() for f in request.query_params["fields"].split(",") if f.strip()]
+    unknown = set(fields) - set(DATA_FIELDS)
+    if unknown:
+        raise ValueError(f"Tuntemattomat kentät: {', '.join(sorted(unknown))}")
+    return fields
 
 class DataView(APIView):
-    def get(self, request):
-        items = Data.objects.all()
-        serializer = DataSerializer(items, many=True)
+    # ?format=columnar|geojson|binary tai vastaava Accept-otsake; JSON on oletus
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [ColumnarJSONRenderer, GeoJSONRenderer, BinaryRenderer]
 
+    def get(self, request):
+        # Sekä CSV-aineisto että SYKE:n kansalaishavainnot luetaan paikallisesta tietokannasta;
+        # syöte pidetään ajan tasalla sync_observations-komennolla.
+        serializer = DataQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
         try:
-            response = requests.get("https://rajapinnat.ymparisto.fi/api/kansalaishavainnot/1.0/requests.json?service_code=algaebloom_service_code_201808151546171&extension=true")
-        except Exception as e:
-            print(e)
-            response = ""
-
-        api_data = json.loads(response.text)
-        data = []
-
-        for i in api_data:
-            data_point = {
-                "id": i["service_request_id"],
-                "location": "",
-                "operator": "",
-                "date": i["requested_datetime"],
-                "level": i["attributes"].get("algaebloom_singlevaluelist_201808151546174", 0),
-                "txt": i["status"],
-                "tracking": "",
-                "upkeep": i["agency_responsible"],
-                "description": i["description"],
-                "latitude": i["lat"],
-                "longitude": i["long"]
-            },
-            data.append(data_point[0])
-
-        for i in serializer.data:
-            for key, value in PROVINCES.items():
-                if value == i["operator"]:
-                    i["operator"] = key
-                    break
-            data.append(i)
-
-        return Response(data, status=200)
+            fields = parse_fields(request)
+        except ValueError as e:
+            return Response({"fields": [str(e)]}, status=400)
+
+        params = serializer.validated_data
+        items = filter_data(Data.objects.all(), params)
+        if fields is not None and request.accepted_renderer.format == "geojson":
+            # GeoJSON-geometria tarvitsee aina koordinaatit
+            fields = fields + [f for f in ("latitude", "longitude") if f not in fields]
+
+        if "since" in params:
+            return self.get_delta(request, items, params, fields)
+        if "limit" in params or "after" in params:
+            return self.get_page(request, items, params, fields)
+        if params["stream"] and request.accepted_renderer.format == "json":
+            return StreamingHttpResponse(stream_data(items.order_by("id"), fields), content_type="application/json")
+
+        return json_response(request, DataRows(fields, province_codes=True).rows(items.order_by("id")))
+
+    def get_delta(self, request, items, params, fields):
+        """Vain kursorin jälkeen lisätyt tai muuttuneet rivit sync_seq-indeksin järjestyksessä."""
+        limit = params.get("limit", DATA_PAGE_LIMIT)
+        rows = DataRows(fields, province_codes=True)
+        values = list(rows.values(items.filter(sync_seq__gt=params["since"]).order_by("sync_seq"), "sync_seq")[:limit + 1])
+        has_more = len(values) > limit
+        values = values[:limit]
+        cursor = values[-1][-1] if values else params["since"]
+
+        results = [rows.to_dict(row) for row in values]
+        return json_response(request, {"cursor": cursor, "has_more": has_more, "results": results})
+
+    def get_page(self, request, items, params, fields):
+        """Avainjoukkosivutus (keyset) id:n mukaan: ?limit=N&after=<edellisen sivun next>."""
+        limit = params.get("limit", DATA_PAGE_LIMIT)
+        rows = DataRows(fields, province_codes=True)
+        values = list(rows.values(items.filter(id__gt=params.get("after", 0)).order_by("id"), "id")[:limit + 1])
+        next_after = values[limit - 1][-1] if len(values) > limit else None
+
+        results = [rows.to_dict(row) for row in values[:limit]]
+        return json_response(request, {"next": next_after, "results": results})
     
+class ClusterView(APIView):
+    def get(self, request):
+        """?zoom=&lat_min=&lat_max=&lon_min=&lon_max= -> näkymän valmiiksi lasketut markkeriklusterit."""
+        serializer = ClusterQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        params = serializer.validated_data
+        # Lukee vain edellisen haun jälkeen lisätyt tai muuttuneet havainnot
+        klusterointi.indeksi.päivitä(Data.objects.all())
+        clusters = klusterointi.indeksi.hae(
+            params["zoom"], params["lat_min"], params["lat_max"], params["lon_min"], params["lon_max"],
+        )
+        return json_response(request, {"zoom": params["zoom"], "clusters": clusters})
+
+class NearbyView(APIView):
+    def get(self, request):
+        """?lat=&lon=[&radius_km=&k=&recent=] -> lähimmät havaintopaikat ja niiden viimeisimmät havainnot."""
+        serializer = NearbyQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        params = serializer.validated_data
+        paikkaindeksi.asemat.päivitä(Data.objects.all())
+        stations = paikkaindeksi.asemat.hae(params["lat"], params["lon"], params.get("radius_km"), params["k"])
+
+        rows = DataRows(province_codes=True)
+        latest = {}
+        if stations and params["recent"]:
+            # Kaikkien asemien viimeisimmät havainnot yhdellä kyselyllä: rivinumero asemakohtaisesti
+            newest = Data.objects.filter(
+                reduce(or_, (Q(latitude=s["latitude"], longitude=s["longitude"]) for s in stations)),
+            ).annotate(rank=Window(
+                RowNumber(), partition_by=[F("latitude"), F("longitude")], order_by=[F("date").desc(), F("id").desc()],
+            )).filter(rank__lte=params["recent"]).values("id")
+            items = Data.objects.filter(id__in=newest).order_by("-date", "-id")
+            for item in rows.rows(items):
+                latest.setdefault((item["latitude"], item["longitude"]), []).append(item)
+        for station in stations:
+            station["observations"] = latest.get((station["latitude"], station["longitude"]), [])
+        return json_response(request, stations)
+
 class ProvinceView(APIView):
     def post(self, request):
+        # Usea ELY-keskus ja päivämääräväli yhdellä kyselyllä, tulokset ryhmiteltynä
+        if "provinces" in request.data:
+            return self.post_grouped(request)
+
         serializer = ProvinceRequestSerializer(data=request.data)
         if serializer.is_valid():
-            items = Data.objects.raw(
-                f"""
-                SELECT * FROM api_data WHERE operator IS "{PROVINCES[serializer.validated_data['province']]}"
-                AND date IS "{serializer.validated_data['date'].strftime('%Y-%m-%d')}"
-                """
-            )
-            serializer_data = DataSerializer(items, many=True)
-            return Response(serializer_data.data, status=201)
-        return Response(serializer_data.error, status=400)    
+            items = Data.objects.filter(
+                province=serializer.validated_data['province'],
+                date=serializer.validated_data['date'],
+            ).order_by("id")
+            return json_response(request, DataRows().rows(items), status=201)
+        return Response(serializer.errors, status=400)
 
-class AiView(APIView):
-    def get(self, request):
-        
-        try:
-            response = requests.get("https://rajapinnat.ymparisto.fi/api/kansalaishavainnot/1.0/requests.json?service_code=algaebloom_service_code_201808151546171&extension=true")
-        except Exception as e:
-            print(e)
-            response = ""
+    def post_grouped(self, request):
+        """{"provinces": [..], "date_from", "date_to"} -> {province: {date: [havainnot]}}"""
+        serializer = ProvinceRangeRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
 
-        ai_data = []
+        params = serializer.validated_data
+        items = Data.objects.filter(
+            province__in=params["provinces"],
+            date__range=(params["date_from"], params["date_to"]),
+        ).order_by("province", "date", "id")
 
-        for item in response:
-            if (len(ai_data) > 100):
-                break
-            ai_data.append(item)
-        
-        load_dotenv()
+        grouped = {str(p): {} for p in params["provinces"]}
+        for row in DataRows().rows(items):
+            grouped[str(row["province"])].setdefault(row["date"], []).append(row)
+        return json_response(request, grouped, status=201)
 
-        try:
-    # client etsii API-avaimen automaattisesti ympäristömuuttujasta (GEMINI_API_KEY)
-            client = genai.Client(api_key=os.getenv("API_KEY"))
-        except Exception:
-            print("\nVIRHE: Gemini API-avainta ei löytynyt. Aseta GEMINI_API_KEY (esim. VS Code .env-tiedostoon).")
-            exit()
-
-        # 1. PROMPT ENGINEERING (Rajauspromptit)
-        # NYT ON VIELÄ VIIKOITTAINEN
-        system_prompt = (
-            "Olet Suomen Ympäristökeskuksen (SYKE) asiantuntija. Tehtäväsi on laatia tiivistelmä sinilevä tilanteesta."
-            "Tiedotteen tulee olla analyyttinen, yleistajuinen ja noudattaa Suomen vesistöjen "
-            "virallista tiedotustyyliä. Vastaa AINOASTAAN englanniksi. Vastaa yhtenäisenä, useamman "
-            "kappaleen raporttina, maksimissaan 100 sanaa."
-        )
+def ai_summary_prompt():
+    """Palauttaa (syötetiiviste, system_prompt, user_prompt) viimeisimpien päivien havaintojen koosteesta."""
+    # Aikaikkuna päättyy tuoreimpaan havaintoon (ei ulkoista kutsua pyynnön aikana)
+    end = kehote.viimeisin_päivä() or datetime.date.today()
+    df = kehote.lue_havainnot(end - datetime.timedelta(days=settings.AI_SUMMARY_DAYS - 1), end)
 
-        user_prompt = f"""
-        Analysoi alla oleva sinilevähavaintoja koskeva data ja laadi siitä tiivis, viikoittaista 
-        sinilevätiedotetta vastaava yhteenveto. Muodosta tiedote seuraavien ohjeiden mukaisesti:
+    # 1. PROMPT ENGINEERING (Rajauspromptit)
+    system_prompt = (
+        "Olet Suomen Ympäristökeskuksen (SYKE) asiantuntija. Tehtäväsi on laatia tiivistelmä sinilevä tilanteesta."
+        "Tiedotteen tulee olla analyyttinen, yleistajuinen ja noudattaa Suomen vesistöjen "
+        "virallista tiedotustyyliä. Vastaa AINOASTAAN englanniksi. Vastaa yhtenäisenä, useamman "
+        "kappaleen raporttina, maksimissaan 100 sanaa."
+    )
 
+    instructions = """Analysoi alla oleva sinilevähavaintojen kooste ja laadi siitä tiivis, viikoittaista
+sinilevätiedotetta vastaava yhteenveto. Muodosta tiedote seuraavien ohjeiden mukaisesti:
 
+1. Yleistilanne: Aloita kuvaamalla lyhyesti, minkälainen tilanne on sinilevän kanssa.
+2. Alueellinen katsaus: Nimeä ja kuvaile lyhyesti ne ELY-keskusten alueet (2-3 keskeisintä), joissa havaittiin eniten runsaita tai erittäin runsaita leväesiintymiä. Anna alueellinen yhteenveto, älä luettele yksittäisiä paikkoja.
+3. Loppuhuomio: Sisällytä lyhyt yhteenveto.
+4. Ohjeistus: Päätä tiedote lyhyeen ja ytimekkääseen ohjeistukseen toimenpiteistä sinilevän havaitsemisen varalle.
+"""
+    prompt = kehote.rakenna_kehote(df, instructions, settings.AI_PROMPT_TOKEN_BUDGET)
+    print(f"AI-kehote: {prompt.havaintoja} havaintoa, ~{prompt.tokenit} tokenia ({prompt.karsittuja_rivejä} riviä karsittu).")
 
-        1. Yleistilanne: Aloita kuvaamalla lyhyesti, minkälainen tilanne on sinilevän kanssa. "lat" ja "lon" kohdat ovat kordinaatit. Teenäiden mukaan alue analyysi kuinka missäkin ely-keskuksessa on havantoja.
-        Kohdssa "algaebloom_singlevaluelist_201808151546174" on sinilevän tasot. Tasot ovat 0: "Ei levää", 1: "Vähäinen määrä levää", 2: "Runsaasti levää", 3: "Erittäin runsaasti levää".
-        2. Alueellinen katsaus: Nimeä ja kuvaile lyhyesti ne ELY-keskusten alueet (2-3 keskeisintä), joissa havaittiin eniten runsaita tai erittäin runsaita leväesiintymiä. Anna alueellinen yhteenveto, älä luettele yksittäisiä paikkoja.
-        3. Loppuhuomio: Sisällytä lyhyt yhteenveto.
-        4. Ohjeistus: Päätä tiedote lyhyeen ja ytimekkääseen ohjeistukseen toimenpiteistä sinilevän havaitsemisen varalle.
+    return kielimalli.syötetiiviste(AI_PROMPT_VERSION, prompt.teksti), system_prompt, prompt.teksti
 
-        DATA ALKAA TÄSTÄ:
-        {ai_data}
-        DATA PÄÄTTYY TÄHÄN.
-        """
+def sse(event, data):
+    """Server-Sent Events -viesti; data JSON-koodataan, jotta rivinvaihdot säilyvät."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-        # Mallin asetukset
-        config = types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            temperature=0.4, 
-        )
+class AiView(APIView):
+    def get(self, request):
+        syote, system_prompt, user_prompt = ai_summary_prompt()
+
+        try:
+            # Sama data ja kehoteversio -> sama tiivistelmä välimuistista ilman mallikutsua
+            text = kielimalli.generoi(syote, system_prompt, user_prompt, temperature=0.4)
+            return Response(text, status=200)
+
+        except Exception as e:
+            print(f"VIRHE kielimallin kutsussa: {e}")
+            return Response(str(e), status=400)
 
+@require_GET
+async def ai_stream(request):
+    """
+    GET /api/ai/stream/ -> sama tiivistelmä Server-Sent Events -virtana (chunk ... done / error).
+    Asynkroninen näkymä: ajetaan ASGI-palvelimella (lake_lovers_rest_api.asgi), jolloin
+    generoinnin ajaksi ei varata työsäiettä.
+    """
+    async def events():
         try:
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=user_prompt,
-                config=config,
-            )
+            # Kehotteen virheetkin välitetään error-tapahtumana (frontendin streamAiSummary näyttää ne)
+            syote, system_prompt, user_prompt = await sync_to_async(ai_summary_prompt)()
+            async for chunk in kielimalli.virtaa(syote, system_prompt, user_prompt, temperature=0.4):
+                yield sse("chunk", chunk)
+            yield sse("done", "")
+        except Exception as e:
+            print(f"VIRHE kielimallin kutsussa: {e}")
+            yield sse("error", str(e))
 
-            return Response(response.text, status=200)
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
+class LocalSummaryView(APIView):
+    def get(self, request):
+        """?lat=&lon=[&radius_km=] -> klikatun kohdan lähialueen sinilevätiivistelmä (välimuistista solukohtaisesti)."""
+        serializer = LocalSummaryQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        params = serializer.validated_data
+        try:
+            summary = paikallinen.tiivistelmä(params["lat"], params["lon"], params["radius_km"], kirjaa_klikkaus=True)
         except Exception as e:
-            print(f"VIRHE Geminin kutsussa: {e}")
-            return Response(e, status=400)
-        
+            print(f"VIRHE kielimallin kutsussa: {e}")
+            return Response(str(e), status=400)
+
+        if summary is None:
+            return Response({"detail": "Säteellä ei ole havaintoja."}, status=404)
+        return json_response(request, summary)
+
+class BulletinView(APIView):
+    def get(self, request):
+        """Viimeisin tallennettu sinilevätiedote (laaditaan generate_bulletin-komennolla, ei pyynnön aikana)."""
+        bulletin = Bulletin.objects.first()
+        if bulletin is None:
+            return Response({"detail": "Tiedotetta ei ole vielä laadittu."}, status=404)
+        return Response(BulletinSerializer(bulletin).data, status=200)
+
 class PredictView(APIView):
     def get(self, request):
-        response = ai_predict_hotspots()
-        print(response)
+        serializer = HotspotQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        params = serializer.validated_data
+        bbox = None
+        if params.get("lat_min") is not None:
+            bbox = (params["lat_min"], params["lat_max"], params["lon_min"], params["lon_max"])
+        skenaario = Skenaario(
+            lämpötilakerroin=params["temp_factor"],
+            sadantakerroin=params["precip_factor"],
+            tuulikerroin=params["wind_factor"],
+            vuosi=params["year"],
+            kuukaudet=params["months"],
+            top_n=params["top_n"],
+            ely=PROVINCES[params["province"]] if "province" in params else None,
+            bbox=bbox,
+        )
+        try:
+            response = hae_riskialueet(skenaario)
+        except FileNotFoundError:
+            return Response(MODEL_MISSING, status=503)
         return Response(response, status=200)
 
     def post(self, request):
+        # Lista pisteitä -> eräennuste yhdellä mallikutsulla
+        if isinstance(request.data, list):
+            if len(request.data) > PREDICT_BATCH_MAX:
+                return Response({"detail": f"Enintään {PREDICT_BATCH_MAX} pistettä per pyyntö."}, status=400)
+            serializer = PredictSerializer(data=request.data, many=True)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=400)
+            try:
+                response = predict_batch_func(serializer.validated_data)
+            except FileNotFoundError:
+                return Response(MODEL_MISSING, status=503)
+            return Response(response, status=200)
+
         serializer = PredictSerializer(data=request.data)
-        if serializer.is_valid():
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        try:
             response = predict_func(serializer.validated_data["date"], serializer.validated_data["lat"], serializer.validated_data["lon"], serializer.validated_data["name"])
-            return Response(response, status=200)
-        return Response(serializer.error, status=400)
+        except FileNotFoundError:
+            return Response(MODEL_MISSING, status=503)
+        return Response(response, status=200)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lake_lovers_rest_api.settings")
 
 application = get_asgi_application()
+
+# Lasketaan riskialueiden oletusnäkymä välimuistiin taustalla
+from api.util.riskialuevalimuisti import lämmitä_taustalla  # noqa: E402
+
+lämmitä_taustalla()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -85,6 +86,75 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Riskialueiden (hotspot) tulokset; CULL_FREQUENCY == MAX_ENTRIES poistaa
+    # täyttyessä vain vähiten käytetyn merkinnän (LRU)
+    "hotspots": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "hotspots",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 64, "CULL_FREQUENCY": 64},
+    },
+    # Kielimallin tiivistelmät syötteen tiivisteen mukaan (api.util.kielimalli)
+    "ai": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ai",
+        "OPTIONS": {"MAX_ENTRIES": 2048},
+    },
+}
+
+# Valinnainen levytaso riskialueiden välimuistille (säilyy uudelleenkäynnistysten yli)
+HOTSPOT_CACHE_DIR = os.environ.get("HOTSPOT_CACHE_DIR")
+if HOTSPOT_CACHE_DIR:
+    CACHES["hotspots-disk"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": HOTSPOT_CACHE_DIR,
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    }
+
+# Paikalliset tiivistelmät levyllä: esigenerointikomento ja palvelinprosessit jakavat saman
+# välimuistin (LocMemCache näkyisi vain komennon omalle prosessille)
+LOCAL_SUMMARY_CACHE_DIR = os.environ.get("LOCAL_SUMMARY_CACHE_DIR", str(BASE_DIR / "local_summary_cache"))
+CACHES["local-summaries"] = {
+    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+    "LOCATION": LOCAL_SUMMARY_CACHE_DIR,
+    "OPTIONS": {"MAX_ENTRIES": 4096},
+}
+
+# Lasketaanko oletusskenaarion riskialueet valmiiksi palvelimen käynnistyessä
+HOTSPOT_CACHE_WARMUP = os.environ.get("HOTSPOT_CACHE_WARMUP", "1") == "1"
+
+
+# SYKE:n kansalaishavaintosyöte, joka synkronoidaan Data-tauluun
+# (python manage.py sync_observations --interval 900)
+SYKE_FEED_URL = os.environ.get(
+    "SYKE_FEED_URL",
+    "https://rajapinnat.ymparisto.fi/api/kansalaishavainnot/1.0/requests.json?service_code=algaebloom_service_code_201808151546171&extension=true",
+)
+SYKE_FEED_TIMEOUT = 20
+
+
+# Kielimalli: "gemini" tai "fake" (paikallinen korvike ilman API-avainta)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+LLM_MODEL = os.environ.get("LLM_MODEL", "gemini-2.5-flash")
+# Fake-taustajärjestelmän simuloitu vasteaika sekunteina
+LLM_FAKE_DELAY = float(os.environ.get("LLM_FAKE_DELAY", "0"))
+# Kuinka kauan samasta syötteestä generoitu tiivistelmä on voimassa (s)
+AI_SUMMARY_TTL = int(os.environ.get("AI_SUMMARY_TTL", "3600"))
+# Tiivistelmän aikaikkuna (päiviä tuoreimmasta havainnosta) ja kehotteen arvioitu enimmäiskoko
+AI_SUMMARY_DAYS = 7
+AI_PROMPT_TOKEN_BUDGET = int(os.environ.get("AI_PROMPT_TOKEN_BUDGET", "1500"))
+# Paikallisen tiivistelmän voimassaolo; avain vaihtuu joka tapauksessa uuden havainnon tai päivän myötä
+LOCAL_SUMMARY_TTL = int(os.environ.get("LOCAL_SUMMARY_TTL", "86400"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
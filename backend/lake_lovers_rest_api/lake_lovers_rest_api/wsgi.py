@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "lake_lovers_rest_api.settings")
 
 application = get_wsgi_application()
+
+# Lasketaan riskialueiden oletusnäkymä välimuistiin taustalla
+from api.util.riskialuevalimuisti import lämmitä_taustalla  # noqa: E402
+
+lämmitä_taustalla()
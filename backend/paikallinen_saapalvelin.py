@@ -0,0 +1,111 @@
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ************************************************
+# PAIKALLINEN OPEN-METEO-KORVIKE
+# ************************************************
+# Vastaa /v1/archive-pyyntöihin kuten Open-Meteo (daily-muuttujat), mutta tuottaa datan
+# deterministisesti sijainnista ja päivämäärästä. Viive, nopeusraja (429) ja satunnaiset
+# palvelinvirheet ovat säädettäviä, joten rikastuksen läpäisyä voi mitata ilman verkkoa:
+#
+#   python paikallinen_saapalvelin.py --viive 0.2 --raja 20
+#   python saa_asiakas.py --url http://127.0.0.1:8765/v1/archive --nopeus 40
+
+def paivan_arvot(lat: float, lon: float, paiva: date) -> dict:
+    """Vuodenajan mukaan vaihteleva synteettinen sää (sama syöte -> sama vastaus)."""
+    kausi = math.sin(2 * math.pi * (paiva.timetuple().tm_yday - 110) / 365)
+    satunnainen = random.Random(f"{lat:.4f}:{lon:.4f}:{paiva.isoformat()}")
+    return {
+        'temperature_2m_mean': round(4 + 14 * kausi - (lat - 60) * 0.8 + satunnainen.gauss(0, 2), 1),
+        'temperature_2m_max': round(8 + 15 * kausi - (lat - 60) * 0.8 + satunnainen.gauss(0, 2), 1),
+        'precipitation_sum': round(max(0.0, satunnainen.gauss(1.5, 3)), 1),
+        'wind_speed_10m_mean': round(abs(satunnainen.gauss(12, 4)), 1),
+    }
+
+class Nopeusraja:
+    """Liukuva yhden sekunnin ikkuna; raja ylittyy -> 429."""
+
+    def __init__(self, raja: float):
+        self.raja = raja
+        self._lukko = threading.Lock()
+        self._ajat = []
+
+    def salli(self) -> bool:
+        if not self.raja:
+            return True
+        with self._lukko:
+            nyt = time.monotonic()
+            self._ajat = [t for t in self._ajat if nyt - t < 1.0]
+            if len(self._ajat) >= self.raja:
+                return False
+            self._ajat.append(nyt)
+            return True
+
+def tee_kasittelija(viive: float, nopeusraja: Nopeusraja, virheita: float):
+    class Kasittelija(BaseHTTPRequestHandler):
+        def do_GET(self):
+            pyynto = urlparse(self.path)
+            if pyynto.path != '/v1/archive':
+                return self.vastaa(404, {'error': True, 'reason': 'Not found'})
+            if not nopeusraja.salli():
+                return self.vastaa(429, {'error': True, 'reason': 'Too many requests'}, {'Retry-After': '1'})
+            time.sleep(viive)
+            if random.random() < virheita:
+                return self.vastaa(503, {'error': True, 'reason': 'Service unavailable'})
+
+            try:
+                q = {k: v[0] for k, v in parse_qs(pyynto.query).items()}
+                lat, lon = float(q['latitude']), float(q['longitude'])
+                alku, loppu = date.fromisoformat(q['start_date']), date.fromisoformat(q['end_date'])
+                muuttujat = q.get('daily', 'temperature_2m_mean').split(',')
+            except (KeyError, ValueError) as e:
+                return self.vastaa(400, {'error': True, 'reason': f'Invalid parameters: {e}'})
+
+            paivat = [alku + timedelta(days=i) for i in range((loppu - alku).days + 1)]
+            arvot = [paivan_arvot(lat, lon, p) for p in paivat]
+            daily = {'time': [p.isoformat() for p in paivat]}
+            daily.update({m: [a.get(m) for a in arvot] for m in muuttujat})
+            self.vastaa(200, {'latitude': lat, 'longitude': lon, 'daily': daily})
+
+        def vastaa(self, tila: int, data: dict, otsakkeet: dict = None):
+            runko = json.dumps(data).encode('utf-8')
+            self.send_response(tila)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(runko)))
+            for nimi, arvo in (otsakkeet or {}).items():
+                self.send_header(nimi, arvo)
+            self.end_headers()
+            self.wfile.write(runko)
+
+        def log_message(self, *args):
+            pass
+
+    return Kasittelija
+
+def kaynnista(portti: int = 8765, viive: float = 0.0, raja: float = 0.0, virheita: float = 0.0) -> ThreadingHTTPServer:
+    """Käynnistää palvelimen taustasäikeeseen (testejä varten); pysäytys server.shutdown()."""
+    palvelin = ThreadingHTTPServer(('127.0.0.1', portti), tee_kasittelija(viive, Nopeusraja(raja), virheita))
+    threading.Thread(target=palvelin.serve_forever, daemon=True).start()
+    return palvelin
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paikallinen Open-Meteo archive -korvike rikastuksen testaukseen.")
+    parser.add_argument('--portti', type=int, default=8765)
+    parser.add_argument('--viive', type=float, default=0.1, help='Vasteaika sekunteina')
+    parser.add_argument('--raja', type=float, default=0.0, help='Pyyntöjä sekunnissa ennen 429-vastauksia (0 = ei rajaa)')
+    parser.add_argument('--virheita', type=float, default=0.0, help='Satunnaisten 503-vastausten osuus')
+    args = parser.parse_args()
+
+    palvelin = ThreadingHTTPServer(('127.0.0.1', args.portti), tee_kasittelija(args.viive, Nopeusraja(args.raja), args.virheita))
+    print(f"Korvikepalvelin: http://127.0.0.1:{args.portti}/v1/archive (Ctrl+C lopettaa)")
+    try:
+        palvelin.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,243 @@
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import pandas as pd
+import requests
+
+# ************************************************
+# ASETUKSET
+# ************************************************
+
+# Osoitteen voi vaihtaa paikalliseen korvikepalvelimeen (paikallinen_saapalvelin.py) esim. testausta varten
+OPENMETEO_ARCHIVE_URL = os.getenv('OPENMETEO_ARCHIVE_URL', 'https://archive-api.open-meteo.com/v1/archive')
+DAILY_MUUTTUJAT = 'temperature_2m_mean,temperature_2m_max,precipitation_sum,wind_speed_10m_mean'
+
+RINNAKKAISIA = 8             # Samanaikaisten pyyntöjen enimmäismäärä
+PYYNTÖJÄ_SEKUNNISSA = 8.0    # Tokenisangon aloitusnopeus (Open-Meteo: 600 kutsua / min)
+MIN_NOPEUS = 0.5             # 429-vastaukset eivät hidasta tätä alemmas
+HIDASTUSIKKUNA_S = 1.0       # Nopeus puolitetaan enintään kerran tässä ajassa (palvelimen rajoitusikkuna)
+YRITYKSIÄ = 5                # Yhden haun yritykset ennen luovuttamista
+VIIVE_ALKU_S = 0.5           # Uudelleenyrityksen perusviive (kaksinkertaistuu, satunnaistettu)
+VIIVE_MAKSIMI_S = 30.0
+AIKAKATKAISU_S = 20.0
+
+# ************************************************
+# 1. VASTAUKSEN MUUNNOS
+# ************************************************
+
+def paivittaiset_dataframeksi(data: dict) -> Optional[pd.DataFrame]:
+    """
+    Open-Meteo daily-vastaus DataFrameksi (Päivämäärä, Lämpötila_C, Lämpötila_max_C,
+    Sadanta_mm, Tuulen_nopeus_ms) tai None.
+    """
+    daily = data.get('daily', {})
+    dates = daily.get('time')
+    daily_temps = daily.get('temperature_2m_mean')
+    daily_max = daily.get('temperature_2m_max', [None] * len(dates or []))
+    daily_precip = daily.get('precipitation_sum')
+    daily_wind = daily.get('wind_speed_10m_mean')
+
+    if daily_temps and dates and daily_precip and daily_wind and isinstance(daily_temps, list):
+        return pd.DataFrame({
+            'Päivämäärä': pd.to_datetime(dates),
+            'Lämpötila_C': pd.to_numeric(pd.Series(daily_temps), errors='coerce'),
+            'Lämpötila_max_C': pd.to_numeric(pd.Series(daily_max), errors='coerce'),
+            'Sadanta_mm': pd.to_numeric(pd.Series(daily_precip), errors='coerce'),
+            'Tuulen_nopeus_ms': pd.to_numeric(pd.Series(daily_wind), errors='coerce'),
+        })
+    return None
+
+def hakuparametrit(latitude: float, longitude: float, start_date: date, end_date: date) -> dict:
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'daily': DAILY_MUUTTUJAT,
+        'timezone': 'auto',
+    }
+
+# Yksittäishaut käyttävät samaa istuntoa (TLS-yhteys uudelleenkäytetään)
+_istunto = requests.Session()
+
+def hae_jakso(latitude: float, longitude: float, start_date: date, end_date: date) -> Optional[pd.DataFrame]:
+    """Yksi synkroninen haku (esim. riskikartan klikkaus); useat haut kerralla: hae_jaksot."""
+    try:
+        response = _istunto.get(OPENMETEO_ARCHIVE_URL, params=hakuparametrit(latitude, longitude, start_date, end_date), timeout=AIKAKATKAISU_S)
+        response.raise_for_status()
+        return paivittaiset_dataframeksi(response.json())
+    except requests.exceptions.RequestException as e:
+        print(f"API-VIRHE sijainnille {latitude}, {longitude}: {e}")
+        return None
+
+# ************************************************
+# 2. MUKAUTUVA NOPEUSRAJOITIN
+# ************************************************
+
+class Tokenisanko:
+    """
+    Tokenisanko, jonka täyttönopeus mukautuu palvelimen vastauksiin (AIMD): 429-vastaus
+    puolittaa nopeuden, onnistunut pyyntö kasvattaa sitä hitaasti takaisin kohti maksimia.
+    Samanaikaisten pyyntöjen 429-ryöppy puolittaa nopeuden vain kerran: vastaukset pyyntöihin,
+    jotka lähetettiin ennen edellistä hidastusta tai HIDASTUSIKKUNA_S sen jälkeen (palvelimen
+    ikkunassa on vielä vanhan nopeuden pyyntöjä), eivät kerro mitään uudesta nopeudesta.
+    """
+
+    def __init__(self, nopeus: float = PYYNTÖJÄ_SEKUNNISSA, koko: Optional[float] = None):
+        self.maksiminopeus = nopeus
+        self.nopeus = nopeus
+        self.koko = koko if koko is not None else max(1.0, nopeus)
+        self._tokenit = self.koko
+        self._päivitetty = time.monotonic()
+        self._lukko = asyncio.Lock()
+        self._hidastettu = float('-inf')
+        self.hidastuksia = 0
+
+    def _täytä(self) -> None:
+        nyt = time.monotonic()
+        self._tokenit = min(self.koko, self._tokenit + (nyt - self._päivitetty) * self.nopeus)
+        self._päivitetty = nyt
+
+    async def ota(self) -> float:
+        """Odottaa, kunnes sangossa on token, ja käyttää sen. Palauttaa lähetyshetken (hidasta-metodille)."""
+        async with self._lukko:
+            self._täytä()
+            while self._tokenit < 1:
+                await asyncio.sleep((1 - self._tokenit) / self.nopeus)
+                self._täytä()
+            self._tokenit -= 1
+            return time.monotonic()
+
+    def hidasta(self, lähetetty: float) -> None:
+        """429-vastaus pyyntöön, joka lähetettiin hetkellä lähetetty (ota-metodin paluuarvo)."""
+        if lähetetty < self._hidastettu + HIDASTUSIKKUNA_S:
+            return
+        self.nopeus = max(MIN_NOPEUS, self.nopeus / 2)
+        self._tokenit = min(self._tokenit, 0.0)
+        self._hidastettu = time.monotonic()
+        self.hidastuksia += 1
+
+    def nopeuta(self) -> None:
+        self.nopeus = min(self.maksiminopeus, self.nopeus + 0.1)
+
+# ************************************************
+# 3. RINNAKKAINEN HAKU
+# ************************************************
+
+@dataclass
+class Hakutulos:
+    onnistuneet: Dict[int, pd.DataFrame] = field(default_factory=dict)
+    epäonnistuneet: Dict[int, str] = field(default_factory=dict)   # Haun indeksi -> syy
+    pyyntöjä: int = 0
+    uudelleenyrityksiä: int = 0
+    kesto_s: float = 0.0
+    nopeus: float = 0.0          # Nopeusrajoittimen lopullinen nopeus (pyyntöä/s)
+    hidastuksia: int = 0         # Montako kertaa 429-vastaukset puolittivat nopeuden
+
+def odotusaika(yritys: int, vastaus: Optional[httpx.Response] = None) -> float:
+    """Eksponentiaalinen viive täydellä satunnaistuksella; palvelimen Retry-After voittaa."""
+    if vastaus is not None and vastaus.headers.get('Retry-After', '').isdigit():
+        return float(vastaus.headers['Retry-After'])
+    return random.uniform(0, min(VIIVE_MAKSIMI_S, VIIVE_ALKU_S * 2 ** yritys))
+
+async def _hae_yksi(asiakas: httpx.AsyncClient, sanko: Tokenisanko, semafori: asyncio.Semaphore,
+                    url: str, parametrit: dict, tulos: Hakutulos) -> Tuple[Optional[pd.DataFrame], str]:
+    syy = ''
+    for yritys in range(YRITYKSIÄ):
+        if yritys:
+            tulos.uudelleenyrityksiä += 1
+        vastaus = None
+        async with semafori:
+            lähetetty = await sanko.ota()
+            tulos.pyyntöjä += 1
+            try:
+                vastaus = await asiakas.get(url, params=parametrit)
+            except httpx.HTTPError as e:
+                syy = f"{type(e).__name__}: {e}"
+
+        if vastaus is not None:
+            if vastaus.status_code == 429:
+                sanko.hidasta(lähetetty)
+                syy = 'HTTP 429'
+            elif vastaus.status_code >= 500:
+                syy = f"HTTP {vastaus.status_code}"
+            elif vastaus.status_code >= 400:
+                # Virheellinen pyyntö (esim. päivämäärät arkiston ulkopuolella): ei yritetä uudelleen
+                return None, f"HTTP {vastaus.status_code}: {vastaus.text[:200]}"
+            else:
+                sanko.nopeuta()
+                try:
+                    daily_df = paivittaiset_dataframeksi(vastaus.json())
+                except (ValueError, AttributeError) as e:
+                    # Rikkinäinen vastausrunko kirjataan haun virheeksi eikä se kaada koko ajoa
+                    return None, f"Virheellinen vastaus: {type(e).__name__}: {e}"
+                return daily_df, '' if daily_df is not None else 'Vastauksessa ei päivittäistä dataa'
+
+        await asyncio.sleep(odotusaika(yritys, vastaus))
+    return None, f"{syy} ({YRITYKSIÄ} yritystä)"
+
+async def hae_jaksot_async(haut: List[Tuple[float, float, date, date]], url: Optional[str] = None,
+                           rinnakkaisia: int = RINNAKKAISIA, nopeus: float = PYYNTÖJÄ_SEKUNNISSA) -> Hakutulos:
+    """
+    Hakee päivittäisen säädatan jokaiselle (lat, lon, alku, loppu) -haulle. Yksi jaettu
+    HTTP-asiakas (yhteyspooli), enintään rinnakkaisia pyyntöä kerrallaan ja mukautuva
+    nopeusrajoitin; epäonnistuneet haut kirjataan syineen eikä niitä pudoteta hiljaa.
+    """
+    url = url or OPENMETEO_ARCHIVE_URL
+    tulos = Hakutulos()
+    sanko = Tokenisanko(nopeus)
+    semafori = asyncio.Semaphore(rinnakkaisia)
+    rajat = httpx.Limits(max_connections=rinnakkaisia, max_keepalive_connections=rinnakkaisia)
+    alku = time.monotonic()
+
+    async with httpx.AsyncClient(timeout=AIKAKATKAISU_S, limits=rajat) as asiakas:
+        async def hae(i: int, haku: Tuple[float, float, date, date]) -> None:
+            daily_df, syy = await _hae_yksi(asiakas, sanko, semafori, url, hakuparametrit(*haku), tulos)
+            if daily_df is not None:
+                tulos.onnistuneet[i] = daily_df
+            else:
+                tulos.epäonnistuneet[i] = syy
+            valmiit = len(tulos.onnistuneet) + len(tulos.epäonnistuneet)
+            if valmiit % 100 == 0 or valmiit == len(haut):
+                print(f"Haettu {valmiit}/{len(haut)} (nopeus {sanko.nopeus:.1f}/s, epäonnistuneita {len(tulos.epäonnistuneet)})...")
+
+        await asyncio.gather(*(hae(i, haku) for i, haku in enumerate(haut)))
+
+    tulos.kesto_s = time.monotonic() - alku
+    tulos.nopeus, tulos.hidastuksia = sanko.nopeus, sanko.hidastuksia
+    if sanko.hidastuksia:
+        print(f"Palvelin rajoitti nopeutta {sanko.hidastuksia} kertaa; lopullinen nopeus {sanko.nopeus:.1f} pyyntöä/s.")
+    return tulos
+
+def hae_jaksot(haut: List[Tuple[float, float, date, date]], **kwargs) -> Hakutulos:
+    """Synkroninen kääre hae_jaksot_async-funktiolle (skriptikäyttöön)."""
+    return asyncio.run(hae_jaksot_async(haut, **kwargs))
+
+# ************************************************
+# SUORITUSKYKYTESTI
+# ************************************************
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mittaa rikastusasiakkaan läpäisyn (esim. paikallista korvikepalvelinta vasten).")
+    parser.add_argument('--url', default='http://127.0.0.1:8765/v1/archive')
+    parser.add_argument('--hakuja', type=int, default=500)
+    parser.add_argument('--rinnakkaisia', type=int, default=RINNAKKAISIA)
+    parser.add_argument('--nopeus', type=float, default=50.0)
+    args = parser.parse_args()
+
+    haut = [(60 + i % 50 * 0.1, 24 + i // 50 * 0.1, date(2024, 6, 1), date(2024, 8, 31)) for i in range(args.hakuja)]
+    tulos = hae_jaksot(haut, url=args.url, rinnakkaisia=args.rinnakkaisia, nopeus=args.nopeus)
+
+    print("=" * 50)
+    print(f"Hakuja {len(haut)}, onnistui {len(tulos.onnistuneet)}, epäonnistui {len(tulos.epäonnistuneet)}")
+    print(f"Pyyntöjä {tulos.pyyntöjä} (uudelleenyrityksiä {tulos.uudelleenyrityksiä}), kesto {tulos.kesto_s:.1f} s "
+          f"-> {len(haut) / tulos.kesto_s:.1f} hakua/s")
+    print("=" * 50)
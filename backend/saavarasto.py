@@ -0,0 +1,129 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+import saa_asiakas
+
+# ************************************************
+# ASETUKSET
+# ************************************************
+
+# Yhteinen paikallinen säävarasto (Datan_yhd-rikastus ja riskikartta). Arkiston päivädata ei
+# muutu, joten kukin (ruutu, päivä) haetaan Open-Meteosta vain kerran.
+SAAVARASTO_POLKU = os.getenv('SAAVARASTO_POLKU', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saavarasto.sqlite3'))
+RUUDUKKO_ASTE = 0.1         # Sijainnit pyöristetään sääruutuun (Open-Meteo archive -hila ~0,1°)
+ARKISTON_VIIVE_PV = 7       # Tuoreimmat päivät täydentyvät arkistoon viiveellä: puuttuvia arvoja ei tallenneta
+
+# Varaston sarakkeet (Open-Meteo-nimet) <-> saa_asiakas.paivittaiset_dataframeksi-sarakkeet
+SARAKKEET = {
+    'temperature_2m_mean': 'Lämpötila_C',
+    'temperature_2m_max': 'Lämpötila_max_C',
+    'precipitation_sum': 'Sadanta_mm',
+    'wind_speed_10m_mean': 'Tuulen_nopeus_ms',
+}
+
+# ************************************************
+# 1. APUFUNKTIOT
+# ************************************************
+
+def ruutu(lat: float, lon: float) -> Tuple[float, float]:
+    """Pyöristää sijainnin sääruudun keskipisteeseen (varaston avain)."""
+    return round(round(lat / RUUDUKKO_ASTE) * RUUDUKKO_ASTE, 4), round(round(lon / RUUDUKKO_ASTE) * RUUDUKKO_ASTE, 4)
+
+def paiva(arvo) -> date:
+    """date, datetime tai pd.Timestamp -> date."""
+    return pd.Timestamp(arvo).date()
+
+def yhtenaiset_jaksot(paivat: List[date]) -> List[Tuple[date, date]]:
+    """Järjestetyt päivät yhtenäisiksi (alku, loppu) -jaksoiksi."""
+    jaksot = []
+    for p in paivat:
+        if jaksot and p - jaksot[-1][1] == timedelta(days=1):
+            jaksot[-1] = (jaksot[-1][0], p)
+        else:
+            jaksot.append((p, p))
+    return jaksot
+
+# ************************************************
+# 2. VARASTO
+# ************************************************
+
+class Saavarasto:
+    """
+    SQLite-varasto päivittäisille säähavainnoille avaimella (ruudun lat, ruudun lon, päivä).
+    Kutsujat pyytävät tarvitsemansa aikavälin; varastosta puuttuvat päivät haetaan ja
+    tallennetaan, ja ikkunat kootaan aina varaston riveistä.
+    """
+
+    def __init__(self, polku: str = SAAVARASTO_POLKU):
+        self.polku = polku
+        with closing(self._yhteys()) as yhteys, yhteys:
+            yhteys.execute('PRAGMA journal_mode=WAL')
+            yhteys.execute(f"""
+                CREATE TABLE IF NOT EXISTS paivat (
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    pvm TEXT NOT NULL,
+                    {', '.join(f'{s} REAL' for s in SARAKKEET)},
+                    PRIMARY KEY (lat, lon, pvm)
+                ) WITHOUT ROWID
+            """)
+
+    def _yhteys(self) -> sqlite3.Connection:
+        # Yksi yhteys per kutsu: varastoa käytetään myös Streamlitin säikeistä
+        return sqlite3.connect(self.polku, timeout=30)
+
+    def hae(self, lat: float, lon: float, alku: date, loppu: date) -> pd.DataFrame:
+        """Varastossa olevat päivät aikaväliltä (Päivämäärä + saa_asiakas-sarakkeet)."""
+        r_lat, r_lon = ruutu(lat, lon)
+        alku, loppu = paiva(alku), paiva(loppu)
+        with closing(self._yhteys()) as yhteys:
+            df = pd.read_sql_query(
+                f"SELECT pvm, {', '.join(SARAKKEET)} FROM paivat WHERE lat = ? AND lon = ? AND pvm BETWEEN ? AND ? ORDER BY pvm",
+                yhteys, params=(r_lat, r_lon, alku.isoformat(), loppu.isoformat()),
+            )
+        df['pvm'] = pd.to_datetime(df['pvm'])
+        return df.rename(columns={'pvm': 'Päivämäärä', **SARAKKEET})
+
+    def puuttuvat_jaksot(self, lat: float, lon: float, alku: date, loppu: date) -> List[Tuple[date, date]]:
+        """Aikavälin päivät, joita varastossa ei ole, yhtenäisinä jaksoina."""
+        r_lat, r_lon = ruutu(lat, lon)
+        alku, loppu = paiva(alku), paiva(loppu)
+        with closing(self._yhteys()) as yhteys:
+            olemassa = {r[0] for r in yhteys.execute(
+                "SELECT pvm FROM paivat WHERE lat = ? AND lon = ? AND pvm BETWEEN ? AND ?",
+                (r_lat, r_lon, alku.isoformat(), loppu.isoformat()),
+            )}
+        paivat = [alku + timedelta(days=i) for i in range((loppu - alku).days + 1)]
+        return yhtenaiset_jaksot([p for p in paivat if p.isoformat() not in olemassa])
+
+    def tallenna(self, lat: float, lon: float, daily_df: pd.DataFrame) -> int:
+        """Tallentaa haun päivärivit ruudulle. Palauttaa tallennettujen rivien määrän."""
+        r_lat, r_lon = ruutu(lat, lon)
+        df = daily_df.rename(columns={v: k for k, v in SARAKKEET.items()}).reindex(columns=['Päivämäärä', *SARAKKEET])
+        # Viimeisimpien päivien puuttuvat arvot voivat vielä täydentyä: ne haetaan myöhemmin uudelleen
+        raja = pd.Timestamp(date.today() - timedelta(days=ARKISTON_VIIVE_PV))
+        df = df[(df['Päivämäärä'] < raja) | df[list(SARAKKEET)].notna().all(axis=1)]
+
+        rivit = [
+            (r_lat, r_lon, pvm.date().isoformat(), *(None if pd.isna(v) else float(v) for v in arvot))
+            for pvm, *arvot in df.itertuples(index=False)
+        ]
+        with closing(self._yhteys()) as yhteys, yhteys:
+            yhteys.executemany(f"INSERT OR REPLACE INTO paivat VALUES (?, ?, ?, {', '.join('?' for _ in SARAKKEET)})", rivit)
+        return len(rivit)
+
+    def hae_jakso(self, lat: float, lon: float, alku: date, loppu: date,
+                  lataaja: Callable[[float, float, date, date], Optional[pd.DataFrame]] = saa_asiakas.hae_jakso) -> pd.DataFrame:
+        """Read-through: hakee puuttuvat päivät lataajalla, tallentaa ne ja palauttaa koko aikavälin varastosta."""
+        r_lat, r_lon = ruutu(lat, lon)
+        alku, loppu = paiva(alku), paiva(loppu)
+        for p_alku, p_loppu in self.puuttuvat_jaksot(r_lat, r_lon, alku, min(loppu, date.today())):
+            daily_df = lataaja(r_lat, r_lon, p_alku, p_loppu)
+            if daily_df is not None:
+                self.tallenna(r_lat, r_lon, daily_df)
+        return self.hae(r_lat, r_lon, alku, loppu)
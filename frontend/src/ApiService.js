@@ -20,6 +20,30 @@ export const fetchAiSummary = async (setLoadingAiSummary, setAiSummary) => {
     }
 }
 
+// ai summary as Server-Sent Events: text grows chunk by chunk while the model generates it
+export const streamAiSummary = (setLoadingAiSummary, setAiSummary) => {
+    setLoadingAiSummary(true);
+    setAiSummary("");
+    const source = new EventSource("http://127.0.0.1:8000/api/ai/stream/");
+
+    source.addEventListener("chunk", (event) => {
+        const chunk = JSON.parse(event.data);
+        setAiSummary((previous) => previous + chunk);
+        setLoadingAiSummary(false);
+    });
+    source.addEventListener("done", () => {
+        source.close();
+        setLoadingAiSummary(false);
+    });
+    source.addEventListener("error", (event) => {
+        console.error("Virhe AI-tiivistelmän virrassa:", event.data);
+        source.close();
+        setLoadingAiSummary(false);
+    });
+
+    return () => source.close();
+}
+
 // post request for ai summary based on date and province
 export const getAiSummaryByDay = async (setLoadingDateAiSummary, setAiSummary, postData) => {
     try {
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import folium
 from folium.plugins import MarkerCluster
 from streamlit_folium import st_folium
@@ -8,7 +9,13 @@ import datetime
 import altair as alt
 import re
 import os
+import sys
 from PIL import Image
+from sklearn.neighbors import BallTree
+
+# Säävarasto on jaettu backendin rikastusskriptin kanssa
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+import saavarasto
 
 # --- ASETUKSET ---
 st.set_page_config(page_title="Riskialueet 2026", layout="wide", page_icon="💧")
@@ -163,22 +170,32 @@ def load_and_combine_years():
     
     return hotspots, df
 
+@st.cache_resource
+def rakenna_hakupuu():
+    """ Haversine-BallTree riskipaikoista: klikatun pisteen lähin paikka ilman koko taulukon läpikäyntiä.
+    Ei argumentteja, joten puu rakennetaan kerran eikä klikkaus tiivistä koordinaattitaulukkoa. """
+    hotspots, _ = load_and_combine_years()
+    return BallTree(np.radians(hotspots[['lat', 'lon']].to_numpy()), metric='haversine')
+
 # ---------------------------------------------------------
 # OSA 2: SÄÄANALYYSI
 # ---------------------------------------------------------
 
+@st.cache_resource
+def hae_saavarasto():
+    return saavarasto.Saavarasto()
+
 def get_weather_data(lat, lon, date):
+    """ Päivän ympäristön maksimilämpötilat säävarastosta; vain puuttuvat päivät haetaan Open-Meteosta """
     try:
         end = date + datetime.timedelta(days=5)
         start = date - datetime.timedelta(days=30)
-        url = "https://archive-api.open-meteo.com/v1/archive"
-        params = {
-            "latitude": lat, "longitude": lon,
-            "start_date": start.strftime("%Y-%m-%d"),
-            "end_date": end.strftime("%Y-%m-%d"),
-            "daily": ["temperature_2m_max"], "timezone": "Europe/Helsinki"
-        }
-        return requests.get(url, params=params).json()
+        daily = hae_saavarasto().hae_jakso(lat, lon, start, end).dropna(subset=['Lämpötila_max_C'])
+        if daily.empty: return None
+        return {"daily": {
+            "time": daily['Päivämäärä'].dt.strftime("%Y-%m-%d").tolist(),
+            "temperature_2m_max": daily['Lämpötila_max_C'].tolist(),
+        }}
     except: return None
 
 def simulate_water(air):
@@ -268,8 +285,9 @@ with col_analysis:
         lat = st_map['last_object_clicked']['lat']
         lon = st_map['last_object_clicked']['lng']
         
-        df_hotspots['dist'] = ((df_hotspots['lat']-lat)**2 + (df_hotspots['lon']-lon)**2)
-        match = df_hotspots.loc[df_hotspots['dist'].idxmin()]
+        hakupuu = rakenna_hakupuu()
+        _, lähin = hakupuu.query(np.radians([[lat, lon]]), k=1)
+        match = df_hotspots.iloc[lähin[0][0]]
         paikka = match['Havaintopaikka']
         
         # --- KOHDEKORTTI ---